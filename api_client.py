@@ -0,0 +1,139 @@
+"""
+API Client - Shared HTTP client for the FocusFlow backend.
+One pooled requests.Session per process with uniform timeouts, retries with
+jittered exponential backoff for idempotent calls, and a short-lived cache
+for idempotent GETs (/sources, /student/profile) so Streamlit reruns do not
+repeat the same round-trips. Calls the UI need not wait for can run in
+the background over the same pool.
+"""
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Tuple, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (3.05, 30)
+
+# Only these are replayed on failure; POSTs (uploads, quiz saves) never are
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "DELETE", "PUT"})
+RETRY_STATUSES = frozenset({429, 502, 503, 504})
+
+
+class BackendClient:
+    """Pooled, retrying backend client with a TTL cache for GETs"""
+
+    def __init__(self, base_url: str, timeout: Union[float, Tuple[float, float]] = DEFAULT_TIMEOUT,
+                 retries: int = 2, backoff: float = 0.3, max_backoff: float = 4.0,
+                 pool_size: int = 10, cache_ttl: dict = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        # Path -> seconds a successful GET stays fresh
+        self.cache_ttl = cache_ttl or {}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.lock = threading.Lock()
+        # Runs background calls (see submit); sized to the connection pool
+        self.executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="backend-client")
+        self._cache = {}
+        self._stats = {"requests": 0, "retries": 0, "cache_hits": 0, "cache_misses": 0}
+
+    def _sleep_before_retry(self, attempt: int, response: Optional[requests.Response] = None):
+        """Full-jitter exponential backoff, honouring Retry-After from a 429"""
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+        if response is not None and response.headers.get("Retry-After"):
+            try:
+                delay = max(delay, min(float(response.headers["Retry-After"]), self.max_backoff))
+            except ValueError:
+                pass
+        time.sleep(delay)
+
+    def request(self, method: str, path: str, timeout=None, **kwargs) -> requests.Response:
+        """Send a request; idempotent methods are retried on connection errors and 429/5xx"""
+        method = method.upper()
+        url = f"{self.base_url}{path}"
+        attempts = 1 + (self.retries if method in IDEMPOTENT_METHODS else 0)
+        for attempt in range(attempts):
+            with self.lock:
+                self._stats["requests"] += 1
+                if attempt:
+                    self._stats["retries"] += 1
+            try:
+                resp = self.session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == attempts - 1:
+                    raise
+                self._sleep_before_retry(attempt)
+                continue
+            if resp.status_code in RETRY_STATUSES and attempt < attempts - 1:
+                resp.close()
+                self._sleep_before_retry(attempt, resp)
+                continue
+            return resp
+        return resp
+
+    def _cache_key(self, path: str, params: Optional[dict]) -> tuple:
+        return path, tuple(sorted((params or {}).items()))
+
+    def get(self, path: str, params: Optional[dict] = None, timeout=None, use_cache: bool = True,
+            **kwargs) -> requests.Response:
+        """GET, served from the cache while fresh for paths with a configured TTL"""
+        ttl = self.cache_ttl.get(path) if use_cache and not kwargs.get("stream") else None
+        key = self._cache_key(path, params)
+        if ttl:
+            with self.lock:
+                entry = self._cache.get(key)
+                if entry and entry[0] > time.monotonic():
+                    self._stats["cache_hits"] += 1
+                    return entry[1]
+                self._stats["cache_misses"] += 1
+
+        resp = self.request("GET", path, params=params, timeout=timeout, **kwargs)
+        if ttl and resp.status_code == 200:
+            with self.lock:
+                self._cache[key] = (time.monotonic() + ttl, resp)
+        return resp
+
+    def post(self, path: str, invalidate: bool = True, **kwargs) -> requests.Response:
+        """POST; by default drops cached GETs since the backend state may have changed"""
+        resp = self.request("POST", path, **kwargs)
+        if invalidate:
+            self.invalidate()
+        return resp
+
+    def delete(self, path: str, **kwargs) -> requests.Response:
+        resp = self.request("DELETE", path, **kwargs)
+        self.invalidate()
+        return resp
+
+    def submit(self, method: str, path: str, **kwargs) -> Future:
+        """Start a call in the background; the Future holds the response or the error"""
+        call = getattr(self, method.lower())
+        return self.executor.submit(call, path, **kwargs)
+
+    def invalidate(self, path: Optional[str] = None):
+        """Drop cached GETs for one path, or all of them"""
+        with self.lock:
+            if path is None:
+                self._cache.clear()
+            else:
+                for key in [k for k in self._cache if k[0] == path]:
+                    del self._cache[key]
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self._stats)
+            stats["cached_entries"] = len(self._cache)
+        return stats
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
@@ -1,11 +1,13 @@
 import streamlit as st
-import requests
 import pandas as pd
 import plotly.express as px
 import time
+import json
+import os
 import streamlit.components.v1 as components
 from streamlit_calendar import calendar
 from datetime import date
+from api_client import BackendClient
 
 # -----------------------------------------------------------------------------
 # 1. CONFIG & CSS
@@ -308,6 +310,15 @@ st.markdown("""
 
 # Backend URL
 API_URL = "http://localhost:8000"
+# Which student's profile this session reads and writes
+STUDENT_ID = os.getenv("FOCUSFLOW_STUDENT_ID", "default")
+
+@st.cache_resource
+def get_api():
+    """One pooled backend client per Streamlit server process, shared across reruns"""
+    return BackendClient(API_URL, cache_ttl={"/sources": 30, "/student/profile": 30, "/student/analytics": 30, "/connectivity": 15})
+
+api = get_api()
 
 # Session State
 if "timer_running" not in st.session_state: st.session_state.timer_running = False
@@ -324,17 +335,21 @@ if "topic_scores" not in st.session_state: st.session_state.topic_scores = {}  #
 if "focus_mode" not in st.session_state: st.session_state.focus_mode = False
 if "active_topic" not in st.session_state: st.session_state.active_topic = None
 
-# PERSISTENCE: Load student profile on first load
+# PERSISTENCE: Load the dashboard snapshot (profile, sources, today) on first load in one round-trip
 if "profile_loaded" not in st.session_state:
     st.session_state.profile_loaded = True
     try:
-        resp = requests.get(f"{API_URL}/student/profile", timeout=5)
+        today_str = date.today().strftime("%Y-%m-%d")
+        resp = api.get("/student/dashboard", params={"student_id": STUDENT_ID, "today": today_str}, timeout=5)
         if resp.status_code == 200:
-            profile = resp.json()
+            dashboard = resp.json()
+            profile = dashboard["profile"]
+            # The sidebar renders these instead of fetching /sources again
+            st.session_state.prefetched_sources = dashboard["sources"]
             
             # DEBUG: Show what we got
             plan_topics = profile.get("study_plan", {}).get("topics", [])
-            quiz_history = profile.get("quiz_history", [])
+            topic_scores = dashboard.get("topic_scores", {})
             
             # Restore study plan if exists
             if plan_topics:
@@ -345,56 +360,40 @@ if "profile_loaded" not in st.session_state:
                 # Don't show message for first-time users
             
             # Restore quiz scores
-            if quiz_history:
-                for quiz_record in quiz_history:
+            if topic_scores:
+                for quiz_record in topic_scores.values():
                     st.session_state.topic_scores[quiz_record["topic_id"]] = {
                         "topic_title": quiz_record.get("topic_title"),
                         "score": quiz_record["score"],
                         "total": quiz_record["total"],
                         "percentage": quiz_record["percentage"]
                     }
-                st.toast(f"📊 Restored {len(quiz_history)} quiz results", icon="✅")
+                st.toast(f"📊 Restored {profile.get('quiz_count', len(topic_scores))} quiz results", icon="✅")
             
             # Restore mastery data
             if profile.get("mastery_tracker"):
                 st.session_state.mastery_data = profile["mastery_tracker"]
             
             # ========== DATE-AWARE DAY PROGRESSION ==========
-            from datetime import date
-            today = date.today()
-            today_str = today.strftime("%Y-%m-%d")
-            
-            # Get stored current day and last access date
-            current_study_day = profile.get("current_study_day", 1)
-            last_access_date = profile.get("last_access_date", today_str)
-            
-            # Check if it's a new calendar day
-            if last_access_date != today_str and st.session_state.study_plan:
-                # Calculate how many days have passed
-                from datetime import datetime
-                last_date_obj = datetime.strptime(last_access_date, "%Y-%m-%d").date()
-                days_passed = (today - last_date_obj).days
-                
-                if days_passed > 0:
-                    # Advance to next day
-                    current_study_day += days_passed
-                    max_day = max([t.get("day", 1) for t in st.session_state.study_plan]) if st.session_state.study_plan else 1
-                    current_study_day = min(current_study_day, max_day)  # Cap at max day
-                    
-                    # Auto-unlock topics for the new day
-                    for topic in st.session_state.study_plan:
-                        if topic.get("day") == current_study_day and topic.get("status") != "completed":
-                            topic["status"] = "unlocked"
-                    
-                    # Update profile with new day and date
-                    try:
-                        requests.post(f"{API_URL}/student/save_progress", json={
-                            "current_study_day": current_study_day,
-                            "last_access_date": today_str
-                        }, timeout=5)
-                        st.toast(f"📅 Advanced to Day {current_study_day}! New topics unlocked", icon="🎯")
-                    except:
-                        pass
+            # The backend works out the day (one per calendar day since the last visit, capped at the plan length)
+            current_study_day = dashboard["today"]["current_study_day"]
+
+            if dashboard["today"]["days_advanced"] > 0:
+                # Auto-unlock topics for the new day
+                for topic in st.session_state.study_plan:
+                    if topic.get("day") == current_study_day and topic.get("status") != "completed":
+                        topic["status"] = "unlocked"
+
+            if dashboard["today"]["needs_save"]:
+                # Persist the day and date in the background; first paint does not wait on it.
+                # The result is checked once the page has rendered (end of script).
+                st.session_state.pending_progress_save = (
+                    api.submit("POST", "/student/save_progress", json={
+                        "current_study_day": current_study_day,
+                        "last_access_date": today_str
+                    }, params={"student_id": STUDENT_ID}, timeout=5),
+                    current_study_day if dashboard["today"]["days_advanced"] > 0 else None
+                )
             
             # Store current day in session state
             st.session_state.current_study_day = current_study_day
@@ -416,17 +415,116 @@ else:
 
 def check_internet():
     """
-    Checks for internet connectivity by pinging reliable hosts.
-    try multiple to be sure.
+    Reads the backend's cached connectivity status (probed in the background).
+    Returns False when the backend is unreachable or has no fresh result.
     """
-    keywords = ["google.com", "cloudflare.com", "github.com"]
-    for host in keywords:
+    try:
+        resp = api.get("/connectivity", timeout=2)
+        return resp.status_code == 200 and resp.json().get("online") is True
+    except Exception:
+        return False
+
+def wait_for_ingest_job(job_id, label, poll_interval=1.0, max_wait=1800):
+    """
+    Poll an ingestion job until it finishes, showing stage and progress.
+    Returns the final job status dict (or None if polling failed).
+    """
+    progress_bar = st.progress(0.0, text=f"Queued: {label}")
+    started = time.time()
+    while time.time() - started < max_wait:
         try:
-            requests.get(f"http://{host}", timeout=3)
-            return True
-        except:
-            continue
-    return False
+            resp = api.get(f"/jobs/{job_id}", timeout=5)
+        except Exception as e:
+            progress_bar.empty()
+            st.error(f"Lost contact with backend: {e}")
+            return None
+        if resp.status_code != 200:
+            progress_bar.empty()
+            st.error(f"Could not read job status: {resp.text}")
+            return None
+
+        job = resp.json()
+        if job["status"] in ("done", "failed"):
+            progress_bar.empty()
+            # The source list changes when a job finishes, not when it is queued
+            api.invalidate("/sources")
+            return job
+
+        # Overall fraction across the document (PDFs are ingested in page windows)
+        fraction = job.get("progress") or 0.0
+        text = f"{job['stage'].title()}: {label}"
+        if job.get("pages_total"):
+            text += f" ({job.get('pages_done') or 0}/{job['pages_total']} pages)"
+        elif job.get("chunks_total"):
+            text += f" ({job.get('chunks_done') or 0}/{job['chunks_total']} chunks)"
+        if job.get("eta_seconds"):
+            text += f" • ~{int(job['eta_seconds'])}s left"
+        progress_bar.progress(fraction, text=text)
+        time.sleep(poll_interval)
+
+    progress_bar.empty()
+    st.warning("Still indexing in the background. Check back shortly.")
+    return None
+
+def stream_events(path, payload, timeout=300):
+    """Yield (event, data) pairs from a server-sent events endpoint"""
+    with api.post(path, json=payload, stream=True, timeout=(3.05, timeout), invalidate=False) as resp:
+        if resp.status_code != 200:
+            yield "error", {"status": resp.status_code, "detail": resp.text}
+            return
+        event = "message"
+        for line in resp.iter_lines(decode_unicode=True):
+            if not line:
+                event = "message"
+            elif line.startswith("event:"):
+                event = line[len("event:"):].strip()
+            elif line.startswith("data:"):
+                yield event, json.loads(line[len("data:"):].strip())
+
+def render_with_sources(placeholder, text, sources):
+    """Render text into a placeholder with its source citations underneath"""
+    with placeholder.container():
+        st.markdown(text)
+        if sources:
+            with st.expander("📚 Sources", expanded=False):
+                for idx, s in enumerate(sources, 1):
+                    if isinstance(s, dict):
+                        filename = (s.get("filename") or s.get("source", "")).split("/")[-1]
+                        page = s.get("page", "N/A")
+                        st.caption(f"{idx}. 📄 {filename}, p.{page}")
+                    else:
+                        st.caption(f"{idx}. {str(s)[:100]}")
+
+def render_stream(path, payload, placeholder, result_key):
+    """
+    Render streamed tokens progressively into a placeholder, with the
+    citations from the early "sources" event shown under the text.
+    Returns (final_event, data) where data[result_key] holds the final text.
+    """
+    text = ""
+    sources = []
+    for event, data in stream_events(path, payload):
+        if event == "sources":
+            sources = data or []
+            placeholder.caption(f"📚 Found {len(sources)} relevant passages, writing...")
+        elif event == "token":
+            text += data
+            render_with_sources(placeholder, text + "▌", sources)
+        elif event == "done":
+            # Lessons carry their references inside the final text; answers list them separately
+            render_with_sources(placeholder, data.get(result_key, text), data.get("sources"))
+            data.setdefault("sources", sources)
+            return event, data
+        elif event == "error":
+            if data.get("status") == 429:
+                message = "The assistant is busy right now. Please try again in a moment."
+            else:
+                message = data.get(result_key) or f"Error processing request: {data.get('detail', 'unknown error')}"
+            placeholder.markdown(message)
+            data[result_key] = message
+            return event, data
+    render_with_sources(placeholder, text or "No response.", sources)
+    return "done", {result_key: text or "No response.", "sources": sources}
 
 # -----------------------------------------------------------------------------
 # 2. ANALYTICS MODAL (Rendered at top if active)
@@ -448,67 +546,24 @@ if st.session_state.show_analytics:
         # If st.dialog is available (it was in the previous app.py), we should use it.
         pass
 
-def extract_subjects_and_topics():
+def fetch_analytics():
     """
-    Extract subjects from study plan topics.
-    Returns: {subject_name: [topic_data_with_scores]}
+    Per-subject aggregates computed (and cached) by the backend.
+    Returns: {subject_name: summary with strong/moderate/needs_work topics}
     """
-    import re
-    subjects = {}
-    for topic in st.session_state.study_plan:
-        title = topic.get("title", "")
-        
-        # Remove "Day X:" prefix if present
-        title_cleaned = re.sub(r'^Day\s+\d+:\s*', '', title)
-        
-        # Try to extract subject from remaining text
-        # Look for patterns like "OOPS:" or "Manufacturing:" or just use first few words
-        if ":" in title_cleaned:
-            # Get first part before colon as subject
-            subject = title_cleaned.split(":")[0].strip()
-        elif " - " in title_cleaned:
-            # Alternative separator
-            subject = title_cleaned.split(" - ")[0].strip()
-        else:
-            # Use first 2-3 capitalized words as subject
-            words = title_cleaned.split()
-            # Take first 1-2 capitalized words as subject name
-            subject_words = []
-            for word in words[:3]:
-                if word[0].isupper() or word.isupper():
-                    subject_words.append(word)
-                else:
-                    break
-            subject = " ".join(subject_words) if subject_words else "General"
-        
-        # Clean up subject name
-        subject = subject.strip()
-        if not subject or subject.startswith("Day"):
-            subject = "General"
-        
-        if subject not in subjects:
-            subjects[subject] = []
-        
-        # Add topic with its score data
-        topic_data = {
-            "title": title,
-            "id": topic.get("id"),
-            "status": topic.get("status", "locked"),
-            "quiz_passed": topic.get("quiz_passed", False)
-        }
-        
-        # Add score if available
-        if topic.get("id") in st.session_state.topic_scores:
-            topic_data["score_data"] = st.session_state.topic_scores[topic.get("id")]
-        
-        subjects[subject].append(topic_data)
-    
-    return subjects
+    try:
+        resp = api.get("/student/analytics", params={"student_id": STUDENT_ID}, timeout=10)
+        if resp.status_code == 200:
+            return resp.json().get("subjects", {})
+        st.error(f"Could not load analytics: {resp.status_code}")
+    except Exception as e:
+        st.error(f"Could not connect to backend: {e}")
+    return {}
 
 
 @st.dialog("📊 Analytics Overview", width="large")
 def show_analytics_dialog():
-    subjects_data = extract_subjects_and_topics()
+    subjects_data = fetch_analytics()
     
     if not subjects_data:
         st.info("📚 No subjects found. Create a study plan to see analytics.")
@@ -520,19 +575,9 @@ def show_analytics_dialog():
     
     for idx, subject_name in enumerate(subject_names):
         with tabs[idx]:
-            topics = subjects_data[subject_name]
-            
-            # Calculate subject mastery
-            completed_topics = [t for t in topics if t.get("status") == "completed"]
-            total_topics = len(topics)
-            completion_pct = (len(completed_topics) / total_topics * 100) if total_topics > 0 else 0
-            
-            # Calculate average score for topics with quiz data
-            topics_with_scores = [t for t in topics if "score_data" in t]
-            if topics_with_scores:
-                avg_score = sum(t["score_data"]["percentage"] for t in topics_with_scores) / len(topics_with_scores)
-            else:
-                avg_score = 0
+            summary = subjects_data[subject_name]
+            total_topics = summary["total_topics"]
+            avg_score = summary["avg_score"]
             
             # Display mastery header
             st.markdown(f"""
@@ -545,21 +590,20 @@ def show_analytics_dialog():
             # Progress metrics
             col1, col2 = st.columns(2)
             with col1:
-                st.metric("Topics Completed", f"{len(completed_topics)}/{total_topics}")
-                st.progress(completion_pct / 100)
+                st.metric("Topics Completed", f"{summary['completed']}/{total_topics}")
+                st.progress(summary["completion_pct"] / 100)
             
             with col2:
-                st.metric("Quizzes Taken", f"{len(topics_with_scores)}/{total_topics}")
-                quiz_completion = (len(topics_with_scores) / total_topics * 100) if total_topics > 0 else 0
-                st.progress(quiz_completion / 100)
+                st.metric("Quizzes Taken", f"{summary['quizzes_taken']}/{total_topics}")
+                st.progress(summary["quiz_completion_pct"] / 100)
             
             st.markdown("---")
             st.markdown("### 📈 Performance Breakdown")
             
-            # Classify topics by performance
-            strong = [t for t in topics_with_scores if t["score_data"]["percentage"] >= 75]
-            moderate = [t for t in topics_with_scores if 50 <= t["score_data"]["percentage"] < 75]
-            needs_work = [t for t in topics_with_scores if t["score_data"]["percentage"] < 50]
+            # Topics are already classified by the backend
+            strong = summary["strong"]
+            moderate = summary["moderate"]
+            needs_work = summary["needs_work"]
             
             # Display classifications
             col1, col2, col3 = st.columns(3)
@@ -569,9 +613,7 @@ def show_analytics_dialog():
                 st.caption(f"{len(strong)} topic(s)")
                 if strong:
                     for t in strong:
-                        score_pct = t["score_data"]["percentage"]
-                        score_str = f"{t['score_data']['score']}/{t['score_data']['total']}"
-                        st.success(f"**{t['title']}**\n{score_pct:.0f}% ({score_str})")
+                        st.success(f"**{t['title']}**\n{t['percentage']:.0f}% ({t['score']}/{t['total']})")
                 else:
                     st.info("No strong topics yet. Keep studying!")
             
@@ -580,9 +622,7 @@ def show_analytics_dialog():
                 st.caption(f"{len(moderate)} topic(s)")
                 if moderate:
                     for t in moderate:
-                        score_pct = t["score_data"]["percentage"]
-                        score_str = f"{t['score_data']['score']}/{t['score_data']['total']}"
-                        st.warning(f"**{t['title']}**\n{score_pct:.0f}% ({score_str})")
+                        st.warning(f"**{t['title']}**\n{t['percentage']:.0f}% ({t['score']}/{t['total']})")
                 else:
                     st.info("No moderate topics yet")
             
@@ -591,9 +631,7 @@ def show_analytics_dialog():
                 st.caption(f"{len(needs_work)} topic(s)")
                 if needs_work:
                     for t in needs_work:
-                        score_pct = t["score_data"]["percentage"]
-                        score_str = f"{t['score_data']['score']}/{t['score_data']['total']}"
-                        st.error(f"**{t['title']}**\n{score_pct:.0f}% ({score_str})")
+                        st.error(f"**{t['title']}**\n{t['percentage']:.0f}% ({t['score']}/{t['total']})")
                 else:
                     st.info("Great! No topics need extra work")
 
@@ -632,7 +670,7 @@ def show_quiz_dialog(topic_id, topic_name):
             # Call backend
             try:
                 payload = {"topic_id": topic_id, "quiz_score": score}
-                resp = requests.post(f"{API_URL}/unlock_topic", json=payload)
+                resp = api.post("/unlock_topic", json=payload)
                 if resp.status_code == 200:
                     data = resp.json()
                     if data.get("success"):
@@ -939,14 +977,16 @@ if not st.session_state.focus_mode:
             # Tabs Removed - Unified View
             # tab_offline, tab_online = st.tabs(["Offline Sources", "Online Sources"])
             
-            # Helper to fetch sources
-            sources_list = []
-            try:
-                s_resp = requests.get(f"{API_URL}/sources")
-                if s_resp.status_code == 200:
-                    sources_list = s_resp.json()
-            except:
-                pass
+            # Helper to fetch sources (the first render reuses the dashboard snapshot)
+            sources_list = st.session_state.pop("prefetched_sources", None)
+            if sources_list is None:
+                sources_list = []
+                try:
+                    s_resp = api.get("/sources", timeout=5)
+                    if s_resp.status_code == 200:
+                        sources_list = s_resp.json()
+                except:
+                    pass
 
             if sources_list:
                 for src in sources_list:
@@ -967,7 +1007,7 @@ if not st.session_state.focus_mode:
                         if st.button("🗑️", key=f"del_{src['id']}", help="Delete source", type="tertiary"):
                             try:
                                 # Optimistically update UI by removing from list or just rerun
-                                requests.delete(f"{API_URL}/sources/{src['id']}")
+                                api.delete(f"/sources/{src['id']}")
                                 time.sleep(0.1) # Small delay for DB prop
                                 st.rerun()
                             except Exception as e:
@@ -994,15 +1034,20 @@ if not st.session_state.focus_mode:
                         try:
                             # Send to backend
                             files = {"file": (uploaded.name, uploaded, uploaded.type)}
-                            with st.spinner("Uploading & Indexing..."):
-                                resp = requests.post(f"{API_URL}/upload", files=files)
-                                if resp.status_code == 200:
-                                    st.session_state.processed_files.add(uploaded.name)
+                            with st.spinner("Uploading..."):
+                                resp = api.post("/upload", files=files, timeout=300)
+                            if resp.status_code in (200, 202):
+                                data = resp.json()
+                                job = wait_for_ingest_job(data["job_id"], uploaded.name) if "job_id" in data else {"status": "done"}
+                                st.session_state.processed_files.add(uploaded.name)
+                                if job and job["status"] == "done":
                                     st.success(f"Successfully uploaded: {uploaded.name}")
                                     time.sleep(1)
                                     st.rerun()
-                                else:
-                                    st.error(f"Upload failed: {resp.text}")
+                                elif job:
+                                    st.error(f"Indexing failed: {job.get('error')}")
+                            else:
+                                st.error(f"Upload failed: {resp.text}")
                         except Exception as e:
                             st.error(f"Error: {e}")
 
@@ -1013,18 +1058,20 @@ if not st.session_state.focus_mode:
                     if not url_input:
                         st.warning("Please enter a URL")
                     else:
-                        with st.spinner("Fetching & Indexing..."):
-                            try:
-                                resp = requests.post(f"{API_URL}/ingest_url", json={"url": url_input})
-                                if resp.status_code == 200:
-                                    data = resp.json()
-                                    st.success(data["message"])
+                        try:
+                            resp = api.post("/ingest_url", json={"url": url_input}, timeout=10)
+                            if resp.status_code in (200, 202):
+                                job = wait_for_ingest_job(resp.json()["job_id"], url_input)
+                                if job and job["status"] == "done":
+                                    st.success(f"Successfully added: {url_input}")
                                     time.sleep(1)
                                     st.rerun()
-                                else:
-                                    st.error(f"Failed: {resp.text}")
-                            except Exception as e:
-                                st.error(f"Error: {e}")
+                                elif job:
+                                    st.error(f"Failed: {job.get('error')}")
+                            else:
+                                st.error(f"Failed: {resp.text}")
+                        except Exception as e:
+                            st.error(f"Error: {e}")
 
 # --- FOCUS MODE UI ---
 if st.session_state.focus_mode:
@@ -1052,15 +1099,17 @@ if st.session_state.focus_mode:
         if prompt := st.chat_input(f"Ask about {st.session_state.active_topic}..."):
              st.session_state.chat_history.append({"role": "user", "content": prompt})
              
-             # Call AI
-             with st.spinner("Thinking..."):
-                 try:
-                     # Prepare history
-                     history = [{"role": m["role"], "content": m["content"]} for m in st.session_state.chat_history[:-1][-5:]]
-                     resp = requests.post(f"{API_URL}/query", json={"question": prompt, "history": history})
-                     if resp.status_code == 200:
-                         data = resp.json()
-                         ans = data.get("answer", "No answer.")
+             # Call AI (tokens stream into the chat as they are generated)
+             with messages:
+                 with st.chat_message("user"):
+                     st.write(prompt)
+                 with st.chat_message("assistant"):
+                     placeholder = st.empty()
+                     try:
+                         # Prepare history
+                         history = [{"role": m["role"], "content": m["content"]} for m in st.session_state.chat_history[:-1][-5:]]
+                         _, data = render_stream("/query/stream", {"question": prompt, "history": history}, placeholder, "answer")
+                         ans = data.get("answer") or "No answer."
                          srcs = data.get("sources", [])
                          
                          # Include sources if available
@@ -1068,10 +1117,8 @@ if st.session_state.focus_mode:
                              st.session_state.chat_history.append({"role": "assistant", "content": ans, "sources": srcs})
                          else:
                              st.session_state.chat_history.append({"role": "assistant", "content": ans})
-                     else:
-                         st.session_state.chat_history.append({"role": "assistant", "content": "Error processing request."})
-                 except Exception as e:
-                     st.session_state.chat_history.append({"role": "assistant", "content": f"Connection Error: {e}"})
+                     except Exception as e:
+                         st.session_state.chat_history.append({"role": "assistant", "content": f"Connection Error: {e}"})
              
              st.rerun()
 
@@ -1087,26 +1134,27 @@ if st.session_state.focus_mode:
         
         # Unique key for this topic's content
         t_id = st.session_state.active_topic['id'] if isinstance(st.session_state.active_topic, dict) else hash(topic_title)
+        topic_subject = st.session_state.active_topic.get('subject') if isinstance(st.session_state.active_topic, dict) else None
         content_key = f"content_{t_id}"
         
-        # 1. Fetch Content if missing
-        if content_key not in st.session_state:
-            with st.spinner(f"🤖 AI is writing a lesson for '{topic_title}'..."):
+        # 1. Render Content in Scrollable Container (like a document viewer)
+        lesson_container = st.container(height=650, border=True)
+        with lesson_container:
+            if content_key not in st.session_state:
+                # 2. Stream the lesson in as it is written
+                placeholder = st.empty()
+                placeholder.caption(f"🤖 AI is writing a lesson for '{topic_title}'...")
                 try:
-                    resp = requests.post(f"{API_URL}/generate_lesson", json={"topic": topic_title}, timeout=300)
-                    
-                    if resp.status_code == 200:
-                        st.session_state[content_key] = resp.json()["content"]
+                    event, data = render_stream("/generate_lesson/stream", {"topic": topic_title, "subject": topic_subject}, placeholder, "content")
+                    if event == "done":
+                        st.session_state[content_key] = data["content"]
                     else:
-                        st.session_state[content_key] = f"⚠️ Server Error: {resp.text}"
-                        
+                        st.session_state[content_key] = f"⚠️ Server Error: {data['content']}"
                 except Exception as e:
                     st.session_state[content_key] = f"⚠️ Connection Error: {e}"
-
-        # 2. Render Content in Scrollable Container (like a document viewer)
-        lesson_container = st.container(height=650, border=True)
-        with lesson_container:
-            st.markdown(st.session_state[content_key])
+                    placeholder.markdown(st.session_state[content_key])
+            else:
+                st.markdown(st.session_state[content_key])
         
         # 3. Exit Button (stays fixed below the scrollable content)
         if st.button("⬅ Finish & Return", use_container_width=True):
@@ -1184,27 +1232,25 @@ if not st.session_state.focus_mode:
                     st.session_state.chat_history.append({"role": "user", "content": user_input})
                     
                     try:
-                        with st.spinner("Thinking..."):
-                            # Prepare history (exclude sources for cleanliness)
-                            history = [
-                                {"role": msg["role"], "content": msg["content"]} 
-                                for msg in st.session_state.chat_history[:-1][-5:] # Last 5 valid history items before current question
-                            ]
-                            
-                            resp = requests.post(f"{API_URL}/query", json={"question": user_input, "history": history})
-                            if resp.status_code == 200:
-                                try:
-                                    data = resp.json()
-                                    ans = data.get("answer", "No answer.")
-                                    srcs = data.get("sources", [])
-                                    if srcs:
-                                        st.session_state.chat_history.append({"role": "assistant", "content": ans, "sources": srcs})
-                                    else:
-                                        st.session_state.chat_history.append({"role": "assistant", "content": ans})
-                                except Exception as e:
-                                    st.session_state.chat_history.append({"role": "assistant", "content": f"Error parsing response: {e}\\n\\nRaw text: {resp.text}"})
-                            else:
-                                 st.session_state.chat_history.append({"role": "assistant", "content": "Error."})
+                        # Prepare history (exclude sources for cleanliness)
+                        history = [
+                            {"role": msg["role"], "content": msg["content"]} 
+                            for msg in st.session_state.chat_history[:-1][-5:] # Last 5 valid history items before current question
+                        ]
+                        
+                        # Stream the answer into the chat area as it is generated
+                        with chat_container:
+                            with st.chat_message("user"):
+                                st.markdown(user_input)
+                            with st.chat_message("assistant"):
+                                placeholder = st.empty()
+                                _, data = render_stream("/query/stream", {"question": user_input, "history": history}, placeholder, "answer")
+                        ans = data.get("answer") or "No answer."
+                        srcs = data.get("sources", [])
+                        if srcs:
+                            st.session_state.chat_history.append({"role": "assistant", "content": ans, "sources": srcs})
+                        else:
+                            st.session_state.chat_history.append({"role": "assistant", "content": ans})
                     except Exception as e:
                          st.session_state.chat_history.append({"role": "assistant", "content": f"Connection Error: {e}"})
                     
@@ -1247,7 +1293,7 @@ if right_col:
                 with st.spinner("🤖 AI (1B) is thinking..."):
                     try:
                         # Increased timeout to 300s for safety
-                        resp = requests.post(f"{API_URL}/generate_plan", json={"request_text": plan_query}, timeout=300)
+                        resp = api.post("/generate_plan", json={"request_text": plan_query}, timeout=300, invalidate=False)
                         
                         if resp.status_code == 200:
                             plan_data = resp.json()
@@ -1275,10 +1321,10 @@ if right_col:
                             # AUTO-SAVE: Persist the new plan
                             try:
                                 num_days = max([t.get("day", 1) for t in raw_plan]) if raw_plan else 0
-                                save_resp = requests.post(f"{API_URL}/student/save_plan", json={
+                                save_resp = api.post("/student/save_plan", json={
                                     "topics": raw_plan,
                                     "num_days": num_days
-                                }, timeout=5)
+                                }, params={"student_id": STUDENT_ID}, timeout=5)
                                 
                                 if save_resp.status_code == 200:
                                     st.toast(f"💾 Progress saved: {len(raw_plan)} topics", icon="✅")
@@ -1349,7 +1395,7 @@ if right_col:
                         if quiz_key not in st.session_state:
                             with st.spinner(f"🤖 Generating quiz for '{task['title']}'..."):
                                 try:
-                                    resp = requests.post(f"{API_URL}/generate_quiz", json={"topic": task['title']}, timeout=120)
+                                    resp = api.post("/generate_quiz", json={"topic": task['title'], "subject": task.get("subject")}, timeout=120, invalidate=False)
                                     if resp.status_code == 200:
                                         st.session_state[quiz_key] = resp.json().get("quiz", [])
                                     else:
@@ -1430,14 +1476,14 @@ if right_col:
                                     # AUTO-SAVE: Persist quiz score and completion
                                     try:
                                         subject = task.get("subject", "General")
-                                        requests.post(f"{API_URL}/student/quiz_complete", json={
+                                        api.post("/student/quiz_complete", json={
                                             "topic_id": task["id"],
                                             "topic_title": task["title"],
                                             "subject": subject,
                                             "score": score,
                                             "total": len(quiz_data),
                                             "time_taken": 0
-                                        }, timeout=5)
+                                        }, params={"student_id": STUDENT_ID}, timeout=5)
                                     except Exception:
                                         pass  # Silent fail for auto-save
                                     
@@ -1454,3 +1500,18 @@ if right_col:
             else:
                 with st.container(border=True):
                     st.markdown(f"🔒 <span style='color:gray'>{task['title']}</span>", unsafe_allow_html=True)
+
+
+# PERSISTENCE: Confirm the background day-progress save started on first load
+if "pending_progress_save" in st.session_state:
+    future, advanced_day = st.session_state.pop("pending_progress_save")
+    try:
+        resp = future.result(timeout=10)
+        saved = resp.status_code == 200
+    except Exception:
+        saved = False
+    if not saved:
+        # Nothing was stored, so the next visit recomputes the same day
+        st.toast("⚠️ Could not save today's progress", icon="⚠️")
+    elif advanced_day is not None:
+        st.toast(f"📅 Advanced to Day {advanced_day}! New topics unlocked", icon="🎯")
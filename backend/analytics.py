@@ -0,0 +1,215 @@
+"""
+Student Analytics - Vectorized per-subject aggregates and score trends.
+Builds the analytics dialog's numbers (completion, average score, strong /
+moderate / needs-work buckets) and time series from quiz history and study
+time with pandas/NumPy. Results are cached per student and dropped on the
+next quiz or plan event.
+"""
+import threading
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Score buckets used by the analytics dialog (percent, lower bound inclusive)
+STRONG_THRESHOLD = 75
+MODERATE_THRESHOLD = 50
+
+# Slope (percentage points per attempt) below which a subject counts as flat
+TREND_FLAT_SLOPE = 1.0
+
+
+def _topics_frame(subject_index: Dict[str, List[dict]]) -> pd.DataFrame:
+    """One row per plan topic with its subject and latest score (NaN if never quizzed)"""
+    rows = []
+    for subject, topics in subject_index.items():
+        for topic in topics:
+            score = topic.get("score_data") or {}
+            rows.append({
+                "subject": subject,
+                "id": topic.get("id"),
+                "title": topic.get("title"),
+                "status": topic.get("status"),
+                "score": score.get("score"),
+                "total": score.get("total"),
+                "percentage": score.get("percentage")
+            })
+    frame = pd.DataFrame(rows, columns=["subject", "id", "title", "status", "score", "total", "percentage"])
+    frame["percentage"] = pd.to_numeric(frame["percentage"], errors="coerce")
+    return frame
+
+
+def _subject_summaries(topics: pd.DataFrame) -> Dict[str, dict]:
+    if topics.empty:
+        return {}
+
+    quizzed = topics["percentage"].notna()
+    topics = topics.assign(
+        completed=topics["status"].eq("completed"),
+        quizzed=quizzed,
+        bucket=np.select(
+            [topics["percentage"] >= STRONG_THRESHOLD, topics["percentage"] >= MODERATE_THRESHOLD, quizzed],
+            ["strong", "moderate", "needs_work"],
+            default=""
+        )
+    )
+    grouped = topics.groupby("subject", sort=False).agg(
+        total_topics=("id", "size"),
+        completed=("completed", "sum"),
+        quizzes_taken=("quizzed", "sum"),
+        avg_score=("percentage", "mean")
+    )
+    grouped["completion_pct"] = grouped["completed"] / grouped["total_topics"] * 100
+    grouped["quiz_completion_pct"] = grouped["quizzes_taken"] / grouped["total_topics"] * 100
+    grouped["avg_score"] = grouped["avg_score"].fillna(0.0)
+
+    summaries = {}
+    for subject, row in grouped.iterrows():
+        subject_topics = topics[topics["subject"] == subject]
+        buckets = {}
+        for bucket in ("strong", "moderate", "needs_work"):
+            picked = subject_topics[subject_topics["bucket"] == bucket]
+            buckets[bucket] = [
+                {
+                    "id": int(t.id) if pd.notna(t.id) else None,
+                    "title": t.title,
+                    "score": int(t.score),
+                    "total": int(t.total),
+                    "percentage": round(float(t.percentage), 2)
+                }
+                for t in picked.itertuples()
+            ]
+        summaries[subject] = {
+            "total_topics": int(row["total_topics"]),
+            "completed": int(row["completed"]),
+            "completion_pct": round(float(row["completion_pct"]), 2),
+            "quizzes_taken": int(row["quizzes_taken"]),
+            "quiz_completion_pct": round(float(row["quiz_completion_pct"]), 2),
+            "avg_score": round(float(row["avg_score"]), 2),
+            **buckets
+        }
+    return summaries
+
+
+def _slope(values: pd.Series) -> float:
+    """Least-squares slope of scores over attempt number"""
+    if len(values) < 2:
+        return 0.0
+    return float(np.polyfit(np.arange(len(values)), values.to_numpy(dtype=float), 1)[0])
+
+
+def _quiz_trends(quiz_history: List[dict]) -> dict:
+    if not quiz_history:
+        return {"daily": [], "by_subject": {}}
+
+    quizzes = pd.DataFrame(quiz_history)
+    quizzes["timestamp"] = pd.to_datetime(quizzes["timestamp"], errors="coerce")
+    quizzes["percentage"] = pd.to_numeric(quizzes["percentage"], errors="coerce")
+    quizzes = quizzes.dropna(subset=["timestamp", "percentage"]).sort_values("timestamp")
+    if quizzes.empty:
+        return {"daily": [], "by_subject": {}}
+
+    daily = quizzes.groupby(quizzes["timestamp"].dt.date)["percentage"].agg(["mean", "count"])
+    by_subject = {}
+    for subject, group in quizzes.groupby("subject", sort=False):
+        scores = group["percentage"]
+        slope = _slope(scores)
+        if slope > TREND_FLAT_SLOPE:
+            direction = "improving"
+        elif slope < -TREND_FLAT_SLOPE:
+            direction = "declining"
+        else:
+            direction = "flat"
+        by_subject[subject] = {
+            "attempts": int(len(scores)),
+            "mean": round(float(scores.mean()), 2),
+            "last": round(float(scores.iloc[-1]), 2),
+            # Mean of the last three attempts
+            "rolling_mean": round(float(scores.rolling(3, min_periods=1).mean().iloc[-1]), 2),
+            "slope_per_attempt": round(slope, 2),
+            "trend": direction
+        }
+
+    return {
+        "daily": [
+            {"date": day.isoformat(), "avg_score": round(float(row["mean"]), 2), "quizzes": int(row["count"])}
+            for day, row in daily.iterrows()
+        ],
+        "by_subject": by_subject
+    }
+
+
+def _study_time(time_tracking: dict, topics: pd.DataFrame) -> dict:
+    topics_time = (time_tracking or {}).get("topics_time") or {}
+    minutes = pd.Series(topics_time, dtype=float)
+    by_subject = {}
+    if not minutes.empty and not topics.empty:
+        # Time is keyed by topic ID (stored as text)
+        subject_of = topics.dropna(subset=["id"]).assign(key=lambda f: f["id"].astype(int).astype(str))
+        subject_of = subject_of.set_index("key")["subject"]
+        per_subject = minutes.groupby(minutes.index.map(subject_of).fillna("Unassigned")).sum()
+        by_subject = {subject: int(total) for subject, total in per_subject.items()}
+    return {
+        "total_minutes": int((time_tracking or {}).get("total_study_time_minutes") or 0),
+        "by_subject": by_subject
+    }
+
+
+def compute_analytics(subject_index: Dict[str, List[dict]], quiz_history: List[dict], time_tracking: dict) -> dict:
+    """Per-subject aggregates, quiz score trends and study time for one student"""
+    topics = _topics_frame(subject_index)
+    subjects = _subject_summaries(topics)
+    quizzed = topics["percentage"].dropna()
+    return {
+        "subjects": subjects,
+        "overall": {
+            "total_topics": int(len(topics)),
+            "completed": int(topics["status"].eq("completed").sum()),
+            "quizzes_taken": int(len(quiz_history)),
+            "avg_score": round(float(quizzed.mean()), 2) if not quizzed.empty else 0.0
+        },
+        "trends": _quiz_trends(quiz_history),
+        "study_time": _study_time(time_tracking, topics)
+    }
+
+
+class AnalyticsCache:
+    """Per-student analytics results, kept until that student's next quiz or plan event"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._entries = {}
+        # Bumped on every invalidation so a result computed across an event is not stored
+        self._generations = {}
+        self._stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    def get(self, student_id: str):
+        with self.lock:
+            entry = self._entries.get(student_id)
+            if entry is None:
+                self._stats["misses"] += 1
+            else:
+                self._stats["hits"] += 1
+            return entry
+
+    def generation(self, student_id: str) -> int:
+        with self.lock:
+            return self._generations.get(student_id, 0)
+
+    def put(self, student_id: str, analytics: dict, generation: int):
+        """Store a result unless the student had an event since generation was read"""
+        with self.lock:
+            if self._generations.get(student_id, 0) == generation:
+                self._entries[student_id] = analytics
+
+    def invalidate(self, student_id: str):
+        with self.lock:
+            self._generations[student_id] = self._generations.get(student_id, 0) + 1
+            if self._entries.pop(student_id, None) is not None:
+                self._stats["invalidations"] += 1
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        return stats
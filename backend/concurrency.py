@@ -0,0 +1,190 @@
+"""
+RAG Executor - Runs blocking RAG calls off the event loop.
+A shared, bounded thread pool executes the work, and each endpoint has its
+own cap on concurrent calls plus a bounded wait queue; callers beyond that
+get a 429 so the server sheds load instead of stalling.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterator
+
+from fastapi import HTTPException
+
+# Sentinel returned by next() when a streamed generator is exhausted
+_END = object()
+
+
+class EndpointLimiter:
+    """Concurrency cap and bounded queue for a single endpoint"""
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._active = 0
+        self._waiting = 0
+        self._stats = {"completed": 0, "rejected": 0, "timed_out": 0, "total_wait_ms": 0.0}
+
+    def _reject(self, reason: str):
+        self._stats["rejected"] += 1
+        raise HTTPException(
+            status_code=429,
+            detail=f"{self.name} is busy ({reason}), please retry shortly",
+            headers={"Retry-After": "2"}
+        )
+
+    async def acquire(self):
+        """Wait for a slot, or raise 429 if the queue is full or the wait times out"""
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            self._reject("queue full")
+
+        started = time.perf_counter()
+        self._waiting += 1
+        acquired = False
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await self._semaphore.acquire()
+                acquired = True
+        except TimeoutError:
+            if acquired:
+                # The deadline hit just as a slot was granted; hand it back
+                self._semaphore.release()
+            self._stats["timed_out"] += 1
+            self._reject("timed out waiting for a slot")
+        except BaseException:
+            if acquired:
+                self._semaphore.release()
+            raise
+        finally:
+            self._waiting -= 1
+        self._stats["total_wait_ms"] += (time.perf_counter() - started) * 1000
+        self._active += 1
+
+    def release(self):
+        self._active -= 1
+        self._stats["completed"] += 1
+        self._semaphore.release()
+
+    async def run(self, executor: ThreadPoolExecutor, fn: Callable, *args, **kwargs):
+        """Wait for a slot (or reject), then run fn on the executor"""
+        await self.acquire()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(executor, partial(fn, *args, **kwargs))
+        finally:
+            self.release()
+
+    def get_stats(self) -> dict:
+        stats = dict(self._stats)
+        stats["total_wait_ms"] = round(stats["total_wait_ms"], 2)
+        stats.update({
+            "active": self._active,
+            "waiting": self._waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue
+        })
+        return stats
+
+
+class SlotStream:
+    """
+    Async iterator over a blocking generator that owns an endpoint slot.
+    The slot is released exactly once: when the stream ends, fails, is
+    cancelled or closed, or when it is dropped without ever being iterated
+    (e.g. the response body never started).
+    """
+
+    def __init__(self, executor: ThreadPoolExecutor, limiter: EndpointLimiter, generator: Iterator):
+        self._executor = executor
+        self._limiter = limiter
+        self._generator = generator
+        self._released = False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._released:
+            raise StopAsyncIteration
+        loop = asyncio.get_running_loop()
+        try:
+            # Each next() may block on retrieval or the LLM, so pull items on the pool
+            item = await loop.run_in_executor(self._executor, next, self._generator, _END)
+        except BaseException:
+            self.release()
+            raise
+        if item is _END:
+            self.release()
+            raise StopAsyncIteration
+        return item
+
+    async def aclose(self):
+        self.release()
+
+    def release(self):
+        if self._released:
+            return
+        self._released = True
+        self._limiter.release()
+        try:
+            self._generator.close()
+        except ValueError:
+            # Still running on a worker thread; it is closed once collected
+            pass
+
+    def __del__(self):
+        self.release()
+
+
+class RAGExecutor:
+    """Shared worker pool plus per-endpoint limiters"""
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.executor = ThreadPoolExecutor(max_workers=config.get("workers", 8), thread_name_prefix="rag")
+        self.limiters: Dict[str, EndpointLimiter] = {}
+        self.lock = threading.Lock()
+
+    def _limiter(self, endpoint: str) -> EndpointLimiter:
+        with self.lock:
+            if endpoint not in self.limiters:
+                limits = self.config.get("limits", {}).get(endpoint, {})
+                self.limiters[endpoint] = EndpointLimiter(
+                    endpoint,
+                    max_concurrent=limits.get("max_concurrent", 2),
+                    max_queue=limits.get("max_queue", 8),
+                    queue_timeout=self.config.get("queue_timeout", 30)
+                )
+            return self.limiters[endpoint]
+
+    async def run(self, endpoint: str, fn: Callable, *args, **kwargs):
+        """Run a blocking function for an endpoint under its limits"""
+        return await self._limiter(endpoint).run(self.executor, fn, *args, **kwargs)
+
+    async def stream(self, endpoint: str, fn: Callable, *args, **kwargs) -> "SlotStream":
+        """
+        Reserve a slot for a blocking generator and return an async iterator over it.
+        The slot is taken before returning (so 429 can still be sent) and held
+        until the stream finishes, fails or is closed.
+        """
+        limiter = self._limiter(endpoint)
+        await limiter.acquire()
+        try:
+            generator = fn(*args, **kwargs)
+        except BaseException:
+            limiter.release()
+            raise
+        return SlotStream(self.executor, limiter, generator)
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            limiters = dict(self.limiters)
+        return {name: limiter.get_stats() for name, limiter in limiters.items()}
@@ -13,24 +13,150 @@ class LLMProvider(Enum):
 # Read from environment variable, default to Ollama (local)
 USE_PROVIDER = os.getenv("LLM_PROVIDER", "ollama").lower()
 
-# Configuration for both providers
-CONFIG = {
-    "llm_provider": LLMProvider.OLLAMA if USE_PROVIDER == "ollama" else LLMProvider.HUGGINGFACE,
-    
-    # Local Ollama configuration (offline mode)
-    "ollama": {
-        "model": "llama3.2:1b",
-        "base_url": "http://localhost:11434"
-    },
-    
-    # Hugging Face configuration (cloud demo mode)
-    "huggingface": {
-        "model": "meta-llama/Meta-Llama-3-8B-Instruct",
-        "api_token": os.getenv("HUGGINGFACE_API_TOKEN", ""),
-        "max_length": 512,
-        "temperature": 0.7
+def _load_config():
+    """Build the configuration dict from the current environment"""
+    use_provider = os.getenv("LLM_PROVIDER", "ollama").lower()
+
+    return {
+        "llm_provider": LLMProvider.OLLAMA if use_provider == "ollama" else LLMProvider.HUGGINGFACE,
+        
+        # Local Ollama configuration (offline mode)
+        "ollama": {
+            "model": "llama3.2:1b",
+            "base_url": "http://localhost:11434",
+            # Keep the model resident between requests instead of reloading it
+            "keep_alive": os.getenv("OLLAMA_KEEP_ALIVE", "30m"),
+            "max_concurrency": int(os.getenv("OLLAMA_MAX_CONCURRENCY", "2"))
+        },
+        
+        # Hugging Face configuration (cloud demo mode)
+        "huggingface": {
+            "model": "meta-llama/Meta-Llama-3-8B-Instruct",
+            "api_token": os.getenv("HUGGINGFACE_API_TOKEN", ""),
+            "max_length": 512,
+            "temperature": 0.7,
+            "max_concurrency": int(os.getenv("HUGGINGFACE_MAX_CONCURRENCY", "4"))
+        },
+
+        # Embedding model used for indexing and retrieval (always served by Ollama)
+        "embeddings": {
+            "model": "nomic-embed-text",
+            "base_url": "http://localhost:11434",
+            # On-disk LRU cache of query embeddings
+            "cache_path": os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache/cache.sqlite3"),
+            "cache_max_entries": int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+        },
+
+        # Vector backend, Chroma collection and its HNSW index; HNSW changes take effect
+        # after `python -m backend.vector_maintenance rebuild`
+        "vector_store": {
+            # "chroma" (persistent HNSW) or "numpy" (memory-mapped, exact search)
+            "backend": os.getenv("VECTOR_BACKEND", "chroma").lower(),
+            "numpy_path": os.getenv("NUMPY_STORE_PATH", "./numpy_store"),
+            "collection_name": "langchain",
+            "hnsw": {
+                "space": os.getenv("HNSW_SPACE", "l2"),
+                # Graph degree: higher = better recall, more memory
+                "M": int(os.getenv("HNSW_M", "16")),
+                # Candidate list size while building: higher = better graph, slower ingest
+                "construction_ef": int(os.getenv("HNSW_EF_CONSTRUCTION", "100")),
+                # Candidate list size while querying: higher = better recall, slower queries
+                "search_ef": int(os.getenv("HNSW_EF_SEARCH", "50"))
+            }
+        },
+
+        # Document ingestion pipeline (load -> split -> embed -> upsert)
+        "ingestion": {
+            "chunk_size": 1000,
+            "chunk_overlap": 200,
+            "embed_batch_size": int(os.getenv("INGEST_EMBED_BATCH_SIZE", "32")),
+            "embed_workers": int(os.getenv("INGEST_EMBED_WORKERS", str(min(8, os.cpu_count() or 1)))),
+            "upsert_batch_size": 1000,
+            # Uploads are streamed to disk in blocks; larger files are rejected with 413
+            "max_upload_mb": int(os.getenv("UPLOAD_MAX_MB", "200")),
+            "upload_block_size": 1024 * 1024,
+            # PDFs are read lazily; at most this many pages are held in memory at once
+            "max_pages_in_flight": int(os.getenv("INGEST_MAX_PAGES_IN_FLIGHT", "16")),
+            # Background ingestion jobs run concurrently up to this many
+            "job_workers": int(os.getenv("INGEST_JOB_WORKERS", "1"))
+        },
+
+        # Executor for blocking RAG endpoints; requests beyond
+        # max_concurrent + max_queue are rejected with 429
+        "rag_executor": {
+            "workers": int(os.getenv("RAG_EXECUTOR_WORKERS", "8")),
+            "queue_timeout": float(os.getenv("RAG_QUEUE_TIMEOUT", "30")),
+            "limits": {
+                "query": {"max_concurrent": 4, "max_queue": 16},
+                "generate_lesson": {"max_concurrent": 2, "max_queue": 8},
+                "generate_quiz": {"max_concurrent": 2, "max_queue": 8},
+                "generate_plan": {"max_concurrent": 1, "max_queue": 4}
+            }
+        },
+
+        # Server-side cache of generated lessons and quizzes
+        "response_cache": {
+            "max_entries": int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "500")),
+            "ttl_seconds": float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400"))
+        },
+
+        # Retrieval: dense + BM25 keyword search fused with reciprocal-rank fusion
+        "retrieval": {
+            "hybrid": os.getenv("RETRIEVAL_HYBRID", "true").lower() == "true",
+            "keyword_index_path": os.getenv("KEYWORD_INDEX_PATH", "./keyword_index/index.sqlite3"),
+            # Candidates pulled from each retriever before fusion
+            "candidate_k": int(os.getenv("RETRIEVAL_CANDIDATE_K", "20")),
+            "rrf_k": 60,
+            # Chunks that end up in each prompt
+            "k": {
+                "lesson": int(os.getenv("RETRIEVAL_LESSON_K", "5")),
+                "query": int(os.getenv("RETRIEVAL_QUERY_K", "3")),
+                "quiz": int(os.getenv("RETRIEVAL_QUIZ_K", "3"))
+            }
+        },
+
+        # Per-subject mastery aggregates (updated in O(1) per quiz)
+        "mastery": {
+            # Weight of the newest score in the recent-performance average
+            "ewma_alpha": float(os.getenv("MASTERY_EWMA_ALPHA", "0.3")),
+            # Uniform sample of past scores kept per subject
+            "reservoir_size": int(os.getenv("MASTERY_RESERVOIR_SIZE", "20"))
+        },
+
+        # Student profiles: reads served from memory; progress and study-time
+        # updates are written behind, coalesced per burst
+        "profile_cache": {
+            # Quiet period before a burst of updates is flushed
+            "flush_delay": float(os.getenv("PROFILE_FLUSH_DELAY", "0.5")),
+            # Upper bound on how long updates stay in memory only
+            "max_flush_delay": float(os.getenv("PROFILE_MAX_FLUSH_DELAY", "2.0"))
+        },
+
+        # Background connectivity probe behind /connectivity; offline deployments
+        # point the targets at a local mirror or proxy (host:port or http(s) URLs)
+        "connectivity": {
+            "targets": [
+                t.strip() for t in
+                os.getenv("CONNECTIVITY_TARGETS", "google.com:443,cloudflare.com:443,github.com:443").split(",")
+                if t.strip()
+            ],
+            "interval_seconds": float(os.getenv("CONNECTIVITY_INTERVAL_SECONDS", "30")),
+            # Results older than this are reported as unknown
+            "ttl_seconds": float(os.getenv("CONNECTIVITY_TTL_SECONDS", "90")),
+            "timeout_seconds": float(os.getenv("CONNECTIVITY_TIMEOUT_SECONDS", "2"))
+        }
     }
-}
+
+# Configuration for both providers
+CONFIG = _load_config()
+
+def reload_config():
+    """Re-read settings from the environment (updates CONFIG in place)"""
+    global USE_PROVIDER
+    USE_PROVIDER = os.getenv("LLM_PROVIDER", "ollama").lower()
+    CONFIG.clear()
+    CONFIG.update(_load_config())
+    return CONFIG
 
 def get_llm_provider():
     """Get the current LLM provider"""
@@ -41,6 +167,42 @@ def get_llm_config():
     provider = get_llm_provider()
     return CONFIG[provider.value]
 
+def get_embedding_config():
+    """Get configuration for the embedding model"""
+    return CONFIG["embeddings"]
+
+def get_vector_store_config():
+    """Get configuration for the Chroma collection and HNSW index"""
+    return CONFIG["vector_store"]
+
+def get_ingestion_config():
+    """Get configuration for the ingestion pipeline"""
+    return CONFIG["ingestion"]
+
+def get_rag_executor_config():
+    """Get configuration for the RAG endpoint executor"""
+    return CONFIG["rag_executor"]
+
+def get_response_cache_config():
+    """Get configuration for the lesson/quiz response cache"""
+    return CONFIG["response_cache"]
+
+def get_retrieval_config():
+    """Get configuration for hybrid retrieval"""
+    return CONFIG["retrieval"]
+
+def get_mastery_config():
+    """Get configuration for subject mastery aggregates"""
+    return CONFIG["mastery"]
+
+def get_profile_cache_config():
+    """Get configuration for the student profile cache and write-behind"""
+    return CONFIG["profile_cache"]
+
+def get_connectivity_config():
+    """Get configuration for the connectivity monitor"""
+    return CONFIG["connectivity"]
+
 def is_local_mode():
     """Check if running in local (offline) mode"""
     return get_llm_provider() == LLMProvider.OLLAMA
@@ -0,0 +1,112 @@
+"""
+Connectivity Monitor - Background reachability probe for online features.
+A daemon thread opens TCP connections to the configured targets on a fixed
+interval and caches the outcome, so /connectivity answers from memory and
+no request ever waits on a network timeout.
+"""
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Tuple
+from urllib.parse import urlsplit
+
+
+def parse_target(target: str) -> Tuple[str, int]:
+    """(host, port) from "host:port", "[v6addr]:port", "host" or an http(s) URL"""
+    # Bare targets are parsed as a network location so IPv6 brackets are handled
+    parsed = urlsplit(target if "://" in target else f"//{target}")
+    default_port = 80 if parsed.scheme == "http" else 443
+    return parsed.hostname, parsed.port or default_port
+
+
+class ConnectivityMonitor:
+    """Probes targets on a schedule and serves the last result until it expires"""
+
+    def __init__(self, config: dict):
+        self.config = config
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        self._result = None
+        self._stats = {"probes": 0, "failures": 0}
+
+    def _probe_one(self, target: str) -> float:
+        """Connect to one target; returns the connect time in ms"""
+        host, port = parse_target(target)
+        t0 = time.perf_counter()
+        with socket.create_connection((host, port), timeout=self.config.get("timeout_seconds", 2.0)):
+            pass
+        return (time.perf_counter() - t0) * 1000
+
+    def probe(self) -> dict:
+        """Probe every target concurrently; online as soon as any one answers"""
+        targets = list(self.config.get("targets", []))
+        reachable, latency_ms, errors = None, None, {}
+        if targets:
+            with ThreadPoolExecutor(max_workers=len(targets)) as pool:
+                futures = {pool.submit(self._probe_one, t): t for t in targets}
+                for future in as_completed(futures):
+                    target = futures[future]
+                    try:
+                        latency = future.result()
+                    except Exception as e:
+                        errors[target] = str(e)
+                        continue
+                    if reachable is None:
+                        reachable, latency_ms = target, round(latency, 2)
+
+        result = {
+            "online": reachable is not None,
+            "reachable_target": reachable,
+            "latency_ms": latency_ms,
+            "errors": errors,
+            "checked_at": time.time()
+        }
+        with self.lock:
+            self._result = result
+            self._stats["probes"] += 1
+            if reachable is None:
+                self._stats["failures"] += 1
+        return result
+
+    def _loop(self):
+        while not self.stop_event.is_set():
+            try:
+                self.probe()
+            except Exception as e:
+                print(f"Connectivity probe failed: {e}")
+            self.stop_event.wait(self.config.get("interval_seconds", 30.0))
+
+    def start(self):
+        """Start the probe thread (the first probe runs immediately)"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, name="connectivity-monitor", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=timeout)
+            self.thread = None
+
+    def get_status(self) -> dict:
+        """Last probe result; online is None before the first probe or once it is older than the TTL"""
+        with self.lock:
+            result = dict(self._result) if self._result else None
+        if result is None:
+            return {"online": None, "stale": True, "checked_at": None, "age_seconds": None,
+                    "targets": self.config.get("targets", [])}
+        age = time.time() - result["checked_at"]
+        result["age_seconds"] = round(age, 1)
+        result["stale"] = age > self.config.get("ttl_seconds", 90.0)
+        if result["stale"]:
+            result["online"] = None
+        result["targets"] = self.config.get("targets", [])
+        return result
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return dict(self._stats)
@@ -1,9 +1,18 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, ForeignKey
+from sqlalchemy import create_engine, event, inspect, text, Column, Integer, String, Boolean, Float, JSON, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 DATABASE_URL = "sqlite:///./focusflow.db"
 
 engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers run alongside a writer; busy_timeout queues concurrent writers"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -15,6 +24,24 @@ class Source(Base):
     type = Column(String)  # online/offline
     file_path = Column(String)
     is_active = Column(Boolean, default=True)
+    content_hash = Column(String, index=True)  # sha256 of the raw file
+    chunk_count = Column(Integer, default=0)
+    subject = Column(String, index=True, nullable=True)
+    detected_subject = Column(String, nullable=True)  # from content/filename, used when subject is unset
+    topics_indexed_at = Column(String, nullable=True)  # set once the topic index is built, even if it is empty
+
+class SourceTopic(Base):
+    """Outline/heading entries of a source, extracted once at ingest"""
+    __tablename__ = "source_topics"
+    __table_args__ = (Index("ix_source_topics_source_position", "source_id", "position"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_id = Column(Integer, ForeignKey("sources.id"))
+    position = Column(Integer)  # document order
+    title = Column(String)
+    level = Column(Integer, default=0)  # 0 = chapter
+    page = Column(Integer, nullable=True)
+    origin = Column(String)  # outline, heading or sentence
 
 class Schedule(Base):
     __tablename__ = "schedule"
@@ -33,9 +60,136 @@ class Mastery(Base):
     quiz_score = Column(Integer, default=0)
     flashcard_status = Column(String, default="Not Started")
 
+class IngestJob(Base):
+    __tablename__ = "ingest_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String)  # file/url
+    target = Column(String)  # file path or URL
+    filename = Column(String)
+    content_hash = Column(String)
+    subject = Column(String, nullable=True)
+    status = Column(String, index=True, default="queued")  # queued/running/done/failed
+    stage = Column(String, default="queued")
+    chunks_total = Column(Integer, default=0)
+    chunks_done = Column(Integer, default=0)
+    pages_total = Column(Integer, default=0)
+    pages_done = Column(Integer, default=0)
+    source_id = Column(Integer, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(Float)
+    started_at = Column(Float, nullable=True)
+    stage_started_at = Column(Float, nullable=True)
+    finished_at = Column(Float, nullable=True)
+
+# ========== STUDENT PROFILES (one set of rows per student_id) ==========
+
+class StudentProfile(Base):
+    __tablename__ = "student_profiles"
+
+    student_id = Column(String, primary_key=True)
+    created_at = Column(String)
+    last_active = Column(String)
+    current_study_day = Column(Integer, default=1)
+    last_access_date = Column(String)  # YYYY-MM-DD
+    current_topic_id = Column(Integer, nullable=True)
+    plan_id = Column(String, nullable=True)
+    plan_created_at = Column(String, nullable=True)
+    plan_num_days = Column(Integer, default=0)
+    plan_topics = Column(JSON, default=list)
+    total_study_time_minutes = Column(Integer, default=0)
+
+class QuizResult(Base):
+    __tablename__ = "quiz_results"
+    __table_args__ = (Index("ix_quiz_results_student_subject", "student_id", "subject"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(String, index=True)
+    topic_id = Column(Integer)
+    topic_title = Column(String)
+    subject = Column(String)
+    timestamp = Column(String)
+    score = Column(Integer)
+    total = Column(Integer)
+    percentage = Column(Float)
+    time_taken_seconds = Column(Integer, default=0)
+
+class SubjectMastery(Base):
+    __tablename__ = "subject_mastery"
+    __table_args__ = (UniqueConstraint("student_id", "subject", name="uq_subject_mastery_student_subject"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(String, index=True)
+    subject = Column(String)
+    avg_score = Column(Float, default=0)  # running mean
+    topics_completed = Column(Integer, default=0)
+    total_topics = Column(Integer, default=0)
+    mastery_level = Column(String, default="medium")
+    score_count = Column(Integer, default=0)
+    score_m2 = Column(Float, default=0)  # Welford sum of squared deviations
+    recent_score = Column(Float, nullable=True)  # exponentially weighted mean
+    score_samples = Column(JSON, default=list)  # bounded reservoir of past scores
+
+class TopicTime(Base):
+    __tablename__ = "topic_time"
+    __table_args__ = (UniqueConstraint("student_id", "topic_id", name="uq_topic_time_student_topic"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(String, index=True)
+    topic_id = Column(String)
+    minutes = Column(Integer, default=0)
+
+class IncompleteTask(Base):
+    __tablename__ = "incomplete_tasks"
+    __table_args__ = (UniqueConstraint("student_id", "topic_id", name="uq_incomplete_tasks_student_topic"),)
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(String, index=True)
+    topic_id = Column(Integer)
+    from_day = Column(Integer)
+    reason = Column(String, default="not_completed")
+    added_at = Column(String)
+
+class SubjectTopic(Base):
+    """Subject -> topic -> latest score index, maintained on plan save and quiz completion"""
+    __tablename__ = "subject_topics"
+    __table_args__ = (
+        UniqueConstraint("student_id", "topic_id", name="uq_subject_topics_student_topic"),
+        Index("ix_subject_topics_student_subject", "student_id", "subject"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    student_id = Column(String, index=True)
+    subject = Column(String)
+    topic_id = Column(Integer)
+    title = Column(String)
+    day = Column(Integer, nullable=True)
+    position = Column(Integer, default=0)  # order within the plan
+    status = Column(String, default="locked")
+    quiz_passed = Column(Boolean, default=False)
+    score = Column(Integer, nullable=True)  # latest quiz attempt
+    total = Column(Integer, nullable=True)
+    percentage = Column(Float, nullable=True)
+    updated_at = Column(String)
+
+def _add_missing_columns():
+    """Add columns introduced after a table was created (create_all never alters tables)"""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {col["name"] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            col_type = column.type.compile(dialect=engine.dialect)
+            with engine.begin() as conn:
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}"))
+
 # Create tables
 def init_db():
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
 
 if __name__ == "__main__":
     init_db()
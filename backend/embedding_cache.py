@@ -0,0 +1,148 @@
+"""
+Embedding Cache - Persistent, size-bounded LRU cache of query embeddings.
+Entries are keyed by embedding model and text hash and stored in SQLite.
+Hits only note their recency in memory; last_used is written in batches.
+"""
+import hashlib
+import sqlite3
+import threading
+import time
+from array import array
+from pathlib import Path
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+
+class EmbeddingCache:
+    """SQLite-backed LRU store of embedding vectors"""
+
+    def __init__(self, path: str, max_entries: int = 10000, touch_batch: int = 256, touch_interval: float = 30.0):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        # Recency of hits is kept in memory and flushed after this many keys or seconds
+        self.touch_batch = touch_batch
+        self.touch_interval = touch_interval
+        self._touched = {}
+        self._last_touch_flush = time.monotonic()
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT, vector BLOB, last_used REAL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+        self.conn.commit()
+        self._size = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "recency_flushes": 0}
+
+    @staticmethod
+    def make_key(model: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{text}".encode("utf-8")).hexdigest()
+
+    def get(self, model: str, text: str) -> Optional[List[float]]:
+        """Look up a vector, noting its recency on hit (written with the next batch)"""
+        key = self.make_key(model, text)
+        with self.lock:
+            row = self.conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["hits"] += 1
+            self._touched[key] = time.time()
+            if (len(self._touched) >= self.touch_batch
+                    or time.monotonic() - self._last_touch_flush >= self.touch_interval):
+                self._flush_touched()
+                self.conn.commit()
+        return array("d", row[0]).tolist()
+
+    def _flush_touched(self):
+        """Write pending last_used updates in one statement (caller holds the lock and commits)"""
+        self._last_touch_flush = time.monotonic()
+        if not self._touched:
+            return
+        self.conn.executemany(
+            "UPDATE embeddings SET last_used = ? WHERE key = ?",
+            [(last_used, key) for key, last_used in self._touched.items()]
+        )
+        self._touched.clear()
+        self._stats["recency_flushes"] += 1
+
+    def flush(self):
+        """Write recency of recent hits to disk"""
+        with self.lock:
+            self._flush_touched()
+            self.conn.commit()
+
+    def put(self, model: str, text: str, vector: List[float]):
+        """Store a vector, evicting the least recently used entries past the limit"""
+        key = self.make_key(model, text)
+        blob = array("d", vector).tobytes()
+        with self.lock:
+            exists = self.conn.execute("SELECT 1 FROM embeddings WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector, last_used) VALUES (?, ?, ?, ?)",
+                (key, model, blob, time.time())
+            )
+            if exists is None:
+                self._size += 1
+            overflow = self._size - self.max_entries
+            if overflow > 0:
+                # Eviction order must see the latest hits
+                self._flush_touched()
+                self.conn.execute(
+                    "DELETE FROM embeddings WHERE key IN "
+                    "(SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,)
+                )
+                self._size -= overflow
+                self._stats["evictions"] += overflow
+            self.conn.commit()
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM embeddings")
+            self.conn.commit()
+            self._touched.clear()
+            self._size = 0
+
+    def close(self):
+        with self.lock:
+            self._flush_touched()
+            self.conn.commit()
+            self.conn.close()
+
+    def get_stats(self) -> dict:
+        """Get hit/miss/eviction counters and current size"""
+        with self.lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._size
+        lookups = stats["hits"] + stats["misses"]
+        stats["max_entries"] = self.max_entries
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that serves repeated queries from the cache.
+    Document embeddings pass straight through: ingest already skips
+    unchanged chunks, and caching them would evict hot queries.
+    """
+
+    def __init__(self, inner: Embeddings, cache: EmbeddingCache, model: str):
+        self.inner = inner
+        self.cache = cache
+        self.model = model
+
+    def embed_query(self, text: str) -> List[float]:
+        vector = self.cache.get(self.model, text)
+        if vector is None:
+            vector = self.inner.embed_query(text)
+            self.cache.put(self.model, text, vector)
+        return vector
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.inner.embed_documents(texts)
@@ -0,0 +1,336 @@
+"""
+Ingestion Pipeline - Staged document ingestion into the vector store.
+Splits loaded documents, embeds the chunks in batches across a worker pool
+and bulk-upserts the results, recording per-stage timings. Large documents
+stream through in page windows so memory stays bounded.
+Chunks are keyed by content hash, so re-ingesting a source only embeds
+the chunks that changed. The keyword index (if any) is kept in step.
+"""
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+
+def clean_metadata(metadata: dict) -> dict:
+    """Keep only values Chroma can store (str, int, float, bool)"""
+    cleaned = {}
+    for key, value in metadata.items():
+        if value is None:
+            continue
+        if isinstance(value, (str, int, float, bool)):
+            cleaned[key] = value
+        else:
+            cleaned[key] = str(value)
+    return cleaned
+
+
+def hash_text(text: str) -> str:
+    """sha256 of a chunk's text"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_file(file_path: str, block_size: int = 1024 * 1024) -> str:
+    """sha256 of a file, read in blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class FileTooLargeError(ValueError):
+    """Raised when a streamed upload exceeds the configured size limit"""
+
+
+def save_stream(stream: BinaryIO, dest_path: str, max_bytes: Optional[int] = None,
+                block_size: int = 1024 * 1024) -> Tuple[str, int]:
+    """
+    Copy a stream to disk block by block, hashing as it goes, so the file
+    is written once and never re-read for its checksum.
+    Returns (sha256, size). The partial file is removed on any failure.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(dest_path, "wb") as out:
+            for block in iter(lambda: stream.read(block_size), b""):
+                size += len(block)
+                if max_bytes is not None and size > max_bytes:
+                    raise FileTooLargeError(f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+                digest.update(block)
+                out.write(block)
+    except BaseException:
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        raise
+    return digest.hexdigest(), size
+
+
+def current_rss_mb() -> float:
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # Not Linux: fall back to the lifetime peak
+        import resource
+        import sys
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def page_windows(pages: Iterable[Document], window_size: int) -> Iterator[List[Document]]:
+    """Group a lazy page stream into lists of at most window_size pages"""
+    window = []
+    for page in pages:
+        window.append(page)
+        if len(window) >= window_size:
+            yield window
+            window = []
+    if window:
+        yield window
+
+
+def chunk_id(source: str, content_hash: str) -> str:
+    """Stable vector-store ID for a chunk of a given source"""
+    return hashlib.sha256(f"{source}\n{content_hash}".encode("utf-8")).hexdigest()
+
+
+class IngestPipeline:
+    """Runs split -> embed -> upsert for already-loaded documents"""
+
+    def __init__(self, vector_registry, config: dict, keyword_index=None):
+        self.vector_registry = vector_registry
+        self.config = config
+        self.keyword_index = keyword_index
+        self.lock = threading.Lock()
+        self._totals = {
+            "runs": 0,
+            "chunks": 0,
+            "chunks_embedded": 0,
+            "chunks_skipped": 0,
+            "embed_ms": 0.0,
+            "last_run": None
+        }
+
+    def _split(self, docs: List[Document]) -> List[Document]:
+        splitter = RecursiveCharacterTextSplitter(
+            chunk_size=self.config.get("chunk_size", 1000),
+            chunk_overlap=self.config.get("chunk_overlap", 200)
+        )
+        return splitter.split_documents(docs)
+
+    def _embed(self, texts: List[str], on_batch: Optional[Callable[[int], None]] = None) -> List[List[float]]:
+        """Embed texts in fixed-size batches, fanned out over a thread pool"""
+        batch_size = max(1, self.config.get("embed_batch_size", 32))
+        workers = max(1, self.config.get("embed_workers", 1))
+        embeddings = self.vector_registry.get_embeddings()
+
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        vectors = []
+        if len(batches) <= 1 or workers == 1:
+            for batch in batches:
+                vectors.extend(embeddings.embed_documents(batch))
+                if on_batch:
+                    on_batch(len(vectors))
+            return vectors
+
+        with ThreadPoolExecutor(max_workers=min(workers, len(batches)), thread_name_prefix="embed") as pool:
+            # map() preserves batch order, so vectors stay aligned with texts
+            for batch_vectors in pool.map(embeddings.embed_documents, batches):
+                vectors.extend(batch_vectors)
+                if on_batch:
+                    on_batch(len(vectors))
+        return vectors
+
+    def _upsert(self, ids: List[str], vectors: List[List[float]], splits: List[Document]):
+        """Write precomputed vectors to the store in bulk"""
+        store = self.vector_registry.get_store()
+        batch_size = max(1, self.config.get("upsert_batch_size", 1000))
+        for i in range(0, len(ids), batch_size):
+            batch = splits[i:i + batch_size]
+            store.upsert(
+                ids=ids[i:i + batch_size],
+                embeddings=vectors[i:i + batch_size],
+                documents=[d.page_content for d in batch],
+                metadatas=[clean_metadata(d.metadata) for d in batch]
+            )
+
+    def _update_metadata(self, ids: List[str], splits: List[Document]):
+        """Rewrite metadata of stored chunks (vector store and keyword index) without re-embedding them"""
+        store = self.vector_registry.get_store()
+        batch_size = max(1, self.config.get("upsert_batch_size", 1000))
+        for i in range(0, len(ids), batch_size):
+            store.update_metadata(
+                ids[i:i + batch_size],
+                [clean_metadata(d.metadata) for d in splits[i:i + batch_size]]
+            )
+        if self.keyword_index is not None:
+            self.keyword_index.update_metadata(ids, splits)
+
+    def _existing_ids(self, source: str) -> set:
+        """IDs already stored for a source"""
+        return self.vector_registry.get_store().ids_for_source(source)
+
+    def run(self, docs: List[Document], source: str, load_ms: float = 0.0, progress: Optional[Callable] = None,
+            metadata: Optional[dict] = None) -> dict:
+        """Ingest already-loaded documents of one source (a single window)"""
+        return self.run_windows(iter([docs]), source, load_ms=load_ms, progress=progress, metadata=metadata,
+                                pages_total=len(docs))
+
+    def run_windows(self, windows: Iterator[List[Document]], source: str, load_ms: float = 0.0,
+                    progress: Optional[Callable] = None, metadata: Optional[dict] = None,
+                    pages_total: Optional[int] = None) -> dict:
+        """
+        Split, embed and store documents belonging to one source, one window
+        of pages at a time so memory stays bounded by the window size.
+        Unchanged chunks are skipped and chunks no longer present are removed.
+        metadata (e.g. source_id, subject) is added to every chunk.
+        progress(stage, chunks_done, chunks_total, pages_done, pages_total) is
+        called as the run advances. Counts cover the whole document: chunks_total
+        grows as windows are read, so pages_done/pages_total is the overall
+        fraction (pages of the current window are credited as their chunks embed).
+        Returns per-stage timings, chunk counts, throughput and peak RSS for this run.
+        """
+        progress = progress or (lambda stage, chunks_done, chunks_total, pages_done, pages_total: None)
+        started = time.perf_counter()
+        rss_start = current_rss_mb()
+        peak_rss = rss_start
+        stats = {
+            "pages": 0,
+            "windows": 0,
+            "chunks": 0,
+            "chunks_embedded": 0,
+            "chunks_skipped": 0,
+            "chunks_removed": 0,
+            "batches": 0
+        }
+        split_ms = embed_ms = upsert_ms = 0.0
+        batch_size = max(1, self.config.get("embed_batch_size", 32))
+
+        # Only IDs are kept across windows
+        existing = self._existing_ids(source)
+        seen = set()
+        pages_done = 0
+
+        while True:
+            # Loading is interleaved with processing; time spent pulling pages counts as load time
+            t0 = time.perf_counter()
+            docs = next(windows, None)
+            load_ms += (time.perf_counter() - t0) * 1000
+            if docs is None:
+                break
+            window_pages = len(docs)
+            stats["pages"] += window_pages
+            stats["windows"] += 1
+
+            t0 = time.perf_counter()
+            progress("splitting", stats["chunks_embedded"], stats["chunks_embedded"], pages_done, pages_total)
+            splits = self._split(docs)
+            del docs
+
+            # Hash chunks; identical text within a source is stored once
+            ids, unique_splits = [], []
+            for split in splits:
+                content_hash = hash_text(split.page_content)
+                split_id = chunk_id(source, content_hash)
+                if split_id in seen:
+                    continue
+                seen.add(split_id)
+                if metadata:
+                    split.metadata.update(metadata)
+                split.metadata["source"] = source
+                split.metadata["content_hash"] = content_hash
+                ids.append(split_id)
+                unique_splits.append(split)
+            split_ms += (time.perf_counter() - t0) * 1000
+            stats["chunks"] += len(unique_splits)
+
+            pending = [(i, d) for i, d in zip(ids, unique_splits) if i not in existing]
+            stats["chunks_skipped"] += len(unique_splits) - len(pending)
+
+            if pending:
+                t0 = time.perf_counter()
+                done_before = stats["chunks_embedded"]
+                total = done_before + len(pending)
+                progress("embedding", done_before, total, pages_done, pages_total)
+                vectors = self._embed(
+                    [d.page_content for _, d in pending],
+                    on_batch=lambda done: progress(
+                        "embedding", done_before + done, total,
+                        pages_done + window_pages * done // len(pending), pages_total
+                    )
+                )
+                embed_ms += (time.perf_counter() - t0) * 1000
+                stats["batches"] += (len(pending) + batch_size - 1) // batch_size
+                stats["chunks_embedded"] += len(pending)
+
+                t0 = time.perf_counter()
+                progress("storing", stats["chunks_embedded"], stats["chunks_embedded"],
+                         pages_done + window_pages, pages_total)
+                self._upsert([i for i, _ in pending], vectors, [d for _, d in pending])
+                upsert_ms += (time.perf_counter() - t0) * 1000
+                del vectors
+
+            if metadata:
+                # Skipped chunks keep their vectors but take the current source metadata
+                unchanged = [(i, d) for i, d in zip(ids, unique_splits) if i in existing]
+                self._update_metadata([i for i, _ in unchanged], [d for _, d in unchanged])
+
+            if self.keyword_index is not None:
+                # Index new chunks plus any stored before the keyword index existed
+                unindexed = self.keyword_index.missing(ids)
+                self.keyword_index.add(
+                    [i for i in ids if i in unindexed],
+                    [d for i, d in zip(ids, unique_splits) if i in unindexed]
+                )
+
+            pages_done += window_pages
+            peak_rss = max(peak_rss, current_rss_mb())
+
+        stale = list(existing - seen)
+        if stale:
+            self.vector_registry.get_store().delete(ids=stale)
+            if self.keyword_index is not None:
+                self.keyword_index.remove_ids(stale)
+            stats["chunks_removed"] = len(stale)
+
+        total_ms = load_ms + (time.perf_counter() - started) * 1000
+        stats.update({
+            "load_ms": round(load_ms, 2),
+            "split_ms": round(split_ms, 2),
+            "embed_ms": round(embed_ms, 2),
+            "upsert_ms": round(upsert_ms, 2),
+            "total_ms": round(total_ms, 2),
+            "chunks_per_sec": round(stats["chunks_embedded"] / (embed_ms / 1000), 2) if embed_ms > 0 else 0.0,
+            "rss_start_mb": round(rss_start, 1),
+            "peak_rss_mb": round(peak_rss, 1),
+            "peak_rss_growth_mb": round(peak_rss - rss_start, 1)
+        })
+
+        with self.lock:
+            self._totals["runs"] += 1
+            self._totals["chunks"] += stats["chunks"]
+            self._totals["chunks_embedded"] += stats["chunks_embedded"]
+            self._totals["chunks_skipped"] += stats["chunks_skipped"]
+            self._totals["embed_ms"] += embed_ms
+            self._totals["last_run"] = stats
+
+        progress("done", stats["chunks"], stats["chunks"], pages_done, pages_done)
+        return stats
+
+    def get_stats(self) -> dict:
+        """Get cumulative ingestion counters and the last run's timings"""
+        with self.lock:
+            totals = dict(self._totals)
+        embed_seconds = totals["embed_ms"] / 1000
+        totals["embed_ms"] = round(totals["embed_ms"], 2)
+        totals["avg_chunks_per_sec"] = round(totals["chunks_embedded"] / embed_seconds, 2) if embed_seconds > 0 else 0.0
+        return totals
@@ -0,0 +1,290 @@
+"""
+Ingestion Job Queue - Runs document/URL ingestion in background workers.
+Jobs are persisted in the ingest_jobs table, so queued work survives a
+restart and clients can poll progress instead of holding a request open.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from backend.database import SessionLocal, IngestJob, Source
+
+TERMINAL_STATUSES = ("done", "failed")
+
+
+class QueueBusyError(RuntimeError):
+    """A job is running, so maintenance cannot take over the vector store"""
+
+
+class IngestJobQueue:
+    """Database-backed job queue drained by a small pool of worker threads"""
+
+    def __init__(self, num_workers: int = 1, poll_interval: float = 2.0):
+        self.num_workers = num_workers
+        self.poll_interval = poll_interval
+        self.wakeup = threading.Event()
+        self.stop_event = threading.Event()
+        self.claim_lock = threading.Lock()
+        # Lets producers make check-then-enqueue atomic (see pending_job_for)
+        self.enqueue_lock = threading.Lock()
+        # Set while maintenance owns the vector store; queued jobs wait
+        self.paused = False
+        self.workers = []
+
+    # ---------- Producer side ----------
+
+    def enqueue(self, kind: str, target: str, filename: Optional[str] = None, content_hash: Optional[str] = None,
+                subject: Optional[str] = None) -> int:
+        """Persist a new job and wake a worker; returns the job ID"""
+        db = SessionLocal()
+        try:
+            job = IngestJob(
+                kind=kind,
+                target=target,
+                filename=filename,
+                content_hash=content_hash,
+                subject=subject,
+                status="queued",
+                stage="queued",
+                created_at=time.time()
+            )
+            db.add(job)
+            db.commit()
+            job_id = job.id
+        finally:
+            db.close()
+        self.wakeup.set()
+        return job_id
+
+    def get_status(self, job_id: int) -> Optional[dict]:
+        """Get a job's stage, chunk progress and ETA"""
+        db = SessionLocal()
+        try:
+            job = db.query(IngestJob).filter(IngestJob.id == job_id).first()
+            if not job:
+                return None
+            return self._to_status(job)
+        finally:
+            db.close()
+
+    def pending_job_for(self, content_hash: str) -> Optional[int]:
+        """ID of a queued or running job for this content, if any"""
+        db = SessionLocal()
+        try:
+            job = db.query(IngestJob.id).filter(
+                IngestJob.content_hash == content_hash,
+                IngestJob.status.notin_(TERMINAL_STATUSES)
+            ).first()
+            return job[0] if job else None
+        finally:
+            db.close()
+
+    def active_count(self) -> int:
+        """Number of queued or running jobs"""
+        db = SessionLocal()
+        try:
+            return db.query(IngestJob).filter(IngestJob.status.notin_(TERMINAL_STATUSES)).count()
+        finally:
+            db.close()
+
+    @contextmanager
+    def maintenance(self):
+        """
+        Hold off job claims for the duration of the block. Raises
+        QueueBusyError if a job is already running; jobs enqueued meanwhile
+        stay queued and start afterwards.
+        """
+        with self.claim_lock:
+            if self.paused:
+                raise QueueBusyError("Maintenance already in progress")
+            db = SessionLocal()
+            try:
+                running = db.query(IngestJob).filter(IngestJob.status == "running").count()
+            finally:
+                db.close()
+            if running:
+                raise QueueBusyError(f"{running} ingestion job(s) running")
+            self.paused = True
+        try:
+            yield
+        finally:
+            with self.claim_lock:
+                self.paused = False
+            self.wakeup.set()
+
+    @staticmethod
+    def _to_status(job: IngestJob) -> dict:
+        # Pages are known up front for PDFs; chunk totals only grow as windows are read
+        fraction = 0.0
+        if job.status == "done":
+            fraction = 1.0
+        elif job.pages_total:
+            fraction = min((job.pages_done or 0) / job.pages_total, 1.0)
+        elif job.chunks_total:
+            fraction = min((job.chunks_done or 0) / job.chunks_total, 1.0)
+
+        eta_seconds = None
+        if job.status == "running" and fraction > 0 and job.started_at:
+            elapsed = time.time() - job.started_at
+            eta_seconds = round(elapsed / fraction * (1 - fraction), 1)
+        elif job.status in TERMINAL_STATUSES:
+            eta_seconds = 0
+
+        return {
+            "job_id": job.id,
+            "kind": job.kind,
+            "target": job.filename or job.target,
+            "status": job.status,
+            "stage": job.stage,
+            "chunks_total": job.chunks_total,
+            "chunks_done": job.chunks_done,
+            "pages_total": job.pages_total,
+            "pages_done": job.pages_done,
+            "progress": round(fraction, 3),
+            "eta_seconds": eta_seconds,
+            "source_id": job.source_id,
+            "error": job.error
+        }
+
+    # ---------- Worker side ----------
+
+    def start(self):
+        """Recover interrupted jobs and start worker threads"""
+        db = SessionLocal()
+        try:
+            # Jobs left running by a previous process are restarted from scratch
+            db.query(IngestJob).filter(IngestJob.status == "running").update(
+                {"status": "queued", "stage": "queued", "chunks_done": 0, "pages_done": 0}
+            )
+            db.commit()
+        finally:
+            db.close()
+
+        self.stop_event.clear()
+        for i in range(self.num_workers):
+            worker = threading.Thread(target=self._worker_loop, name=f"ingest-worker-{i}", daemon=True)
+            worker.start()
+            self.workers.append(worker)
+        self.wakeup.set()
+
+    def stop(self, timeout: float = 5.0):
+        """Signal workers to exit after their current job"""
+        self.stop_event.set()
+        self.wakeup.set()
+        for worker in self.workers:
+            worker.join(timeout=timeout)
+        self.workers = []
+
+    def _claim_next(self) -> Optional[int]:
+        """Atomically move the oldest queued job to running"""
+        with self.claim_lock:
+            if self.paused:
+                return None
+            db = SessionLocal()
+            try:
+                job = db.query(IngestJob).filter(IngestJob.status == "queued").order_by(IngestJob.id.asc()).first()
+                if not job:
+                    return None
+                now = time.time()
+                job.status = "running"
+                job.started_at = now
+                job.stage_started_at = now
+                db.commit()
+                return job.id
+            finally:
+                db.close()
+
+    def _worker_loop(self):
+        while not self.stop_event.is_set():
+            job_id = self._claim_next()
+            if job_id is None:
+                self.wakeup.wait(self.poll_interval)
+                self.wakeup.clear()
+                continue
+            self._run_job(job_id)
+
+    def _update(self, job_id: int, **fields):
+        db = SessionLocal()
+        try:
+            db.query(IngestJob).filter(IngestJob.id == job_id).update(fields)
+            db.commit()
+        finally:
+            db.close()
+
+    def _progress_callback(self, job_id: int):
+        stage_starts = {}
+        state = {"stage": None}
+
+        def progress(stage: str, chunks_done: int, chunks_total: int, pages_done: int, pages_total: Optional[int]):
+            fields = {"stage": stage, "chunks_done": chunks_done, "pages_done": pages_done}
+            if chunks_total:
+                fields["chunks_total"] = chunks_total
+            if pages_total:
+                fields["pages_total"] = pages_total
+            # Windowed ingests revisit stages; report when the stage first started
+            if stage != state["stage"]:
+                state["stage"] = stage
+                fields["stage_started_at"] = stage_starts.setdefault(stage, time.time())
+            self._update(job_id, **fields)
+
+        return progress
+
+    def _run_job(self, job_id: int):
+        from backend.rag_engine import ingest_document, ingest_url
+
+        db = SessionLocal()
+        try:
+            job = db.query(IngestJob).filter(IngestJob.id == job_id).first()
+            kind, target, filename, content_hash, subject = job.kind, job.target, job.filename, job.content_hash, job.subject
+        finally:
+            db.close()
+
+        progress = self._progress_callback(job_id)
+        try:
+            # The Source row exists before ingest so its ID can go into chunk metadata
+            source_id = self._reserve_source(target, filename or target, "local" if kind == "file" else "url", subject)
+            if kind == "file":
+                stats = ingest_document(target, content_hash=content_hash, progress=progress, source_id=source_id, subject=subject)
+                self._record_source(source_id, filename, stats["content_hash"], stats["chunks"])
+            else:
+                title = ingest_url(target, progress=progress, source_id=source_id, subject=subject)
+                chunk_count = self.get_status(job_id)["chunks_total"]
+                self._record_source(source_id, title, None, chunk_count)
+            self._update(job_id, status="done", stage="done", source_id=source_id, finished_at=time.time())
+        except Exception as e:
+            print(f"Ingestion job {job_id} failed: {e}")
+            self._update(job_id, status="failed", stage="failed", error=str(e), finished_at=time.time())
+
+    def _reserve_source(self, path: str, filename: str, source_type: str, subject: Optional[str]) -> int:
+        """Get the Source row for a path, creating it inactive (re-ingests reuse the existing row)"""
+        db = SessionLocal()
+        try:
+            source = db.query(Source).filter(Source.file_path == path).first()
+            if source is None:
+                source = Source(type=source_type, file_path=path, filename=filename, is_active=False)
+                db.add(source)
+            if subject:
+                source.subject = subject
+            db.commit()
+            db.refresh(source)
+            return source.id
+        finally:
+            db.close()
+
+    def _record_source(self, source_id: int, filename: str, content_hash: Optional[str], chunk_count: Optional[int]) -> int:
+        """Activate the Source row once its chunks are stored"""
+        db = SessionLocal()
+        try:
+            source = db.query(Source).filter(Source.id == source_id).first()
+            source.filename = filename
+            source.is_active = True
+            if content_hash is not None:
+                source.content_hash = content_hash
+            if chunk_count is not None:
+                source.chunk_count = chunk_count
+            db.commit()
+            db.refresh(source)
+            return source.id
+        finally:
+            db.close()
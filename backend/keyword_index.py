@@ -0,0 +1,219 @@
+"""
+Keyword Index - Local BM25 inverted index over ingested chunks.
+Complements dense retrieval with exact term matching (course codes, formula
+and function names) that embeddings tend to blur. Postings and chunk text
+are stored in SQLite next to the vector store and kept in sync at ingest.
+"""
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# Words joined by -, _ or . stay one token too ("cs-101", "f.read")
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_.][a-z0-9]+)*")
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this "
+    "to was were will with what which who how why when where does do can".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase terms, keeping compound codes and their parts"""
+    terms = []
+    for token in _TOKEN_RE.findall(text.lower()):
+        if token in _STOPWORDS:
+            continue
+        terms.append(token)
+        if any(sep in token for sep in "-_."):
+            terms.extend(p for p in re.split(r"[-_.]", token) if p and p not in _STOPWORDS)
+    return terms
+
+
+class KeywordIndex:
+    """SQLite-backed BM25 index keyed by vector-store chunk ID"""
+
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        self.path = Path(path)
+        self.k1 = k1
+        self.b = b
+        self.lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id TEXT PRIMARY KEY, source TEXT, length INTEGER, content TEXT, metadata TEXT)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks(source)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT, chunk_id TEXT, tf INTEGER, PRIMARY KEY (term, chunk_id)) WITHOUT ROWID"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_postings_chunk ON postings(chunk_id)")
+        self.conn.commit()
+        self._num_chunks, self._total_length = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks"
+        ).fetchone()
+        self._stats = {"searches": 0, "added": 0, "removed": 0}
+
+    def count(self) -> int:
+        with self.lock:
+            return self._num_chunks
+
+    def missing(self, ids: Iterable[str]) -> set:
+        """Subset of ids not yet indexed"""
+        ids = list(ids)
+        found = set()
+        with self.lock:
+            for i in range(0, len(ids), 500):
+                batch = ids[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self.conn.execute(f"SELECT id FROM chunks WHERE id IN ({placeholders})", batch)
+                found.update(r[0] for r in rows)
+        return set(ids) - found
+
+    def add(self, ids: List[str], docs: List[Document]):
+        """Index chunks (re-adding an ID replaces its postings)"""
+        with self.lock:
+            self._delete_ids(ids)
+            chunk_rows, posting_rows = [], []
+            for chunk_id, doc in zip(ids, docs):
+                terms = Counter(tokenize(doc.page_content))
+                length = sum(terms.values())
+                chunk_rows.append((
+                    chunk_id,
+                    doc.metadata.get("source", ""),
+                    length,
+                    doc.page_content,
+                    json.dumps(doc.metadata, default=str)
+                ))
+                posting_rows.extend((term, chunk_id, tf) for term, tf in terms.items())
+                self._num_chunks += 1
+                self._total_length += length
+            self.conn.executemany("INSERT INTO chunks (id, source, length, content, metadata) VALUES (?, ?, ?, ?, ?)", chunk_rows)
+            self.conn.executemany("INSERT INTO postings (term, chunk_id, tf) VALUES (?, ?, ?)", posting_rows)
+            self.conn.commit()
+            self._stats["added"] += len(chunk_rows)
+
+    def update_metadata(self, ids: List[str], docs: List[Document]):
+        """Rewrite stored metadata (and source) of indexed chunks; text and postings are unchanged"""
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE chunks SET source = ?, metadata = ? WHERE id = ?",
+                [
+                    (doc.metadata.get("source", ""), json.dumps(doc.metadata, default=str), chunk_id)
+                    for chunk_id, doc in zip(ids, docs)
+                ]
+            )
+            self.conn.commit()
+
+    def _delete_ids(self, ids: List[str]) -> int:
+        """Drop chunks and their postings (caller holds the lock, commits)"""
+        removed = 0
+        for i in range(0, len(ids), 500):
+            batch = list(ids[i:i + 500])
+            placeholders = ",".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks WHERE id IN ({placeholders})", batch
+            ).fetchone()
+            self.conn.execute(f"DELETE FROM postings WHERE chunk_id IN ({placeholders})", batch)
+            self.conn.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch)
+            self._num_chunks -= rows[0]
+            self._total_length -= rows[1]
+            removed += rows[0]
+        return removed
+
+    def remove_ids(self, ids: List[str]) -> int:
+        with self.lock:
+            removed = self._delete_ids(ids)
+            self.conn.commit()
+            self._stats["removed"] += removed
+            return removed
+
+    def remove_source(self, source: str) -> int:
+        """Drop every chunk of a source; returns how many were removed"""
+        with self.lock:
+            ids = [r[0] for r in self.conn.execute("SELECT id FROM chunks WHERE source = ?", (source,))]
+            removed = self._delete_ids(ids)
+            self.conn.commit()
+            self._stats["removed"] += removed
+            return removed
+
+    def search(self, query: str, k: int = 10, sources: Optional[List[str]] = None) -> List[Tuple[str, float]]:
+        """Top-k (chunk_id, BM25 score) for a query, optionally limited to some sources"""
+        terms = Counter(tokenize(query))
+        if not terms or sources == []:
+            return []
+
+        source_clause, source_args = "", []
+        if sources is not None:
+            source_clause = f" AND c.source IN ({','.join('?' * len(sources))})"
+            source_args = list(sources)
+
+        with self.lock:
+            self._stats["searches"] += 1
+            n = self._num_chunks
+            if n == 0:
+                return []
+            avg_length = self._total_length / n
+            scores = Counter()
+            for term, query_tf in terms.items():
+                rows = self.conn.execute(
+                    "SELECT p.chunk_id, p.tf, c.length FROM postings p JOIN chunks c ON c.id = p.chunk_id "
+                    "WHERE p.term = ?" + source_clause, [term] + source_args
+                ).fetchall()
+                if not rows:
+                    continue
+                idf = math.log(1 + (n - len(rows) + 0.5) / (len(rows) + 0.5))
+                for chunk_id, tf, length in rows:
+                    norm = tf + self.k1 * (1 - self.b + self.b * length / avg_length)
+                    scores[chunk_id] += query_tf * idf * tf * (self.k1 + 1) / norm
+        return scores.most_common(k)
+
+    def get_documents(self, ids: List[str]) -> dict:
+        """Materialize indexed chunks as Documents, keyed by ID"""
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT id, content, metadata FROM chunks WHERE id IN ({placeholders})", list(ids)
+            ).fetchall()
+        return {
+            row[0]: Document(page_content=row[1], metadata=json.loads(row[2]))
+            for row in rows
+        }
+
+    def source_documents(self, source: str) -> List[Document]:
+        """All indexed chunks of a source, in insertion order"""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT content, metadata FROM chunks WHERE source = ? ORDER BY rowid", (source,)
+            ).fetchall()
+        return [Document(page_content=row[0], metadata=json.loads(row[1])) for row in rows]
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute("DELETE FROM postings")
+            self.conn.execute("DELETE FROM chunks")
+            self.conn.commit()
+            self._num_chunks = 0
+            self._total_length = 0
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self._stats)
+            stats["chunks"] = self._num_chunks
+            stats["avg_chunk_terms"] = round(self._total_length / self._num_chunks, 2) if self._num_chunks else 0.0
+        return stats
@@ -0,0 +1,185 @@
+"""
+LLM Client Pool - Cached, provider-keyed LLM clients shared across requests.
+Clients are rebuilt only when the provider configuration changes, and each
+provider has a cap on how many generations run at once.
+"""
+import json
+import threading
+import time
+from typing import Dict, Iterator
+
+from backend.config import get_llm_provider, get_llm_config, LLMProvider
+
+
+class OllamaClient:
+    """
+    Thin invoke/stream wrapper over ollama.Client. The client holds one HTTP
+    connection pool for its lifetime, and keep_alive is sent with every
+    request so the model stays loaded between generations.
+    """
+
+    def __init__(self, model: str, base_url: str, keep_alive=None):
+        import ollama
+
+        self.model = model
+        self.keep_alive = keep_alive
+        self.client = ollama.Client(host=base_url)
+
+    def invoke(self, prompt: str) -> str:
+        response = self.client.generate(model=self.model, prompt=prompt, keep_alive=self.keep_alive)
+        return response["response"]
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        for chunk in self.client.generate(model=self.model, prompt=prompt, keep_alive=self.keep_alive, stream=True):
+            if chunk["response"]:
+                yield chunk["response"]
+
+
+def _build_client(provider: LLMProvider, config: dict):
+    """Construct the underlying LLM client for a provider"""
+    if provider == LLMProvider.OLLAMA:
+        # Local mode - uses Ollama for offline inference
+        return OllamaClient(
+            model=config["model"],
+            base_url=config.get("base_url", "http://localhost:11434"),
+            keep_alive=config.get("keep_alive")
+        )
+    else:
+        # Cloud mode - uses Hugging Face Inference API
+        from langchain_huggingface import HuggingFaceEndpoint
+        return HuggingFaceEndpoint(
+            repo_id=config["model"],
+            huggingfacehub_api_token=config["api_token"],
+            max_length=config.get("max_length", 512),
+            temperature=config.get("temperature", 0.7),
+            task="text-generation"
+        )
+
+
+class PooledLLM:
+    """Shared LLM client that enforces the provider's concurrency limit"""
+
+    def __init__(self, client, provider: LLMProvider, fingerprint: str, semaphore: threading.BoundedSemaphore,
+                 stats: dict, lock: threading.Lock):
+        self.client = client
+        self.provider = provider
+        self.fingerprint = fingerprint
+        self.semaphore = semaphore
+        self._stats = stats
+        self._lock = lock  # the pool's lock, which also guards stats
+
+    def _acquire(self):
+        started = time.perf_counter()
+        self.semaphore.acquire()
+        waited_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._stats["in_flight"] += 1
+            self._stats["total_wait_ms"] += waited_ms
+
+    def _release(self):
+        with self._lock:
+            self._stats["in_flight"] -= 1
+        self.semaphore.release()
+
+    def invoke(self, prompt: str) -> str:
+        """Generate a full completion"""
+        self._acquire()
+        try:
+            return self.client.invoke(prompt)
+        finally:
+            self._release()
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        """Generate a completion chunk by chunk"""
+        self._acquire()
+        try:
+            for chunk in self.client.stream(prompt):
+                yield chunk
+        finally:
+            self._release()
+
+
+class LLMClientPool:
+    """Keeps one client per provider and rebuilds it when its config changes"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._clients: Dict[str, PooledLLM] = {}
+        self._semaphores: Dict[str, tuple] = {}
+        self._stats: Dict[str, dict] = {}
+
+    @staticmethod
+    def _fingerprint(provider: LLMProvider, config: dict) -> str:
+        return json.dumps({"provider": provider.value, "config": config}, sort_keys=True, default=str)
+
+    def _provider_stats(self, key: str) -> dict:
+        if key not in self._stats:
+            self._stats[key] = {
+                "builds": 0,
+                "reuses": 0,
+                "reloads": 0,
+                "in_flight": 0,
+                "total_wait_ms": 0.0,
+                "max_concurrency": 0
+            }
+        return self._stats[key]
+
+    def _semaphore_for(self, key: str, limit: int) -> threading.BoundedSemaphore:
+        """Get the provider semaphore, replacing it if the limit changed"""
+        current = self._semaphores.get(key)
+        if current is None or current[0] != limit:
+            # In-flight calls keep releasing the semaphore they acquired
+            current = (limit, threading.BoundedSemaphore(limit))
+            self._semaphores[key] = current
+        return current[1]
+
+    def get(self) -> PooledLLM:
+        """Get the pooled client for the currently configured provider"""
+        provider = get_llm_provider()
+        config = get_llm_config()
+        key = provider.value
+        fingerprint = self._fingerprint(provider, config)
+
+        with self.lock:
+            stats = self._provider_stats(key)
+            pooled = self._clients.get(key)
+            if pooled is not None and pooled.fingerprint == fingerprint:
+                stats["reuses"] += 1
+                return pooled
+
+            if pooled is not None:
+                stats["reloads"] += 1
+
+            limit = max(1, int(config.get("max_concurrency", 1)))
+            stats["max_concurrency"] = limit
+            pooled = PooledLLM(
+                _build_client(provider, config),
+                provider,
+                fingerprint,
+                self._semaphore_for(key, limit),
+                stats,
+                self.lock
+            )
+            self._clients[key] = pooled
+            stats["builds"] += 1
+            return pooled
+
+    def current_fingerprint(self) -> str:
+        """Fingerprint of the active provider config (used to key cached responses)"""
+        provider = get_llm_provider()
+        return self._fingerprint(provider, get_llm_config())
+
+    def clear(self):
+        """Drop all cached clients (next get() rebuilds them)"""
+        with self.lock:
+            self._clients.clear()
+
+    def get_stats(self) -> dict:
+        """Get per-provider build/reuse counters and queueing time"""
+        with self.lock:
+            result = {}
+            for key, stats in self._stats.items():
+                entry = dict(stats)
+                entry["total_wait_ms"] = round(entry["total_wait_ms"], 2)
+                result[key] = entry
+            return result
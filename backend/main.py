@@ -1,12 +1,21 @@
-from fastapi import FastAPI, Depends, UploadFile, File, HTTPException
+from fastapi import FastAPI, Depends, UploadFile, File, Form, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from backend.database import SessionLocal, engine, Source, Schedule, Mastery, init_db
-from backend.rag_engine import ingest_document, query_knowledge_base
-from backend.student_data import StudentProfileManager
-import shutil
+from backend.rag_engine import query_knowledge_base, vector_registry, llm_pool, ingest_pipeline, response_cache, keyword_index, sync_keyword_index
+from backend.config import reload_config, get_ingestion_config, get_rag_executor_config, get_connectivity_config, get_embedding_config, get_vector_store_config
+from backend.concurrency import RAGExecutor
+from backend.connectivity import ConnectivityMonitor
+from backend.analytics import AnalyticsCache, compute_analytics
+from backend.jobs import IngestJobQueue, QueueBusyError
+from backend.ingest_pipeline import save_stream, FileTooLargeError
+from backend.upload_limit import UploadSizeLimit
+from backend.student_data import StudentProfileManager, DEFAULT_STUDENT_ID, advance_study_day
 import os
+import json
 from pydantic import BaseModel
 from typing import List, Optional, Dict
+from datetime import date as date_cls
 
 # Create tables
 init_db()
@@ -14,8 +23,96 @@ init_db()
 # Initialize Student Profile Manager
 profile_manager = StudentProfileManager()
 
+# Per-student analytics, recomputed after the student's next quiz or plan save
+analytics_cache = AnalyticsCache()
+
+# Background ingestion workers (jobs persist in the ingest_jobs table)
+ingest_jobs = IngestJobQueue(num_workers=get_ingestion_config().get("job_workers", 1))
+
+# Bounded worker pool for blocking RAG calls (per-endpoint caps, 429 when saturated)
+rag_executor = RAGExecutor(get_rag_executor_config())
+
+# Scheduled reachability probe; /connectivity serves its cached result
+connectivity_monitor = ConnectivityMonitor(get_connectivity_config())
+
 app = FastAPI(title="FocusFlow Backend")
 
+# Oversized uploads get 413 before the multipart body is spooled to disk
+app.add_middleware(
+    UploadSizeLimit,
+    paths={"/upload"},
+    get_max_bytes=lambda: get_ingestion_config().get("max_upload_mb", 200) * 1024 * 1024
+)
+
+@app.on_event("startup")
+def startup_vector_store():
+    """Open the shared vector store once per process"""
+    try:
+        vector_registry.startup()
+    except Exception as e:
+        # Lazily retried on first request
+        print(f"Vector store warm-up failed: {e}")
+
+@app.on_event("startup")
+def startup_keyword_index():
+    """Backfill the BM25 index with chunks ingested before it existed"""
+    try:
+        added = sync_keyword_index()
+        if added:
+            print(f"Keyword index: indexed {added} existing chunks")
+    except Exception as e:
+        print(f"Keyword index sync failed: {e}")
+
+@app.on_event("startup")
+def startup_mastery_backfill():
+    """Seed streaming mastery aggregates for rows saved before they existed"""
+    try:
+        seeded = profile_manager.backfill_mastery_aggregates()
+        if seeded:
+            print(f"Mastery: seeded aggregates for {seeded} existing subjects")
+    except Exception as e:
+        print(f"Mastery backfill failed: {e}")
+
+@app.on_event("startup")
+def startup_legacy_profile_import():
+    """Move the single-user JSON profile of earlier versions into the database, once"""
+    try:
+        if profile_manager.import_legacy_profile():
+            print("Student profile: imported legacy JSON profile")
+    except Exception as e:
+        print(f"Legacy profile import failed: {e}")
+
+@app.on_event("startup")
+def startup_ingest_workers():
+    ingest_jobs.start()
+
+@app.on_event("shutdown")
+def shutdown_profile_writes():
+    """Commit progress and study time still waiting for the write-behind flusher"""
+    try:
+        profile_manager.close()
+    except Exception as e:
+        print(f"Profile flush on shutdown failed: {e}")
+
+@app.on_event("shutdown")
+def shutdown_ingest_workers():
+    ingest_jobs.stop()
+
+@app.on_event("startup")
+def startup_connectivity_monitor():
+    connectivity_monitor.start()
+
+@app.on_event("shutdown")
+def shutdown_connectivity_monitor():
+    connectivity_monitor.stop()
+
+@app.on_event("shutdown")
+def shutdown_shared_clients():
+    rag_executor.shutdown()
+    vector_registry.shutdown()
+    keyword_index.close()
+    llm_pool.clear()
+
 # Dependency
 def get_db():
     db = SessionLocal()
@@ -37,6 +134,7 @@ class SourceItem(BaseModel):
     filename: str
     type: str
     is_active: bool
+    subject: Optional[str] = None
 
 class UnlockRequest(BaseModel):
     topic_id: int
@@ -47,51 +145,120 @@ class UnlockResponse(BaseModel):
     message: str
     next_topic_unlocked: bool
 
-@app.post("/upload")
-async def upload_file(file: UploadFile = File(...), db: Session = Depends(get_db)):
-    file_location = f"data/{file.filename}"
+@app.post("/upload", status_code=202)
+def upload_file(file: UploadFile = File(...), subject: Optional[str] = Form(None), db: Session = Depends(get_db)):
+    filename = os.path.basename(file.filename or "")
+    if not filename:
+        raise HTTPException(status_code=400, detail="Missing filename")
+    file_location = f"data/{filename}"
+    config = get_ingestion_config()
+
+    # Stream to a temp file, hashing and size-checking each block as it is written
+    partial_location = f"{file_location}.{os.getpid()}.{id(file)}.part"
     try:
-        with open(file_location, "wb+") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        os.makedirs("data", exist_ok=True)
+        content_hash, _ = save_stream(
+            file.file,
+            partial_location,
+            max_bytes=config.get("max_upload_mb", 200) * 1024 * 1024,
+            block_size=config.get("upload_block_size", 1024 * 1024)
+        )
+    except FileTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Could not save file: {str(e)}")
 
-    # Ingest
+    # Skip parsing entirely if identical content is already indexed
+    duplicate = db.query(Source).filter(Source.content_hash == content_hash, Source.is_active == True).first()
+    # A store opened empty (e.g. after switching backends) no longer holds the source's chunks
+    if duplicate and vector_registry.get_store().ids_for_source(duplicate.file_path):
+        os.remove(partial_location)
+        return {"message": "File already ingested", "id": duplicate.id, "duplicate": True}
+
+    # Held across check, move and enqueue so two uploads of the same file queue one job
+    with ingest_jobs.enqueue_lock:
+        # Same content already queued or being ingested (its Source is still reserved)
+        pending_job = ingest_jobs.pending_job_for(content_hash)
+        if pending_job is not None:
+            os.remove(partial_location)
+            return {"message": "File already queued for ingestion", "job_id": pending_job, "duplicate": True}
+        os.replace(partial_location, file_location)
+
+        # Ingest in the background (incremental: only changed chunks are embedded)
+        # The hash travels with the job so ingestion does not read the file again to compute it
+        job_id = ingest_jobs.enqueue("file", file_location, filename=filename, content_hash=content_hash, subject=subject)
+    return {"message": "File uploaded, ingestion queued", "job_id": job_id}
+
+@app.get("/jobs/{job_id}")
+def get_job_status(job_id: int):
+    """Ingestion job progress: stage, chunk counts and ETA"""
+    status = ingest_jobs.get_status(job_id)
+    if not status:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
+
+@app.get("/metrics")
+def get_metrics():
+    """Runtime counters for the shared backend resources"""
+    return {
+        "vector_store": vector_registry.get_stats(),
+        "llm_pool": llm_pool.get_stats(),
+        "ingestion": ingest_pipeline.get_stats(),
+        "rag_endpoints": rag_executor.get_stats(),
+        "response_cache": response_cache.get_stats(),
+        "keyword_index": keyword_index.get_stats(),
+        "connectivity": connectivity_monitor.get_stats(),
+        "analytics_cache": analytics_cache.get_stats(),
+        "student_profiles": profile_manager.get_stats()
+    }
+
+@app.get("/connectivity")
+def get_connectivity():
+    """Cached result of the background reachability probe (never probes inline)"""
+    return connectivity_monitor.get_status()
+
+@app.post("/admin/reload_config")
+def reload_settings():
+    """Re-read provider settings; pooled LLM clients rebuild on next use, the vector store reopens now"""
     try:
-        ingest_document(file_location)
+        config = reload_config()
+        connectivity_monitor.config = get_connectivity_config()
+        vector_registry.reload(get_embedding_config(), get_vector_store_config())
     except Exception as e:
-        # cleanup if ingest fails?
-        # os.remove(file_location)
-        raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
-    
-    # Save to DB
-    new_source = Source(filename=file.filename, type="local", file_path=file_location, is_active=True)
-    db.add(new_source)
-    db.commit()
-    db.refresh(new_source)
-    
-    return {"message": "File uploaded and ingested successfully", "id": new_source.id}
-    return {"message": "File uploaded and ingested successfully", "id": new_source.id}
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"status": "reloaded", "llm_provider": config["llm_provider"].value}
 
-class UrlRequest(BaseModel):
-    url: str
+@app.get("/admin/vector_index")
+def vector_index_stats():
+    """Chunk counts, HNSW settings and on-disk size of the vector index"""
+    try:
+        from backend.vector_maintenance import get_index_stats
+        return get_index_stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/ingest_url")
-def ingest_url_endpoint(request: UrlRequest, db: Session = Depends(get_db)):
+@app.post("/admin/vector_index/rebuild")
+def rebuild_vector_index(keep_inactive: bool = False):
+    """Rebuild/compact the collection with the configured HNSW params"""
     try:
-        from backend.rag_engine import ingest_url
-        title = ingest_url(request.url)
-        
-        # Save to DB
-        # We use the title as the filename for display purposes
-        new_source = Source(filename=title, type="url", file_path=request.url, is_active=True)
-        db.add(new_source)
-        db.commit()
-        db.refresh(new_source)
-        
-        return {"message": f"Successfully added: {title}", "id": new_source.id}
+        from backend.vector_maintenance import rebuild_collection
+        # Workers claim no jobs until the rebuild is done
+        with ingest_jobs.maintenance():
+            return rebuild_collection(purge_inactive=not keep_inactive)
+    except QueueBusyError as e:
+        raise HTTPException(status_code=409, detail=f"{e}, retry when jobs finish")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+class UrlRequest(BaseModel):
+    url: str
+    subject: Optional[str] = None
+
+@app.post("/ingest_url", status_code=202)
+def ingest_url_endpoint(request: UrlRequest):
+    job_id = ingest_jobs.enqueue("url", request.url, subject=request.subject)
+    return {"message": f"Queued: {request.url}", "job_id": job_id}
+
 @app.get("/sources", response_model=List[SourceItem])
 def get_sources(db: Session = Depends(get_db)):
     sources = db.query(Source).filter(Source.is_active == True).all()
@@ -166,91 +333,161 @@ class PlanRequest(BaseModel):
     request_text: str
 
 @app.post("/generate_plan")
-def generate_plan_endpoint(request: PlanRequest):
+async def generate_plan_endpoint(request: PlanRequest):
     try:
         from backend.rag_engine import generate_study_plan
-        plan = generate_study_plan(request.request_text)
+        plan = await rag_executor.run("generate_plan", generate_study_plan, request.request_text)
         return plan
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 class QueryRequest(BaseModel):
     question: str
     history: List[dict] = []
+    subject: Optional[str] = None
 
 @app.post("/query")
 async def query_kb(request: QueryRequest):
     """
     RAG query endpoint.
     """
-    from backend.rag_engine import query_knowledge_base
-    response = query_knowledge_base(request.question, request.history)
+    response = await rag_executor.run("query", query_knowledge_base, request.question, request.history, request.subject)
     return response
 
+def _sse(events):
+    """Format (event, data) pairs as server-sent events"""
+    async def body():
+        try:
+            async for event, data in events:
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        except Exception as e:
+            # Headers are already sent, so report failures in-band
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+        finally:
+            # Frees the endpoint slot even if the client went away between events
+            await events.aclose()
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.post("/query/stream")
+async def query_kb_stream(request: QueryRequest):
+    """
+    Streaming RAG query: sends "sources", then "token" events, then "done".
+    """
+    from backend.rag_engine import stream_knowledge_base
+    events = await rag_executor.stream("query", stream_knowledge_base, request.question, request.history, request.subject)
+    return _sse(events)
+
 class LessonRequest(BaseModel):
     topic: str
+    subject: Optional[str] = None
 
 @app.post("/generate_lesson")
-def generate_lesson_endpoint(request: LessonRequest, db: Session = Depends(get_db)):
+async def generate_lesson_endpoint(request: LessonRequest):
     try:
         from backend.rag_engine import generate_lesson_content
-        content = generate_lesson_content(request.topic)
+        content = await rag_executor.run("generate_lesson", generate_lesson_content, request.topic, request.subject)
         return {"content": content}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/generate_lesson/stream")
+async def generate_lesson_stream_endpoint(request: LessonRequest):
+    """
+    Streaming lesson: sends "sources", then "token" events, then "done" with the final markdown.
+    """
+    from backend.rag_engine import stream_lesson_content
+    events = await rag_executor.stream("generate_lesson", stream_lesson_content, request.topic, request.subject)
+    return _sse(events)
+
 class QuizRequest(BaseModel):
     topic: str
+    subject: Optional[str] = None
 
 @app.post("/generate_quiz")
-def generate_quiz_endpoint(request: QuizRequest):
+async def generate_quiz_endpoint(request: QuizRequest):
     try:
         from backend.rag_engine import generate_quiz_data
-        quiz_data = generate_quiz_data(request.topic)
+        quiz_data = await rag_executor.run("generate_quiz", generate_quiz_data, request.topic, request.subject)
         return {"quiz": quiz_data}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 # ========== STUDENT PROFILE ENDPOINTS ==========
 
 @app.get("/student/profile")
-def get_student_profile():
-    """Load student profile"""
+def get_student_profile(student_id: str = DEFAULT_STUDENT_ID, quiz_limit: Optional[int] = None):
+    """Load student profile (quiz_limit keeps only the most recent quiz results)"""
     try:
-        profile = profile_manager.load_profile()
+        profile = profile_manager.load_profile(student_id, quiz_limit=quiz_limit)
         return profile
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/student/dashboard")
+def get_student_dashboard(student_id: str = DEFAULT_STUDENT_ID, today: Optional[str] = None,
+                          quiz_limit: int = 20, db: Session = Depends(get_db)):
+    """
+    Everything the first render needs in one round-trip: profile, active
+    sources, mastery and today's topics. The study day is advanced for
+    calendar days since the last visit; nothing is written here, so the
+    client persists the day and date with /student/save_progress when
+    needs_save is set (first visit on a new calendar date). Only the last
+    quiz_limit quiz results are included; topic_scores has the latest
+    result of every quizzed topic.
+    """
+    try:
+        today = today or date_cls.today().isoformat()
+        profile = profile_manager.load_profile(student_id, quiz_limit=quiz_limit)
+        plan_topics = profile["study_plan"]["topics"]
+        stored_day = profile.get("current_study_day") or 1
+        current_day = advance_study_day(plan_topics, stored_day, profile.get("last_access_date"), today)
+
+        sources = db.query(Source).filter(Source.is_active == True).all()
+        return {
+            "profile": profile,
+            "sources": [
+                {"id": s.id, "filename": s.filename, "type": s.type, "is_active": s.is_active, "subject": s.subject}
+                for s in sources
+            ],
+            "mastery": profile["mastery_tracker"],
+            "topic_scores": profile_manager.get_latest_quiz_scores(student_id),
+            "today": {
+                "date": today,
+                "current_study_day": current_day,
+                "days_advanced": max(0, current_day - stored_day),
+                "needs_save": profile.get("last_access_date") != today,
+                "topics": [t for t in plan_topics if t.get("day") == current_day],
+                "incomplete_tasks": [t for t in profile["incomplete_tasks"] if t["from_day"] < current_day]
+            }
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 class SaveProgressRequest(BaseModel):
     current_day: int
     current_topic_id: Optional[int]
     plan_id: Optional[str]
 
 @app.post("/student/save_progress")
-def save_progress(request: dict):
+def save_progress(request: dict, student_id: str = DEFAULT_STUDENT_ID):
     """Save current study state"""
     try:
-        profile = profile_manager.load_profile()
-        
-        # Update current study day if provided
-        if "current_study_day" in request:
-            profile["current_study_day"] = request["current_study_day"]
-        
-        # Update last access date if provided
-        if "last_access_date" in request:
-            profile["last_access_date"] = request["last_access_date"]
-        
-        # Legacy support for current_day and current_topic_id
-        if "current_day" in request:
-            profile["current_study_day"] = request["current_day"]
-        if "current_topic_id" in request:
-            profile.setdefault("current_topic_id", request["current_topic_id"])
-        if "plan_id" in request:
-            if "study_plan" in profile:
-                profile["study_plan"]["plan_id"] = request["plan_id"]
-        
-        profile_manager.save_profile(profile)
+        # Legacy support for current_day
+        current_study_day = request.get("current_study_day", request.get("current_day"))
+
+        profile_manager.update_progress(
+            student_id,
+            current_study_day=current_study_day,
+            last_access_date=request.get("last_access_date"),
+            current_topic_id=request.get("current_topic_id"),
+            plan_id=request.get("plan_id")
+        )
         return {"status": "success"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -260,10 +497,11 @@ class SavePlanRequest(BaseModel):
     num_days: int
 
 @app.post("/student/save_plan")
-def save_study_plan(request: SavePlanRequest):
+def save_study_plan(request: SavePlanRequest, student_id: str = DEFAULT_STUDENT_ID):
     """Save generated study plan"""
     try:
-        plan_id = profile_manager.save_study_plan(request.topics, request.num_days)
+        plan_id = profile_manager.save_study_plan(request.topics, request.num_days, student_id=student_id)
+        analytics_cache.invalidate(student_id)
         return {"status": "saved", "plan_id": plan_id}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -277,7 +515,7 @@ class QuizCompleteRequest(BaseModel):
     time_taken: int = 0
 
 @app.post("/student/quiz_complete")
-def record_quiz(request: QuizCompleteRequest):
+def record_quiz(request: QuizCompleteRequest, student_id: str = DEFAULT_STUDENT_ID):
     """Record quiz completion"""
     try:
         profile_manager.update_quiz_score(
@@ -286,45 +524,74 @@ def record_quiz(request: QuizCompleteRequest):
             request.subject,
             request.score,
             request.total,
-            request.time_taken
+            request.time_taken,
+            student_id=student_id
         )
-        profile_manager.mark_topic_complete(request.topic_id)
+        profile_manager.mark_topic_complete(request.topic_id, student_id=student_id)
+        analytics_cache.invalidate(student_id)
         return {"status": "recorded"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/student/mastery")
-def get_mastery_data():
+def get_mastery_data(student_id: str = DEFAULT_STUDENT_ID):
     """Get subject mastery data"""
     try:
-        mastery = profile_manager.get_mastery_data()
+        mastery = profile_manager.get_mastery_data(student_id)
         return {"mastery": mastery}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/student/analytics")
+def get_student_analytics(student_id: str = DEFAULT_STUDENT_ID):
+    """Per-subject aggregates, score trends and study time (cached until the next quiz or plan save)"""
+    try:
+        analytics = analytics_cache.get(student_id)
+        if analytics is None:
+            generation = analytics_cache.generation(student_id)
+            profile = profile_manager.load_profile(student_id)
+            analytics = compute_analytics(
+                profile_manager.get_subject_index(student_id),
+                profile["quiz_history"],
+                profile["time_tracking"]
+            )
+            analytics_cache.put(student_id, analytics, generation)
+        return analytics
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/student/analytics/subjects")
+def get_subject_index(student_id: str = DEFAULT_STUDENT_ID):
+    """Topics grouped by subject with their latest quiz scores (precomputed on plan save and quiz completion)"""
+    try:
+        return {"subjects": profile_manager.get_subject_index(student_id)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 class IncompleteTaskRequest(BaseModel):
     topic_id: int
     from_day: int
     reason: str = "not_completed"
 
 @app.post("/student/incomplete_task")
-def add_incomplete_task(request: IncompleteTaskRequest):
+def add_incomplete_task(request: IncompleteTaskRequest, student_id: str = DEFAULT_STUDENT_ID):
     """Mark a task as incomplete"""
     try:
         profile_manager.add_incomplete_task(
             request.topic_id,
             request.from_day,
-            request.reason
+            request.reason,
+            student_id=student_id
         )
         return {"status": "added"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/student/incomplete_tasks/{current_day}")
-def get_incomplete_tasks(current_day: int):
+def get_incomplete_tasks(current_day: int, student_id: str = DEFAULT_STUDENT_ID):
     """Get incomplete tasks from previous days"""
     try:
-        tasks = profile_manager.get_incomplete_tasks(current_day)
+        tasks = profile_manager.get_incomplete_tasks(current_day, student_id=student_id)
         return {"incomplete_tasks": tasks}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
@@ -1,64 +1,197 @@
 import os
+import time
 from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain_community.llms import Ollama
-from backend.config import get_llm_provider, get_llm_config, LLMProvider
+from backend.config import get_embedding_config, get_ingestion_config, get_response_cache_config, get_retrieval_config, get_vector_store_config
+from backend.ingest_pipeline import IngestPipeline, hash_file, hash_text, chunk_id, page_windows
+from backend.keyword_index import KeywordIndex
+from backend.topic_index import (
+    HeadingCollector, build_pdf_topics, detect_subject, load_source_topics, read_pdf_outline,
+    save_source_topics, select_granularity, split_into_days
+)
+from backend.response_cache import ResponseCache
+from backend.llm_pool import LLMClientPool
+from backend.vector_registry import VectorStoreRegistry
 
 CACHE_DIR = "./chroma_db"
 
+# Shared store/embedder for the whole process (see backend/main.py lifecycle hooks)
+vector_registry = VectorStoreRegistry(CACHE_DIR, get_embedding_config(), get_vector_store_config())
+
+# Shared LLM clients, keyed by provider
+llm_pool = LLMClientPool()
+
+# BM25 index over the same chunks, fused with dense results at query time
+keyword_index = KeywordIndex(get_retrieval_config()["keyword_index_path"])
+
+# Batched, parallel embedding pipeline used by all ingestion paths
+ingest_pipeline = IngestPipeline(vector_registry, get_ingestion_config(), keyword_index)
+
+# Generated lessons/quizzes, shared by all users of this backend
+response_cache = ResponseCache(**get_response_cache_config())
+
+def get_vector_store():
+    """Get the process-wide vector store"""
+    return vector_registry.get_store()
+
+def _chunk_key(doc) -> str:
+    """
+    Content identity of a retrieved chunk (source + content hash). Equals the
+    store ID for chunks ingested by the pipeline; chunks stored under older
+    random IDs still get the same key as their keyword-index copy.
+    """
+    return chunk_id(doc.metadata.get("source", ""), doc.metadata.get("content_hash") or hash_text(doc.page_content))
+
+def _response_cache_key(kind: str, topic: str, docs: list) -> str:
+    """Cache key from topic, retrieved chunk IDs and the active model config"""
+    chunk_ids = [_chunk_key(d) for d in docs]
+    return response_cache.make_key(kind, topic, chunk_ids, llm_pool.current_fingerprint())
+
+def _active_scope(subject: str = None):
+    """
+    IDs and paths of the active sources to search, limited to a subject
+    when one is given and any source is tagged with it.
+    """
+    from sqlalchemy import or_
+    from backend.database import SessionLocal, Source
+    db = SessionLocal()
+    try:
+        query = db.query(Source.id, Source.file_path).filter(Source.is_active == True)
+        # Plan topics carry the tagged subject, or the one detected at ingest when untagged
+        rows = query.filter(or_(Source.subject == subject, Source.detected_subject == subject)).all() if subject else []
+        if not rows:
+            rows = query.all()
+    finally:
+        db.close()
+    return [r[0] for r in rows], [r[1] for r in rows]
+
+def _retrieve(query: str, purpose: str, subject: str = None) -> list:
+    """
+    Top chunks for a query from active sources (optionally one subject):
+    dense and BM25 candidates merged with reciprocal-rank fusion, so exact
+    keyword hits surface at small k.
+    """
+    config = get_retrieval_config()
+    k = config["k"][purpose]
+    source_ids, paths = _active_scope(subject)
+    if not source_ids:
+        return []
+
+    # Chunks ingested before source_id was stored only carry their path
+    vector_store = get_vector_store()
+    if not config.get("hybrid", True):
+        return vector_store.similarity_search(query, k=k, source_ids=source_ids, sources=paths)
+
+    candidate_k = max(k, config.get("candidate_k", 20))
+    rrf_k = config.get("rrf_k", 60)
+    dense = vector_store.similarity_search(query, k=candidate_k, source_ids=source_ids, sources=paths)
+    keyword_hits = keyword_index.search(query, k=candidate_k, sources=paths)
+
+    # Fuse on content identity rather than store IDs, which differ for legacy chunks
+    keyword_docs = keyword_index.get_documents([chunk for chunk, _ in keyword_hits])
+    keyword_ranked = [keyword_docs[chunk] for chunk, _ in keyword_hits if chunk in keyword_docs]
+
+    scores, docs_by_id = {}, {}
+    for ranked_docs in (dense, keyword_ranked):
+        seen = set()
+        for rank, doc in enumerate(ranked_docs):
+            key = _chunk_key(doc)
+            if key in seen:
+                continue  # a chunk counts once per list
+            seen.add(key)
+            docs_by_id.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank + 1)
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:k]
+    return [docs_by_id[key] for key in ranked]
+
+def sync_keyword_index(batch_size: int = 1000) -> int:
+    """Index chunks already in the vector store but missing from the keyword index"""
+    vector_store = get_vector_store()
+    if keyword_index.count() >= vector_store.count():
+        return 0
+
+    from langchain_core.documents import Document
+    added = 0
+    for ids, texts, metadatas in vector_store.iter_chunks(batch_size):
+        missing = keyword_index.missing(ids)
+        if not missing:
+            continue
+        rows = [
+            (i, Document(page_content=text, metadata=meta))
+            for i, text, meta in zip(ids, texts, metadatas)
+            if i in missing
+        ]
+        keyword_index.add([i for i, _ in rows], [d for _, d in rows])
+        added += len(rows)
+    return added
+
+def _doc_sources(docs: list) -> set:
+    return {d.metadata.get("source", "Unknown") for d in docs}
+
 def get_llm():
     """
     Get LLM instance based on environment configuration.
     Supports both local (Ollama) and cloud (Hugging Face) modes.
+    The client is pooled per provider and reused across requests.
     """
-    provider = get_llm_provider()
-    config = get_llm_config()
-    
-    if provider == LLMProvider.OLLAMA:
-        # Local mode - uses Ollama for offline inference
-        return Ollama(
-            model=config["model"],
-            base_url=config.get("base_url", "http://localhost:11434")
-        )
-    else:
-        # Cloud mode - uses Hugging Face Inference API
-        from langchain_huggingface import HuggingFaceEndpoint
-        return HuggingFaceEndpoint(
-            repo_id=config["model"],
-            huggingfacehub_api_token=config["api_token"],
-            max_length=config.get("max_length", 512),
-            temperature=config.get("temperature", 0.7),
-            task="text-generation"
-        )
-
-
-def ingest_document(file_path: str):
+    return llm_pool.get()
+
+
+def _source_metadata(source_id: int = None, subject: str = None) -> dict:
+    """Per-chunk metadata used to scope retrieval to sources/subjects"""
+    metadata = {}
+    if source_id is not None:
+        metadata["source_id"] = source_id
+    if subject:
+        metadata["subject"] = subject
+    return metadata
+
+def ingest_document(file_path: str, content_hash: str = None, progress=None, source_id: int = None, subject: str = None):
     """
     Ingests a PDF document into the vector database.
+    Only chunks whose content changed since the last ingest are embedded.
+    Pages are read lazily in windows of max_pages_in_flight, so peak
+    memory does not grow with the size of the PDF.
+    source_id/subject are stored on every chunk for scoped retrieval.
+    Returns per-stage timings, chunk counts and the file's content hash.
     """
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
 
-    # Load PDF
-    loader = PyPDFLoader(file_path)
-    docs = loader.load()
+    if content_hash is None:
+        content_hash = hash_file(file_path)
+
+    # The page count only needs the page tree; it lets progress cover the whole document
+    from pypdf import PdfReader
+    pages_total = len(PdfReader(file_path).pages)
+
+    # Stream pages; each window is split, embedded and stored before the next is read
+    if progress:
+        progress("loading", 0, 0, 0, pages_total)
+    window_size = max(1, ingest_pipeline.config.get("max_pages_in_flight", 16))
+    # Headings are picked up as pages stream past, for the topic index
+    headings = HeadingCollector()
+    windows = page_windows(headings.watch(PyPDFLoader(file_path).lazy_load()), window_size)
+    stats = ingest_pipeline.run_windows(windows, source=file_path, progress=progress,
+                                        metadata=_source_metadata(source_id, subject), pages_total=pages_total)
+    stats["max_pages_in_flight"] = window_size
+
+    if source_id is not None:
+        # PDF bookmarks beat guessed headings when the document has them
+        topics = read_pdf_outline(file_path) or headings.topics()
+        _save_topics(source_id, topics, detect_subject(headings.first_text, file_path))
+        stats["topics"] = len(topics)
+    stats["content_hash"] = content_hash
+    return stats
+
+def _save_topics(source_id: int, topics: list, detected_subject: str):
+    """Store a source's topic index; a failure here never fails the ingest"""
+    try:
+        save_source_topics(source_id, topics, detected_subject)
+    except Exception as e:
+        print(f"Could not save topic index for source {source_id}: {e}")
 
-    # Split text
-    splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-    splits = splitter.split_documents(docs)
-    
-    # Store in ChromaDB
-    # Note: Chroma will automatically persist to disk in newer versions when persist_directory is set
-    Chroma.from_documents(
-        documents=splits,
-        embedding=OllamaEmbeddings(model="nomic-embed-text"),
-        persist_directory=CACHE_DIR
-    )
-    # Ingestion successful
-
-def ingest_url(url: str):
+def ingest_url(url: str, progress=None, source_id: int = None, subject: str = None):
     """
     Ingests content from a URL (YouTube or Web).
     """
@@ -66,6 +199,9 @@ def ingest_url(url: str):
     
     docs = []
     try:
+        if progress:
+            progress("loading", 0, 0, 0, 0)
+        t0 = time.perf_counter()
         if "youtube.com" in url or "youtu.be" in url:
 
             try:
@@ -82,19 +218,21 @@ def ingest_url(url: str):
             loader = WebBaseLoader(url)
             docs = loader.load()
             
-        # Generic processing
-        splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-        splits = splitter.split_documents(docs)
+        load_ms = (time.perf_counter() - t0) * 1000
+            
+        # Generic processing: split, embed and store in ChromaDB
+        stats = ingest_pipeline.run(docs, source=url, load_ms=load_ms, progress=progress,
+                                    metadata=_source_metadata(source_id, subject))
         
-        if not splits:
+        if not stats["chunks"]:
             raise ValueError("No content found to ingest")
-            
-        # Store in ChromaDB
-        Chroma.from_documents(
-            documents=splits,
-            embedding=OllamaEmbeddings(model="nomic-embed-text"),
-            persist_directory=CACHE_DIR
-        )
+
+        if source_id is not None:
+            headings = HeadingCollector()
+            for doc in docs:
+                headings.observe(doc)
+            name = docs[0].metadata.get("title") if docs else None
+            _save_topics(source_id, headings.topics(), detect_subject(headings.first_text, name or url))
         
         title = docs[0].metadata.get("title", url) if docs else url
 
@@ -108,88 +246,77 @@ def delete_document(source_path: str):
     """
     Removes a document from the vector database by its source path.
     """
-    vector_store = Chroma(
-        persist_directory=CACHE_DIR,
-        embedding_function=OllamaEmbeddings(model="nomic-embed-text")
-    )
+    vector_store = get_vector_store()
     
     # Delete based on metadata 'source'
     try:
-        # Accessing the underlying chroma collection to delete by metadata
-        vector_store._collection.delete(where={"source": source_path})
+        vector_store.delete(source=source_path)
 
     except Exception as e:
-        print(f"Error deleting from ChromaDB: {e}")
+        print(f"Error deleting from vector store: {e}")
+
+    keyword_index.remove_source(source_path)
+
+    # Cached lessons/quizzes built from this source are no longer valid
+    response_cache.invalidate_source(source_path)
 
 # In backend/rag_engine.py
 
 
-def generate_study_plan(user_request: str):
+def _plan_sources():
+    """Active sources with their topic index, building it for sources ingested before the index existed"""
+    from backend.database import SessionLocal, Source
+    db = SessionLocal()
+    try:
+        sources = [
+            {"id": s.id, "path": s.file_path, "filename": s.filename, "type": s.type,
+             "subject": s.subject or s.detected_subject, "indexed": s.topics_indexed_at is not None}
+            for s in db.query(Source).filter(Source.is_active == True).order_by(Source.id).all()
+        ]
+    finally:
+        db.close()
+
+    topics = load_source_topics([s["id"] for s in sources])
+    for source in sources:
+        # Sources indexed with no headings have a timestamp but no rows; they are not re-parsed
+        indexed = source.pop("indexed") or source["id"] in topics
+        topics.setdefault(source["id"], [])
+        if not indexed:
+            try:
+                if source["path"].lower().endswith(".pdf") and os.path.exists(source["path"]):
+                    entries, detected = build_pdf_topics(source["path"])
+                else:
+                    headings = HeadingCollector()
+                    for doc in keyword_index.source_documents(source["path"]):
+                        headings.observe(doc)
+                    entries, detected = headings.topics(), detect_subject(headings.first_text, source["filename"] or source["path"])
+                save_source_topics(source["id"], entries, detected)
+                topics[source["id"]] = entries
+                source["subject"] = source["subject"] or detected
+            except Exception as e:
+                print(f"Could not build topic index for {source['path']}: {e}")
+        if not source["subject"]:
+            source["subject"] = detect_subject("", source["filename"] or source["path"])
+        # A title page heading that just repeats the subject is not a topic
+        source["topics"] = [t for t in topics[source["id"]] if t["title"].lower() != source["subject"].lower()]
+    return sources
 
-    
-    # Initialize resources
-    vector_store = Chroma(
-        persist_directory=CACHE_DIR,
-        embedding_function=OllamaEmbeddings(model="nomic-embed-text")
-    )
-    llm = get_llm()
-    
+def generate_study_plan(user_request: str):
+    """
+    Build a study plan from the per-source topic index. Each active source
+    is one subject; its outline (at the shallowest level that fills the
+    days) is split into contiguous daily sections, so the plan covers the
+    whole document.
+    """
     # 1. Extract number of days from request (default to 5 if not specified)
     import re
     day_match = re.search(r'(\d+)\s*day', user_request.lower())
-    num_days = int(day_match.group(1)) if day_match else 5
-    
-    # 2. Get documents from MULTIPLE sources
-    docs = vector_store.similarity_search("topics subjects syllabus overview", k=20)
-    
-    # 3. Extract topics grouped by source document (each source = one subject)
-    topics_by_source = {}
-    for doc in docs:
-        source = doc.metadata.get("source", "unknown")
-        if source not in topics_by_source:
-            topics_by_source[source] = {
-                "topics": [],
-                "subject_name": None  # Will extract subject name from content
-            }
-        
-        content = doc.page_content
-        
-        # Try to extract subject name from first occurrence
-        if topics_by_source[source]["subject_name"] is None:
-            # Look for subject indicators in first 200 chars
-            first_part = content[:200].upper()
-            if "MANUFACTURING" in first_part:
-                topics_by_source[source]["subject_name"] = "Manufacturing Technology"
-            elif "OOPS" in first_part or "OBJECT" in first_part:
-                topics_by_source[source]["subject_name"] = "Object-Oriented Programming"
-            elif "DATA STRUCT" in first_part:
-                topics_by_source[source]["subject_name"] = "Data Structures"
-            else:
-                # Use filename as fallback
-                filename = source.split('/')[-1].replace('.pdf', '').replace('-', ' ').title()
-                topics_by_source[source]["subject_name"] = filename
-        
-        # Extract topics from content
-        sentences = content.split('.')
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if len(sentence) > 20 and len(sentence) < 150:
-                # Filter for topic-like content
-                if any(kw in sentence.lower() for kw in ['topic', 'chapter', 'module', 'unit', 'concept', 'introduction', 'process', 'method']):
-                    topics_by_source[source]["topics"].append(sentence)
-                elif sentence[0].isupper() and len(sentence.split()) > 4:
-                    topics_by_source[source]["topics"].append(sentence)
-    
-    # Remove duplicates per source and limit
-    for source in topics_by_source:
-        topics_by_source[source]["topics"] = list(dict.fromkeys(topics_by_source[source]["topics"]))[:num_days * 2]
-    
-    # 4. Create plan with MULTIPLE TOPICS PER DAY (one from each subject)
-    all_sources = list(topics_by_source.keys())
-    num_subjects = len(all_sources)
+    num_days = max(1, int(day_match.group(1))) if day_match else 5
 
-    
-    if num_subjects == 0:
+    # 2. Topic index of every active source (each source = one subject)
+    sources = _plan_sources()
+
+    if not sources:
         # Fallback if no sources found
         return {
             "days": [
@@ -197,55 +324,58 @@ def generate_study_plan(user_request: str):
                 for i in range(1, num_days + 1)
             ]
         }
-    
-    # Generate plan: For each day, create one topic from each subject
+
+    # 3. Split each source's outline over the days
+    days_by_source = []
+    for source in sources:
+        entries = select_granularity(source["topics"], num_days)
+        days_by_source.append(split_into_days(entries, num_days) if entries else [[] for _ in range(num_days)])
+
+    # 4. Create plan with MULTIPLE TOPICS PER DAY (one from each subject)
     plan_days = []
     topic_id = 1
-    
+
     for day_num in range(1, num_days + 1):
-        # For this day, create one topic from each subject
-        for source_idx, source in enumerate(all_sources):
-            subject_name = topics_by_source[source]["subject_name"]
-            source_topics = topics_by_source[source]["topics"]
-            
-            # Get topic for this day from this subject
-            # Use round-robin approach: take different topic for each day
-            topic_idx = (day_num - 1) % len(source_topics) if source_topics else 0
-            
-            if source_topics and topic_idx < len(source_topics):
-                topic_text = source_topics[topic_idx]
-                # Clean up topic text
-                topic_text = topic_text[:100]  # Limit length
+        for source, days in zip(sources, days_by_source):
+            subject_name = source["subject"]
+            section = days[day_num - 1]
+
+            if section:
+                topic_text = section[0]["title"]
+                covered = "; ".join(t["title"] for t in section)
+                pages = [t["page"] for t in section if t.get("page") is not None]
+                details = f"Covers: {covered}"
+                if pages:
+                    details += f" (pp. {min(pages) + 1}-{max(pages) + 1})"
+            elif source["topics"]:
+                # More days than sections: revisit earlier material
+                entries = [t for group in days for t in group]
+                topic_text = f"Review: {entries[(day_num - 1) % len(entries)]['title']}"
+                details = f"Revision of {subject_name}"
             else:
-                topic_text = f"Concepts and Principles"
-            
-            # Create topic entry
+                topic_text = "Concepts and Principles"
+                details = f"Study material for {subject_name}"
+
             plan_days.append({
                 "day": day_num,
                 "id": topic_id,
                 "subject": subject_name,
                 "topic": f"{subject_name}: {topic_text}",
-                "details": f"Study material for {subject_name}",
+                "details": details[:300],
                 "status": "unlocked" if day_num == 1 else "locked",
                 "quiz_passed": False
             })
             topic_id += 1
-    
 
     return {"days": plan_days}
 
-def generate_lesson_content(topic_title: str):
-
-    
-    # Initialize resources
-    vector_store = Chroma(
-        persist_directory=CACHE_DIR,
-        embedding_function=OllamaEmbeddings(model="nomic-embed-text")
-    )
-    llm = get_llm()
-    
-    # 1. Search DB for comprehensive context (increased from 4 to 8 chunks)
-    docs = vector_store.similarity_search(topic_title, k=8)
+def _prepare_lesson(topic_title: str, subject: str = None):
+    """
+    Retrieve context for a lesson and build its prompt.
+    Returns (prompt, sources_list, docs).
+    """
+    # 1. Search DB for context (hybrid retrieval keeps k small)
+    docs = _retrieve(topic_title, "lesson", subject)
     context_text = "\n".join([d.page_content[:500] for d in docs])  # Increased from 400 to 500 chars
     
     # 2. Extract source citations
@@ -307,39 +437,77 @@ Make this comprehensive and educational. Aim for 600-800 words. Use clear explan
 
 Markdown content:"""
     
+    return prompt, sources_list, docs
+
+def _finalize_lesson(response: str, sources_list: list) -> str:
+    """Clean the raw LLM output and append the references section"""
+    # Clean potential markdown wrappers
+    clean_text = response.replace("```markdown", "").replace("```", "").strip()
+    
+    # If response is too short, add a note
+    if len(clean_text) < 200:
+        clean_text += "\n\n*Note: For more detailed information, please refer to your course materials or ask specific questions in the chat.*"
+    
+    # Append sources reference section
+    if sources_list:
+        clean_text += "\n\n---\n\n### 📚 References\n\n"
+        for idx, src in enumerate(sources_list, 1):
+            clean_text += f"{idx}. **{src['filename']}**, page {src['page']}\n"
+    
+    return clean_text
+
+def generate_lesson_content(topic_title: str, subject: str = None):
+    prompt, sources_list, docs = _prepare_lesson(topic_title, subject)
+    cache_key = _response_cache_key("lesson", topic_title, docs)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    llm = get_llm()
+    
     # 4. Generate
     try:
         response = llm.invoke(prompt)
-        # Clean potential markdown wrappers
-        clean_text = response.replace("```markdown", "").replace("```", "").strip()
-        
-        # If response is too short, add a note
-        if len(clean_text) < 200:
-            clean_text += "\n\n*Note: For more detailed information, please refer to your course materials or ask specific questions in the chat.*"
-        
-        # Append sources reference section
-        if sources_list:
-            clean_text += "\n\n---\n\n### 📚 References\n\n"
-            for idx, src in enumerate(sources_list, 1):
-                clean_text += f"{idx}. **{src['filename']}**, page {src['page']}\n"
-        
-        return clean_text
+        content = _finalize_lesson(response, sources_list)
+        response_cache.put(cache_key, content, _doc_sources(docs))
+        return content
     except Exception as e:
         return f"### Error Generating Lesson\nCould not retrieve content: {e}"
 
-
-def query_knowledge_base(question: str, history: list = []):
-
+def stream_lesson_content(topic_title: str, subject: str = None):
+    """
+    Streaming variant of generate_lesson_content.
+    Yields (event, data) pairs: "sources" once, "token" per chunk, then "done"
+    with the cleaned lesson (or "error").
+    """
+    prompt, sources_list, docs = _prepare_lesson(topic_title, subject)
+    yield "sources", sources_list
     
-    # Init
-    vector_store = Chroma(
-        persist_directory=CACHE_DIR,
-        embedding_function=OllamaEmbeddings(model="nomic-embed-text")
-    )
-    llm = get_llm()
+    cache_key = _response_cache_key("lesson", topic_title, docs)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        yield "done", {"content": cached, "cached": True}
+        return
     
+    llm = get_llm()
+    parts = []
+    try:
+        for chunk in llm.stream(prompt):
+            parts.append(chunk)
+            yield "token", chunk
+        content = _finalize_lesson("".join(parts), sources_list)
+        response_cache.put(cache_key, content, _doc_sources(docs))
+        yield "done", {"content": content}
+    except Exception as e:
+        yield "error", {"content": f"### Error Generating Lesson\nCould not retrieve content: {e}"}
+
+
+def _prepare_query(question: str, history: list, subject: str = None):
+    """
+    Retrieve context for a question and build its prompt.
+    Returns (prompt, sources_list).
+    """
     # 1. Search
-    docs = vector_store.similarity_search(question, k=3)
+    docs = _retrieve(question, "query", subject)
     context = "\n".join([d.page_content[:500] for d in docs])
     
     # 2. Format History
@@ -357,32 +525,57 @@ def query_knowledge_base(question: str, history: list = []):
     If you don't know, say "I don't know".
     """
     
-    res = llm.invoke(prompt)
-    
     # Return source metadata
     sources_list = []
     for d in docs:
         meta = d.metadata
         sources_list.append({"source": meta.get("source", "Unknown"), "page": meta.get("page", 1)})
+    
+    return prompt, sources_list
+
+def query_knowledge_base(question: str, history: list = [], subject: str = None):
+    prompt, sources_list = _prepare_query(question, history, subject)
+    llm = get_llm()
+    
+    res = llm.invoke(prompt)
         
     return {
         "answer": res,
         "sources": sources_list
     }
-def generate_quiz_data(topic_title: str):
 
+def stream_knowledge_base(question: str, history: list = [], subject: str = None):
+    """
+    Streaming variant of query_knowledge_base.
+    Yields (event, data) pairs: "sources" once, "token" per chunk, then "done".
+    """
+    prompt, sources_list = _prepare_query(question, history, subject)
+    yield "sources", sources_list
     
-    # Initialize resources
-    vector_store = Chroma(
-        persist_directory=CACHE_DIR,
-        embedding_function=OllamaEmbeddings(model="nomic-embed-text")
-    )
     llm = get_llm()
+    parts = []
+    try:
+        for chunk in llm.stream(prompt):
+            parts.append(chunk)
+            yield "token", chunk
+        yield "done", {"answer": "".join(parts), "sources": sources_list}
+    except Exception as e:
+        yield "error", {"answer": f"Error generating answer: {e}", "sources": sources_list}
+
+def generate_quiz_data(topic_title: str, subject: str = None):
 
+    
     # 1. Search Context
-    docs = vector_store.similarity_search(topic_title, k=3)
+    docs = _retrieve(topic_title, "quiz", subject)
     context_text = "\n".join([d.page_content[:300] for d in docs])
     
+    # Serve a previously generated quiz for the same topic and context
+    cache_key = _response_cache_key("quiz", topic_title, docs)
+    cached = response_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    llm = get_llm()
+    
     # Helper: Generate realistic fallback quiz from context
     def create_context_based_fallback():
         """Generate realistic quiz questions from context when LLM fails"""
@@ -511,6 +704,8 @@ JSON:"""
         elif len(quiz_data) > 3:
             quiz_data = quiz_data[:3]  # Trim to exactly 3
         
+        # Only LLM-generated quizzes are cached; fallbacks retry next time
+        response_cache.put(cache_key, quiz_data, _doc_sources(docs))
         return quiz_data
         
     except Exception as e:
@@ -0,0 +1,94 @@
+"""
+Response Cache - Server-side TTL/LRU cache for generated lessons and quizzes.
+Entries are keyed on topic, the IDs of the retrieved chunks and the model
+configuration, and remember which sources contributed to them so deleting a
+source drops every response built from it.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterable, Optional
+
+
+class ResponseCache:
+    """Thread-safe TTL/LRU cache indexed by contributing source"""
+
+    def __init__(self, max_entries: int = 500, ttl_seconds: float = 86400):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.lock = threading.Lock()
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (expires_at, value, sources)
+        self._by_source = {}  # source -> set of keys
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def make_key(kind: str, topic: str, chunk_ids: Iterable[str], model_fingerprint: str) -> str:
+        payload = json.dumps({
+            "kind": kind,
+            "topic": topic.strip().lower(),
+            "chunks": sorted(chunk_ids),
+            "model": model_fingerprint
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _drop(self, key: str):
+        """Remove an entry and its source index links (caller holds the lock)"""
+        _, _, sources = self._entries.pop(key)
+        for source in sources:
+            keys = self._by_source.get(source)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._by_source[source]
+
+    def get(self, key: str) -> Optional[Any]:
+        with self.lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            if entry[0] < time.time():
+                self._drop(key)
+                self._stats["misses"] += 1
+                self._stats["evictions"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key: str, value: Any, sources: Iterable[str]):
+        sources = set(sources)
+        with self.lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.time() + self.ttl_seconds, value, sources)
+            for source in sources:
+                self._by_source.setdefault(source, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self._stats["evictions"] += 1
+
+    def invalidate_source(self, source: str) -> int:
+        """Drop every entry built from a source; returns how many were removed"""
+        with self.lock:
+            keys = list(self._by_source.get(source, ()))
+            for key in keys:
+                self._drop(key)
+            self._stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
+            self._by_source.clear()
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 3) if lookups else 0.0
+        return stats
@@ -1,233 +1,823 @@
 """
 Student Profile Manager - Handles persistent storage of student learning data
+Profiles live in the application database, keyed by student_id: quiz history,
+mastery, study time and incomplete tasks are rows in indexed per-student
+tables, so requests for different students never wait on each other.
+Profiles are served from memory after the first read; progress and study
+time updates are written behind, so a burst of them becomes one transaction.
 """
+import copy
 import json
-import os
-import shutil
-from datetime import datetime
+import math
+import random
+import re
+import threading
+import time
+from datetime import date, datetime
 from pathlib import Path
 from typing import Dict, List, Optional
-import threading
+
+from sqlalchemy import func, inspect, text
+from sqlalchemy.exc import IntegrityError
+
+from backend.config import get_mastery_config, get_profile_cache_config
+from backend.database import SessionLocal, StudentProfile, QuizResult, SubjectMastery, TopicTime, IncompleteTask, SubjectTopic
+
+# Student used by clients that don't send an ID (and for the legacy JSON profile)
+DEFAULT_STUDENT_ID = "default"
+
+
+def advance_study_day(plan_topics: List[dict], current_study_day: int, last_access_date: Optional[str],
+                      today: str) -> int:
+    """Study day after moving forward one day per calendar day since the last visit, capped at the plan length"""
+    if not plan_topics or not last_access_date or last_access_date == today:
+        return current_study_day
+    try:
+        days_passed = (date.fromisoformat(today) - date.fromisoformat(last_access_date)).days
+    except ValueError:
+        return current_study_day
+    if days_passed <= 0:
+        return current_study_day
+    max_day = max(t.get("day", 1) for t in plan_topics)
+    return min(current_study_day + days_passed, max_day)
+
+
+def subject_for_topic(topic: dict) -> str:
+    """A plan topic's subject; older plans without one fall back to guessing from the title"""
+    if topic.get("subject"):
+        return topic["subject"]
+    title = re.sub(r"^Day\s+\d+:\s*", "", topic.get("title") or topic.get("topic") or "")
+    if ":" in title:
+        subject = title.split(":")[0].strip()
+    elif " - " in title:
+        subject = title.split(" - ")[0].strip()
+    else:
+        words = []
+        for word in title.split()[:3]:
+            if not (word[0].isupper() or word.isupper()):
+                break
+            words.append(word)
+        subject = " ".join(words)
+    if not subject or subject.startswith("Day"):
+        return "General"
+    return subject
+
 
 class StudentProfileManager:
-    """Manages student profile data with JSON file persistence"""
-    
-    def __init__(self):
-        self.profile_dir = Path.home() / ".focusflow"
-        self.profile_file = self.profile_dir / "student_profile.json"
-        self.backup_file = self.profile_dir / "student_profile.backup.json"
+    """Manages per-student profile data in the SQLAlchemy database"""
+
+    def __init__(self, session_factory=SessionLocal, flush_delay: Optional[float] = None,
+                 max_flush_delay: Optional[float] = None):
+        self.session_factory = session_factory
+        self.legacy_profile_file = Path.home() / ".focusflow" / "student_profile.json"
+
+        config = get_profile_cache_config()
+        self.flush_delay = config["flush_delay"] if flush_delay is None else flush_delay
+        self.max_flush_delay = config["max_flush_delay"] if max_flush_delay is None else max_flush_delay
+
+        # Guards the cache and pending changes; also held while pending changes are committed
         self.lock = threading.Lock()
-        self._ensure_profile_exists()
-    
-    def _ensure_profile_exists(self):
-        """Create profile directory and file if not exists"""
-        self.profile_dir.mkdir(exist_ok=True)
-        
-        if not self.profile_file.exists():
-            # Create new profile with default structure
-            default_profile = {
-                "student_id": f"student_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
-                "created_at": datetime.now().isoformat(),
+        self._profiles = {}  # student_id -> profile as last read from the database
+        # Bumped whenever a student's rows change so a read racing a write is not cached
+        self._generations = {}
+        self._epoch = 0  # bumped when every student's rows may have changed
+        # Write-behind: student_id -> {"progress": {column: value}, "minutes": {topic_id: minutes}, "last_active": str}
+        self._pending = {}
+        self._first_dirty_at = None
+        self._last_dirty_at = None
+        self._dirty_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._flusher = None
+        self._closed = False
+        self._stats = {"hits": 0, "misses": 0, "flushes": 0, "coalesced_updates": 0}
+
+    def _invalidate(self, student_id: Optional[str] = None):
+        """Drop cached profiles after their rows changed (all students when student_id is None)"""
+        with self.lock:
+            if student_id is None:
+                self._epoch += 1
+                self._profiles.clear()
+            else:
+                self._generations[student_id] = self._generations.get(student_id, 0) + 1
+                self._profiles.pop(student_id, None)
+
+    def _queue_update(self, student_id: str, progress: Optional[dict] = None, topic_id: Optional[str] = None,
+                      minutes: int = 0):
+        """Record a write-behind update in memory and wake the flusher"""
+        now = time.monotonic()
+        with self.lock:
+            pending = self._pending.setdefault(student_id, {"progress": {}, "minutes": {}, "last_active": None})
+            if progress:
+                pending["progress"].update(progress)
+            if topic_id is not None:
+                pending["minutes"][topic_id] = pending["minutes"].get(topic_id, 0) + minutes
+            pending["last_active"] = datetime.now().isoformat()
+            self._stats["coalesced_updates"] += 1
+
+            if self._first_dirty_at is None:
+                self._first_dirty_at = now
+            self._last_dirty_at = now
+            closed = self._closed
+            if self._flusher is None and not closed:
+                self._flusher = threading.Thread(target=self._flush_loop, name="profile-flusher", daemon=True)
+                self._flusher.start()
+        if closed:
+            # No flusher after shutdown; write through
+            self.flush(student_id)
+        else:
+            self._dirty_event.set()
+
+    def _flush_loop(self):
+        """Write-behind: flush once updates go quiet, or after max_flush_delay"""
+        while not self._closed:
+            self._dirty_event.wait()
+            if self._closed:
+                break
+            while True:
+                with self.lock:
+                    if self._first_dirty_at is None:
+                        break
+                    now = time.monotonic()
+                    due = min(self._last_dirty_at + self.flush_delay, self._first_dirty_at + self.max_flush_delay)
+                if now >= due or self._stop_event.wait(due - now):
+                    break
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Profile flush failed: {e}")
+                self._stop_event.wait(self.flush_delay)
+
+    def flush(self, student_id: Optional[str] = None):
+        """Commit pending progress and study time updates (one student's, or everyone's)"""
+        with self.lock:
+            if student_id is None:
+                self._dirty_event.clear()
+                batch, self._pending = self._pending, {}
+                self._first_dirty_at = None
+                self._last_dirty_at = None
+            else:
+                batch = {student_id: self._pending.pop(student_id)} if student_id in self._pending else {}
+            if not batch:
+                return
+
+            written = []
+            try:
+                for sid, changes in batch.items():
+                    with self.session_factory() as db:
+                        self._write_pending(db, sid, changes)
+                        db.commit()
+                    written.append(sid)
+            finally:
+                # Anything not committed goes back in front of newer updates
+                for sid, changes in batch.items():
+                    if sid not in written:
+                        self._requeue(sid, changes)
+                for sid in written:
+                    self._generations[sid] = self._generations.get(sid, 0) + 1
+                    self._profiles.pop(sid, None)
+                if written:
+                    self._stats["flushes"] += 1
+
+    def _write_pending(self, db, student_id: str, changes: dict):
+        row = self._get_or_create(db, student_id)
+        for column, value in changes["progress"].items():
+            setattr(row, column, value)
+        for topic_id, minutes in changes["minutes"].items():
+            row.total_study_time_minutes = (row.total_study_time_minutes or 0) + minutes
+            entry = db.query(TopicTime).filter(
+                TopicTime.student_id == student_id,
+                TopicTime.topic_id == topic_id
+            ).first()
+            if entry is None:
+                db.add(TopicTime(student_id=student_id, topic_id=topic_id, minutes=minutes))
+            else:
+                entry.minutes += minutes
+        row.last_active = changes["last_active"]
+
+    def _requeue(self, student_id: str, changes: dict):
+        """Put back changes that failed to commit (caller holds the lock)"""
+        pending = self._pending.get(student_id)
+        if pending is None:
+            self._pending[student_id] = changes
+        else:
+            # Updates queued meanwhile are newer and win
+            pending["progress"] = {**changes["progress"], **pending["progress"]}
+            for topic_id, minutes in changes["minutes"].items():
+                pending["minutes"][topic_id] = pending["minutes"].get(topic_id, 0) + minutes
+        if self._first_dirty_at is None:
+            self._first_dirty_at = self._last_dirty_at = time.monotonic()
+        self._dirty_event.set()
+
+    @property
+    def is_dirty(self) -> bool:
+        """True while updates are waiting for the write-behind flusher"""
+        with self.lock:
+            return bool(self._pending)
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            stats = dict(self._stats)
+            stats["cached_profiles"] = len(self._profiles)
+            stats["pending_students"] = len(self._pending)
+        return stats
+
+    def close(self):
+        """Stop the flusher and commit whatever is still pending"""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop_event.set()
+        self._dirty_event.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+        self.flush()
+
+    def _get_or_create(self, db, student_id: str) -> StudentProfile:
+        """Fetch a student's profile row, creating it on first use"""
+        row = db.get(StudentProfile, student_id)
+        if row is not None:
+            return row
+
+        now = datetime.now()
+        row = StudentProfile(
+            student_id=student_id,
+            created_at=now.isoformat(),
+            last_active=now.isoformat(),
+            current_study_day=1,
+            last_access_date=now.strftime("%Y-%m-%d"),
+            plan_num_days=0,
+            plan_topics=[],
+            total_study_time_minutes=0
+        )
+        db.add(row)
+        try:
+            db.flush()
+        except IntegrityError:
+            # Another request created it first
+            db.rollback()
+            return db.get(StudentProfile, student_id)
+        return row
+
+    def import_legacy_profile(self) -> bool:
+        """
+        Carry over the single-user JSON profile from earlier versions into the
+        default student, once (run at startup); returns True if it was imported
+        """
+        if not self.legacy_profile_file.exists():
+            return False
+        try:
+            with open(self.legacy_profile_file, 'r') as f:
+                legacy = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Could not read legacy profile {self.legacy_profile_file}: {e}")
+            return False
+
+        with self.session_factory() as db:
+            if db.get(StudentProfile, DEFAULT_STUDENT_ID) is not None:
+                return False
+            row = self._get_or_create(db, DEFAULT_STUDENT_ID)
+            self._import_legacy_data(db, row, legacy)
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker imported it first
+                db.rollback()
+                return False
+        self._invalidate(DEFAULT_STUDENT_ID)
+        return True
+
+    def _import_legacy_data(self, db, row: StudentProfile, legacy: dict):
+        """Copy a legacy JSON profile into a new profile row and its per-student tables"""
+        plan = legacy.get("study_plan", {})
+        row.created_at = legacy.get("created_at", row.created_at)
+        row.current_study_day = legacy.get("current_study_day", 1)
+        row.last_access_date = legacy.get("last_access_date", row.last_access_date)
+        row.current_topic_id = legacy.get("current_state", {}).get("current_topic_id")
+        row.plan_id = plan.get("plan_id")
+        row.plan_created_at = plan.get("created_at")
+        row.plan_num_days = plan.get("num_days", 0)
+        row.plan_topics = plan.get("topics", [])
+
+        for record in legacy.get("quiz_history", []):
+            db.add(QuizResult(student_id=row.student_id, **self._quiz_columns(record)))
+
+        for subject, mastery in legacy.get("mastery_tracker", {}).items():
+            entry = self._new_mastery(row.student_id, subject)
+            entry.total_topics = mastery.get("total_topics", 0)
+            # Fold the old full score list into the running aggregates
+            for score in mastery.get("scores", []):
+                self._observe_score(entry, score)
+            db.add(entry)
+
+        tracking = legacy.get("time_tracking", {})
+        row.total_study_time_minutes = tracking.get("total_study_time_minutes", 0)
+        for topic_id, minutes in tracking.get("topics_time", {}).items():
+            db.add(TopicTime(student_id=row.student_id, topic_id=str(topic_id), minutes=minutes))
+
+        for task in legacy.get("incomplete_tasks", []):
+            db.add(IncompleteTask(
+                student_id=row.student_id,
+                topic_id=task["topic_id"],
+                from_day=task["from_day"],
+                reason=task.get("reason", "not_completed"),
+                added_at=task.get("added_at")
+            ))
+        db.flush()
+
+    @staticmethod
+    def _quiz_columns(record: dict) -> dict:
+        return {
+            "topic_id": record["topic_id"],
+            "topic_title": record.get("topic_title"),
+            "subject": record.get("subject"),
+            "timestamp": record.get("timestamp"),
+            "score": record["score"],
+            "total": record["total"],
+            "percentage": record.get("percentage", 0),
+            "time_taken_seconds": record.get("time_taken_seconds", 0)
+        }
+
+    @staticmethod
+    def _mastery_dict(mastery: SubjectMastery) -> dict:
+        count = mastery.score_count or 0
+        variance = mastery.score_m2 / (count - 1) if count > 1 else 0.0
+        return {
+            "avg_score": mastery.avg_score,
+            "topics_completed": mastery.topics_completed,
+            "total_topics": mastery.total_topics,
+            "mastery_level": mastery.mastery_level,
+            "score_count": count,
+            "score_variance": variance,
+            "score_stddev": math.sqrt(variance),
+            "recent_score": mastery.recent_score,
+            "score_samples": list(mastery.score_samples or [])
+        }
+
+    @staticmethod
+    def _task_dict(task: IncompleteTask) -> dict:
+        return {
+            "topic_id": task.topic_id,
+            "from_day": task.from_day,
+            "reason": task.reason,
+            "added_at": task.added_at
+        }
+
+    @staticmethod
+    def _quiz_dict(quiz: QuizResult) -> dict:
+        return {
+            "topic_id": quiz.topic_id,
+            "topic_title": quiz.topic_title,
+            "subject": quiz.subject,
+            "timestamp": quiz.timestamp,
+            "score": quiz.score,
+            "total": quiz.total,
+            "percentage": quiz.percentage,
+            "time_taken_seconds": quiz.time_taken_seconds
+        }
+
+    @staticmethod
+    def _empty_profile(student_id: str) -> dict:
+        """Profile of a student with no saved data yet"""
+        return {
+            "student_id": student_id,
+            "created_at": None,
+            "last_active": None,
+            "study_plan": {"plan_id": None, "created_at": None, "num_days": 0, "topics": []},
+            "current_study_day": 1,
+            "last_access_date": None,
+            "current_state": {"current_day": 1, "current_topic_id": None, "active_plan_id": None},
+            "quiz_history": [],
+            "quiz_count": 0,
+            "mastery_tracker": {},
+            "time_tracking": {"total_study_time_minutes": 0, "topics_time": {}},
+            "incomplete_tasks": []
+        }
+
+    def load_profile(self, student_id: str = DEFAULT_STUDENT_ID, quiz_limit: Optional[int] = None) -> dict:
+        """
+        Load a student's profile without writing anything (a new student's row
+        is created by its first write). Served from memory after the first
+        read, with updates still waiting to be written behind applied on top.
+        quiz_limit keeps only the most recent quiz results; quiz_count is
+        always the full number.
+        """
+        while True:
+            with self.lock:
+                cached = self._profiles.get(student_id)
+                if cached is not None:
+                    self._stats["hits"] += 1
+                    pending = copy.deepcopy(self._pending.get(student_id))
+                    break
+                self._stats["misses"] += 1
+                generation = (self._epoch, self._generations.get(student_id, 0))
+
+            loaded = self._read_profile(student_id)
+            with self.lock:
+                # Retry if the student's rows changed while they were being read
+                if (self._epoch, self._generations.get(student_id, 0)) == generation:
+                    self._profiles[student_id] = cached = loaded
+                    pending = copy.deepcopy(self._pending.get(student_id))
+                    break
+
+        # Cached profiles are replaced, never modified, so copying needs no lock
+        history = cached["quiz_history"]
+        if quiz_limit is not None:
+            history = history[-quiz_limit:] if quiz_limit > 0 else []
+        profile = copy.deepcopy({key: value for key, value in cached.items() if key != "quiz_history"})
+        profile["quiz_history"] = [dict(q) for q in history]
+        if pending:
+            self._apply_pending(profile, pending)
+        return profile
+
+    @staticmethod
+    def _apply_pending(profile: dict, pending: dict):
+        """Overlay updates that have not been written yet onto a profile dict"""
+        progress = pending["progress"]
+        if "current_study_day" in progress:
+            profile["current_study_day"] = progress["current_study_day"]
+            profile["current_state"]["current_day"] = progress["current_study_day"]
+        if "last_access_date" in progress:
+            profile["last_access_date"] = progress["last_access_date"]
+        if "current_topic_id" in progress:
+            profile["current_state"]["current_topic_id"] = progress["current_topic_id"]
+        if "plan_id" in progress:
+            profile["study_plan"]["plan_id"] = progress["plan_id"]
+            profile["current_state"]["active_plan_id"] = progress["plan_id"]
+
+        tracking = profile["time_tracking"]
+        for topic_id, minutes in pending["minutes"].items():
+            tracking["total_study_time_minutes"] = (tracking["total_study_time_minutes"] or 0) + minutes
+            tracking["topics_time"][topic_id] = tracking["topics_time"].get(topic_id, 0) + minutes
+        if pending["last_active"]:
+            profile["last_active"] = pending["last_active"]
+
+    def _read_profile(self, student_id: str) -> dict:
+        """A student's full profile as stored in the database"""
+        with self.session_factory() as db:
+            row = db.get(StudentProfile, student_id)
+            if row is None:
+                return self._empty_profile(student_id)
+
+            quizzes = db.query(QuizResult).filter(QuizResult.student_id == student_id).order_by(QuizResult.id).all()
+            quiz_count = len(quizzes)
+            mastery = db.query(SubjectMastery).filter(SubjectMastery.student_id == student_id).all()
+            times = db.query(TopicTime).filter(TopicTime.student_id == student_id).all()
+            tasks = db.query(IncompleteTask).filter(IncompleteTask.student_id == student_id).order_by(IncompleteTask.id).all()
+
+            return {
+                "student_id": row.student_id,
+                "created_at": row.created_at,
+                "last_active": row.last_active,
                 "study_plan": {
-                    "plan_id": None,
-                    "topics": [],
-                    "num_days": 0
+                    "plan_id": row.plan_id,
+                    "created_at": row.plan_created_at,
+                    "num_days": row.plan_num_days,
+                    "topics": row.plan_topics or []
                 },
-                "current_study_day": 1,
-                "last_access_date": datetime.now().strftime("%Y-%m-%d"),
-                "quiz_history": [],
-                "mastery_tracker": {},
+                "current_study_day": row.current_study_day,
+                "last_access_date": row.last_access_date,
+                "current_state": {
+                    "current_day": row.current_study_day,
+                    "current_topic_id": row.current_topic_id,
+                    "active_plan_id": row.plan_id
+                },
+                "quiz_history": [self._quiz_dict(q) for q in quizzes],
+                "quiz_count": quiz_count,
+                "mastery_tracker": {m.subject: self._mastery_dict(m) for m in mastery},
                 "time_tracking": {
-                    "total_study_time_minutes": 0,
-                    "topics_time": {}
+                    "total_study_time_minutes": row.total_study_time_minutes,
+                    "topics_time": {t.topic_id: t.minutes for t in times}
                 },
-                "incomplete_tasks": []
+                "incomplete_tasks": [self._task_dict(t) for t in tasks]
             }
-            self._save_to_file(default_profile)
-    
-    def _save_to_file(self, profile: dict):
-        """Atomic write to file with backup"""
-        try:
-            # Create backup of existing file
-            if self.profile_file.exists():
-                shutil.copy2(self.profile_file, self.backup_file)
-            
-            # Write to temporary file first
-            temp_file = self.profile_file.with_suffix('.tmp')
-            with open(temp_file, 'w') as f:
-                json.dump(profile, f, indent=2)
-            
-            # Atomic rename
-            temp_file.replace(self.profile_file)
-            
-        except Exception as e:
-            # Error saving profile, attempt to restore from backup
-            if self.backup_file.exists():
-                shutil.copy2(self.backup_file, self.profile_file)
-            raise
-    
-    def load_profile(self) -> dict:
-        """Load student profile from disk"""
-        with self.lock:
-            try:
-                with open(self.profile_file, 'r') as f:
-                    profile = json.load(f)
-                
-                # Update last active
-                profile["last_active"] = datetime.now().isoformat()
-                self._save_to_file(profile)
-                
-                return profile
-            except Exception as e:
 
-                # Return default profile
-                self._ensure_profile_exists()
-                return self.load_profile()
-    
-    def save_profile(self, profile: dict):
-        """Save student profile to disk"""
-        with self.lock:
-            profile["last_active"] = datetime.now().isoformat()
-            self._save_to_file(profile)
-    
-    def update_current_state(self, current_day: int, current_topic_id: Optional[int], plan_id: Optional[str]):
-        """Update current position in study plan"""
-        profile = self.load_profile()
-        profile["current_state"] = {
-            "current_day": current_day,
-            "current_topic_id": current_topic_id,
-            "active_plan_id": plan_id
+    def get_latest_quiz_scores(self, student_id: str = DEFAULT_STUDENT_ID) -> Dict[int, dict]:
+        """Most recent quiz result per topic"""
+        with self.session_factory() as db:
+            latest_ids = db.query(func.max(QuizResult.id)).filter(
+                QuizResult.student_id == student_id
+            ).group_by(QuizResult.topic_id)
+            quizzes = db.query(QuizResult).filter(QuizResult.id.in_(latest_ids)).all()
+            return {q.topic_id: self._quiz_dict(q) for q in quizzes}
+
+    def update_progress(self, student_id: str = DEFAULT_STUDENT_ID, current_study_day: Optional[int] = None,
+                        last_access_date: Optional[str] = None, current_topic_id: Optional[int] = None,
+                        plan_id: Optional[str] = None):
+        """Update day/date/position fields that were provided (written behind)"""
+        progress = {
+            column: value for column, value in (
+                ("current_study_day", current_study_day),
+                ("last_access_date", last_access_date),
+                ("current_topic_id", current_topic_id),
+                ("plan_id", plan_id)
+            ) if value is not None
         }
-        self.save_profile(profile)
-    
-    def save_study_plan(self, topics: List[dict], num_days: int):
+        self._queue_update(student_id, progress=progress)
+
+    def update_current_state(self, current_day: int, current_topic_id: Optional[int], plan_id: Optional[str],
+                             student_id: str = DEFAULT_STUDENT_ID):
+        """Update current position in study plan"""
+        self.update_progress(student_id, current_study_day=current_day, current_topic_id=current_topic_id, plan_id=plan_id)
+
+    def save_study_plan(self, topics: List[dict], num_days: int, student_id: str = DEFAULT_STUDENT_ID):
         """Save study plan"""
-        profile = self.load_profile()
         plan_id = f"plan_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        
-        profile["study_plan"] = {
-            "plan_id": plan_id,
-            "created_at": datetime.now().isoformat(),
-            "num_days": num_days,
-            "topics": topics
-        }
-        profile["current_state"]["active_plan_id"] = plan_id
-        
-        self.save_profile(profile)
+        self.flush(student_id)
+        with self.session_factory() as db:
+            row = self._get_or_create(db, student_id)
+            row.plan_id = plan_id
+            row.plan_created_at = datetime.now().isoformat()
+            row.plan_num_days = num_days
+            row.plan_topics = topics
+            row.last_active = datetime.now().isoformat()
+            self._rebuild_subject_index(db, student_id, topics)
+            db.commit()
+        self._invalidate(student_id)
         return plan_id
-    
-    def update_quiz_score(self, topic_id: int, topic_title: str, subject: str, score: int, total: int, time_taken: int = 0):
+
+    @staticmethod
+    def _rebuild_subject_index(db, student_id: str, topics: List[dict]):
+        """Replace a student's subject/topic index with the given plan, keeping latest quiz scores"""
+        latest = {}
+        for q in db.query(QuizResult).filter(QuizResult.student_id == student_id).order_by(QuizResult.id):
+            latest[q.topic_id] = q
+
+        db.query(SubjectTopic).filter(SubjectTopic.student_id == student_id).delete()
+        now = datetime.now().isoformat()
+        seen = set()
+        for position, topic in enumerate(topics):
+            topic_id = topic.get("id")
+            if topic_id is None or topic_id in seen:
+                continue
+            seen.add(topic_id)
+            quiz = latest.get(topic_id)
+            db.add(SubjectTopic(
+                student_id=student_id,
+                subject=subject_for_topic(topic),
+                topic_id=topic_id,
+                title=topic.get("title") or topic.get("topic") or f"Topic {topic_id}",
+                day=topic.get("day"),
+                position=position,
+                status=topic.get("status", "locked"),
+                quiz_passed=bool(topic.get("quiz_passed", False)),
+                score=quiz.score if quiz else None,
+                total=quiz.total if quiz else None,
+                percentage=quiz.percentage if quiz else None,
+                updated_at=now
+            ))
+
+    def update_quiz_score(self, topic_id: int, topic_title: str, subject: str, score: int, total: int,
+                          time_taken: int = 0, student_id: str = DEFAULT_STUDENT_ID):
         """Record quiz performance"""
-        profile = self.load_profile()
-        
         percentage = (score / total * 100) if total > 0 else 0
-        
-        # Add to quiz history
-        quiz_record = {
-            "topic_id": topic_id,
-            "topic_title": topic_title,
-            "subject": subject,
-            "timestamp": datetime.now().isoformat(),
-            "score": score,
-            "total": total,
-            "percentage": percentage,
-            "time_taken_seconds": time_taken
-        }
-        profile["quiz_history"].append(quiz_record)
-        
-        # Update mastery tracker
-        self._update_mastery(profile, subject, percentage)
-        
-        self.save_profile(profile)
-    
-    def _update_mastery(self, profile: dict, subject: str, score_percentage: float):
-        """Update subject mastery level"""
-        if subject not in profile["mastery_tracker"]:
-            profile["mastery_tracker"][subject] = {
-                "avg_score": 0,
-                "topics_completed": 0,
-                "total_topics": 0,
-                "mastery_level": "medium",
-                "scores": []
-            }
-        
-        mastery = profile["mastery_tracker"][subject]
-        mastery["scores"].append(score_percentage)
-        mastery["topics_completed"] += 1
-        
-        # Calculate average
-        mastery["avg_score"] = sum(mastery["scores"]) / len(mastery["scores"])
-        
+
+        self.flush(student_id)
+        with self.session_factory() as db:
+            row = self._get_or_create(db, student_id)
+            row.last_active = datetime.now().isoformat()
+
+            # Add to quiz history
+            db.add(QuizResult(
+                student_id=student_id,
+                topic_id=topic_id,
+                topic_title=topic_title,
+                subject=subject,
+                timestamp=datetime.now().isoformat(),
+                score=score,
+                total=total,
+                percentage=percentage,
+                time_taken_seconds=time_taken
+            ))
+
+            # Keep the subject index's latest score current
+            entry = db.query(SubjectTopic).filter(
+                SubjectTopic.student_id == student_id,
+                SubjectTopic.topic_id == topic_id
+            ).first()
+            if entry is None:
+                entry = SubjectTopic(student_id=student_id, topic_id=topic_id, subject=subject,
+                                     title=topic_title, position=topic_id)
+                db.add(entry)
+            entry.score = score
+            entry.total = total
+            entry.percentage = percentage
+            entry.updated_at = datetime.now().isoformat()
+
+            # Update mastery tracker
+            self._update_mastery(db, student_id, subject, percentage)
+            db.commit()
+        self._invalidate(student_id)
+
+    @staticmethod
+    def _new_mastery(student_id: str, subject: str) -> SubjectMastery:
+        return SubjectMastery(
+            student_id=student_id,
+            subject=subject,
+            avg_score=0,
+            topics_completed=0,
+            total_topics=0,
+            mastery_level="medium",
+            score_count=0,
+            score_m2=0,
+            recent_score=None,
+            score_samples=[]
+        )
+
+    @staticmethod
+    def _observe_score(mastery: SubjectMastery, score_percentage: float):
+        """Fold one score into the running aggregates in O(1)"""
+        config = get_mastery_config()
+
+        # Welford's update for mean and variance
+        count = (mastery.score_count or 0) + 1
+        delta = score_percentage - (mastery.avg_score or 0)
+        mastery.avg_score = (mastery.avg_score or 0) + delta / count
+        mastery.score_m2 = (mastery.score_m2 or 0) + delta * (score_percentage - mastery.avg_score)
+        mastery.score_count = count
+        mastery.topics_completed = (mastery.topics_completed or 0) + 1
+
+        # Exponentially weighted recent performance
+        if mastery.recent_score is None:
+            mastery.recent_score = score_percentage
+        else:
+            alpha = config["ewma_alpha"]
+            mastery.recent_score = alpha * score_percentage + (1 - alpha) * mastery.recent_score
+
+        # Reservoir sample (Algorithm R); reassigned so the JSON column is marked dirty
+        samples = list(mastery.score_samples or [])
+        if len(samples) < config["reservoir_size"]:
+            samples.append(score_percentage)
+        else:
+            slot = random.randrange(count)
+            if slot < len(samples):
+                samples[slot] = score_percentage
+        mastery.score_samples = samples
+
         # Determine mastery level
-        avg = mastery["avg_score"]
+        avg = mastery.avg_score
         if avg >= 75:
-            mastery["mastery_level"] = "high"
+            mastery.mastery_level = "high"
         elif avg >= 50:
-            mastery["mastery_level"] = "medium"
+            mastery.mastery_level = "medium"
         else:
-            mastery["mastery_level"] = "low"
-    
-    def mark_topic_complete(self, topic_id: int, completed_at: Optional[str] = None):
+            mastery.mastery_level = "low"
+
+    def backfill_mastery_aggregates(self) -> int:
+        """Seed running aggregates for mastery rows written before they existed; returns rows seeded"""
+        with self.session_factory() as db:
+            rows = db.query(SubjectMastery).filter(SubjectMastery.score_count.is_(None)).all()
+            if not rows:
+                return 0
+
+            # Rows from before the aggregates still carry the full score list in the unmapped scores column
+            legacy_scores = {}
+            columns = {col["name"] for col in inspect(db.get_bind()).get_columns(SubjectMastery.__tablename__)}
+            if "scores" in columns:
+                for mastery_id, scores in db.execute(text("SELECT id, scores FROM subject_mastery WHERE score_count IS NULL")):
+                    try:
+                        legacy_scores[mastery_id] = json.loads(scores) if isinstance(scores, str) else scores
+                    except ValueError:
+                        pass
+
+            for mastery in rows:
+                scores = legacy_scores.get(mastery.id)
+                if scores is None:
+                    scores = [q.percentage for q in db.query(QuizResult).filter(
+                        QuizResult.student_id == mastery.student_id,
+                        QuizResult.subject == mastery.subject
+                    ).order_by(QuizResult.id)]
+                scores = [float(s) for s in scores or [] if s is not None]
+
+                mastery.score_count, mastery.score_m2, mastery.recent_score, mastery.score_samples = 0, 0, None, []
+                if not scores:
+                    continue
+                topics_completed = mastery.topics_completed
+                mastery.avg_score = 0
+                for score in scores:
+                    self._observe_score(mastery, score)
+                if topics_completed is not None:
+                    mastery.topics_completed = topics_completed
+            db.commit()
+        self._invalidate()
+        return len(rows)
+
+    def _update_mastery(self, db, student_id: str, subject: str, score_percentage: float):
+        """Update subject mastery level"""
+        mastery = db.query(SubjectMastery).filter(
+            SubjectMastery.student_id == student_id,
+            SubjectMastery.subject == subject
+        ).first()
+        if mastery is None:
+            mastery = self._new_mastery(student_id, subject)
+            db.add(mastery)
+        self._observe_score(mastery, score_percentage)
+
+    def mark_topic_complete(self, topic_id: int, completed_at: Optional[str] = None,
+                            student_id: str = DEFAULT_STUDENT_ID):
         """Mark a topic as completed"""
-        profile = self.load_profile()
-        
         if not completed_at:
             completed_at = datetime.now().isoformat()
-        
-        # Update topic in study plan
-        for topic in profile["study_plan"]["topics"]:
-            if topic["id"] == topic_id:
-                topic["status"] = "completed"
-                topic["completed_at"] = completed_at
-                break
-        
-        # Remove from incomplete tasks if present
-        profile["incomplete_tasks"] = [
-            t for t in profile["incomplete_tasks"] if t["topic_id"] != topic_id
-        ]
-        
-        self.save_profile(profile)
-    
-    def add_incomplete_task(self, topic_id: int, from_day: int, reason: str = "not_completed"):
+
+        self.flush(student_id)
+        with self.session_factory() as db:
+            row = self._get_or_create(db, student_id)
+
+            # Update in study plan (reassigned so the JSON column is marked dirty)
+            topics = [dict(t) for t in (row.plan_topics or [])]
+            for topic in topics:
+                if topic.get("id") == topic_id:
+                    topic["status"] = "completed"
+                    topic["completed_at"] = completed_at
+                    break
+            row.plan_topics = topics
+            row.last_active = datetime.now().isoformat()
+
+            db.query(SubjectTopic).filter(
+                SubjectTopic.student_id == student_id,
+                SubjectTopic.topic_id == topic_id
+            ).update({"status": "completed", "quiz_passed": True, "updated_at": completed_at})
+
+            # Remove from incomplete tasks if present
+            db.query(IncompleteTask).filter(
+                IncompleteTask.student_id == student_id,
+                IncompleteTask.topic_id == topic_id
+            ).delete()
+            db.commit()
+        self._invalidate(student_id)
+
+    def add_incomplete_task(self, topic_id: int, from_day: int, reason: str = "not_completed",
+                            student_id: str = DEFAULT_STUDENT_ID):
         """Mark a task as incomplete"""
-        profile = self.load_profile()
-        
-        # Check if already in incomplete list
-        if not any(t["topic_id"] == topic_id for t in profile["incomplete_tasks"]):
-            profile["incomplete_tasks"].append({
-                "topic_id": topic_id,
-                "from_day": from_day,
-                "reason": reason,
-                "added_at": datetime.now().isoformat()
-            })
-        
-        self.save_profile(profile)
-    
-    def get_incomplete_tasks(self, current_day: int) -> List[dict]:
+        self.flush(student_id)
+        with self.session_factory() as db:
+            row = self._get_or_create(db, student_id)
+            row.last_active = datetime.now().isoformat()
+
+            # Avoid duplicates
+            exists = db.query(IncompleteTask.id).filter(
+                IncompleteTask.student_id == student_id,
+                IncompleteTask.topic_id == topic_id
+            ).first()
+            if exists is None:
+                db.add(IncompleteTask(
+                    student_id=student_id,
+                    topic_id=topic_id,
+                    from_day=from_day,
+                    reason=reason,
+                    added_at=datetime.now().isoformat()
+                ))
+            try:
+                db.commit()
+            except IntegrityError:
+                # Added concurrently by another request
+                db.rollback()
+        self._invalidate(student_id)
+
+    def get_incomplete_tasks(self, current_day: int, student_id: str = DEFAULT_STUDENT_ID) -> List[dict]:
         """Get tasks not completed from previous days"""
-        profile = self.load_profile()
-        
-        # Get incomplete tasks from previous days
-        return [
-            t for t in profile["incomplete_tasks"] 
-            if t["from_day"] < current_day
-        ]
-    
-    def get_mastery_data(self) -> Dict[str, dict]:
+        tasks = self.load_profile(student_id, quiz_limit=0)["incomplete_tasks"]
+        return [t for t in tasks if t["from_day"] < current_day]
+
+    def get_subject_index(self, student_id: str = DEFAULT_STUDENT_ID) -> Dict[str, List[dict]]:
+        """Topics grouped by subject in plan order, each with its latest quiz score"""
+        with self.session_factory() as db:
+            entries = db.query(SubjectTopic).filter(SubjectTopic.student_id == student_id).order_by(
+                SubjectTopic.position, SubjectTopic.id
+            ).all()
+            if not entries:
+                # Plans saved before the index existed are indexed on first read
+                row = db.query(StudentProfile).filter(StudentProfile.student_id == student_id).first()
+                if row is None or not row.plan_topics:
+                    return {}
+                self._rebuild_subject_index(db, student_id, row.plan_topics)
+                db.commit()
+                entries = db.query(SubjectTopic).filter(SubjectTopic.student_id == student_id).order_by(
+                    SubjectTopic.position, SubjectTopic.id
+                ).all()
+
+            subjects = {}
+            for entry in entries:
+                topic = {
+                    "id": entry.topic_id,
+                    "title": entry.title,
+                    "day": entry.day,
+                    "status": entry.status,
+                    "quiz_passed": entry.quiz_passed
+                }
+                if entry.score is not None:
+                    topic["score_data"] = {
+                        "topic_title": entry.title,
+                        "score": entry.score,
+                        "total": entry.total,
+                        "percentage": entry.percentage
+                    }
+                subjects.setdefault(entry.subject, []).append(topic)
+            return subjects
+
+    def get_mastery_data(self, student_id: str = DEFAULT_STUDENT_ID) -> Dict[str, dict]:
         """Get mastery tracker data"""
-        profile = self.load_profile()
-        return profile.get("mastery_tracker", {})
-    
-    def record_study_time(self, topic_id: int, minutes: int):
-        """Record time spent on a topic"""
-        profile = self.load_profile()
-        
-        profile["time_tracking"]["total_study_time_minutes"] += minutes
-        
-        topic_id_str = str(topic_id)
-        if topic_id_str not in profile["time_tracking"]["topics_time"]:
-            profile["time_tracking"]["topics_time"][topic_id_str] = 0
-        
-        profile["time_tracking"]["topics_time"][topic_id_str] += minutes
-        
-        self.save_profile(profile)
+        return self.load_profile(student_id, quiz_limit=0)["mastery_tracker"]
+
+    def record_study_time(self, topic_id: int, minutes: int, student_id: str = DEFAULT_STUDENT_ID):
+        """Record time spent on a topic (written behind)"""
+        self._queue_update(student_id, topic_id=str(topic_id), minutes=minutes)
@@ -0,0 +1,234 @@
+"""
+Topic Index - Per-source outline extracted once at ingest.
+Chapters and sections come from the PDF outline (bookmarks) when there is
+one, otherwise from heading-like lines seen as pages stream through
+ingestion. Entries are stored per source in the source_topics table, so
+study plans cover whole documents without a similarity search.
+"""
+import re
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from langchain_core.documents import Document
+
+from backend.database import SessionLocal, Source, SourceTopic
+
+MAX_TITLE_CHARS = 100
+
+# "Chapter 3: Kinematics", "UNIT II - Casting", "Module 4 Streams"
+_LABELLED_RE = re.compile(r"^(chapter|unit|module|part|lesson)\s+([0-9]+|[ivxlc]+)\b\s*[:.\-–]?\s*(.*)$", re.I)
+# "2 Casting Processes", "3.1 Sand Moulding", "4.2.1. Gating"
+_NUMBERED_RE = re.compile(r"^(\d{1,2}(?:\.\d{1,2}){0,3})\.?\s+([A-Z][^.!?]*)$")
+
+# Subject names for well-known syllabi; anything else is named after its file
+_SUBJECT_KEYWORDS = [
+    ("MANUFACTURING", "Manufacturing Technology"),
+    ("OOPS", "Object-Oriented Programming"),
+    ("OBJECT", "Object-Oriented Programming"),
+    ("DATA STRUCT", "Data Structures"),
+]
+
+
+def _clean(title: str) -> str:
+    title = re.sub(r"\s+", " ", title).strip(" .:-–\t")
+    return title[:MAX_TITLE_CHARS]
+
+
+def parse_heading(line: str) -> Optional[tuple]:
+    """(level, title) if a line of page text looks like a heading"""
+    line = line.strip()
+    if not 3 <= len(line) <= MAX_TITLE_CHARS:
+        return None
+
+    match = _LABELLED_RE.match(line)
+    if match:
+        return 0, _clean(line)
+
+    match = _NUMBERED_RE.match(line)
+    if match and len(match.group(2).split()) <= 12:
+        return match.group(1).count("."), _clean(line)
+
+    # Short all-caps lines ("CASTING PROCESSES") are usually chapter titles
+    words = line.split()
+    letters = [c for c in line if c.isalpha()]
+    if 2 <= len(words) <= 10 and len(letters) >= 6 and line.isupper() and not line.endswith("."):
+        return 0, _clean(line.title())
+    return None
+
+
+def detect_subject(first_text: str, source: str) -> str:
+    """Subject name from the start of a document, falling back to its file name"""
+    head = (first_text or "")[:200].upper()
+    for keyword, name in _SUBJECT_KEYWORDS:
+        if keyword in head:
+            return name
+    filename = source.rstrip("/").split("/")[-1]
+    return re.sub(r"\.pdf$", "", filename, flags=re.I).replace("-", " ").replace("_", " ").title()
+
+
+class HeadingCollector:
+    """Picks headings out of pages as they pass through ingestion"""
+
+    def __init__(self, max_per_page: int = 8, max_sentences: int = 200):
+        self.max_per_page = max_per_page
+        self.max_sentences = max_sentences
+        self.first_text = ""
+        self._headings = []
+        self._sentences = []
+        self._seen = set()
+
+    def observe(self, doc: Document):
+        text = doc.page_content or ""
+        if not self.first_text and text.strip():
+            self.first_text = text
+        page = doc.metadata.get("page")
+        found = 0
+        for line in text.splitlines():
+            heading = parse_heading(line)
+            if heading is None:
+                continue
+            level, title = heading
+            key = title.lower()
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            self._headings.append({"title": title, "level": level, "page": page, "origin": "heading"})
+            found += 1
+            if found >= self.max_per_page:
+                break
+
+        # Unstructured text (transcripts, web pages): keep topic-like sentences as a last resort
+        if not self._headings and len(self._sentences) < self.max_sentences:
+            for sentence in text.split("."):
+                sentence = sentence.strip()
+                if 20 < len(sentence) < 150 and (
+                    any(kw in sentence.lower() for kw in ("topic", "chapter", "module", "unit", "concept", "introduction"))
+                    or (sentence[0].isupper() and len(sentence.split()) > 4)
+                ):
+                    key = sentence.lower()
+                    if key not in self._seen:
+                        self._seen.add(key)
+                        self._sentences.append({"title": _clean(sentence), "level": 0, "page": page, "origin": "sentence"})
+
+    def watch(self, pages: Iterable[Document]) -> Iterator[Document]:
+        """Pass pages through unchanged while observing them"""
+        for page in pages:
+            self.observe(page)
+            yield page
+
+    def topics(self) -> List[dict]:
+        return self._headings or self._sentences[:self.max_sentences]
+
+
+def read_pdf_outline(file_path: str) -> List[dict]:
+    """Flattened PDF bookmarks (title, level, page); empty if the PDF has none"""
+    from pypdf import PdfReader
+
+    try:
+        reader = PdfReader(file_path)
+        outline = reader.outline
+    except Exception as e:
+        print(f"Could not read outline of {file_path}: {e}")
+        return []
+
+    entries = []
+
+    def walk(items, level):
+        for item in items:
+            if isinstance(item, list):
+                walk(item, level + 1)
+                continue
+            title = _clean(getattr(item, "title", "") or "")
+            if not title:
+                continue
+            try:
+                page = reader.get_destination_page_number(item)
+            except Exception:
+                page = None
+            entries.append({"title": title, "level": level, "page": page, "origin": "outline"})
+
+    walk(outline or [], 0)
+    return entries
+
+
+def build_pdf_topics(file_path: str) -> tuple:
+    """(topics, detected subject) for a PDF already on disk (backfill for older sources)"""
+    from langchain_community.document_loaders import PyPDFLoader
+
+    collector = HeadingCollector()
+    outline = read_pdf_outline(file_path)
+    for page in PyPDFLoader(file_path).lazy_load():
+        collector.observe(page)
+        if outline and collector.first_text:
+            # The outline already covers the structure; only the first page is needed
+            break
+    return outline or collector.topics(), detect_subject(collector.first_text, file_path)
+
+
+def save_source_topics(source_id: int, topics: List[dict], detected_subject: Optional[str] = None):
+    """Replace a source's topic entries and mark the source as indexed"""
+    db = SessionLocal()
+    try:
+        db.query(SourceTopic).filter(SourceTopic.source_id == source_id).delete()
+        db.add_all([
+            SourceTopic(
+                source_id=source_id,
+                position=position,
+                title=topic["title"],
+                level=topic.get("level", 0),
+                page=topic.get("page"),
+                origin=topic.get("origin", "heading")
+            )
+            for position, topic in enumerate(topics)
+        ])
+        source = db.query(Source).filter(Source.id == source_id).first()
+        if source is not None:
+            if detected_subject:
+                source.detected_subject = detected_subject
+            # Distinguishes "no headings found" from "never indexed"
+            source.topics_indexed_at = datetime.now().isoformat()
+        db.commit()
+    finally:
+        db.close()
+
+
+def load_source_topics(source_ids: List[int]) -> Dict[int, List[dict]]:
+    """Topic entries of several sources in document order, keyed by source ID"""
+    if not source_ids:
+        return {}
+    db = SessionLocal()
+    try:
+        rows = db.query(SourceTopic).filter(SourceTopic.source_id.in_(source_ids)).order_by(
+            SourceTopic.source_id, SourceTopic.position
+        ).all()
+        topics = {}
+        for row in rows:
+            topics.setdefault(row.source_id, []).append(
+                {"title": row.title, "level": row.level, "page": row.page, "origin": row.origin}
+            )
+        return topics
+    finally:
+        db.close()
+
+
+def select_granularity(topics: List[dict], num_days: int) -> List[dict]:
+    """Shallowest outline levels that still give at least one entry per day"""
+    if not topics:
+        return []
+    for max_level in sorted({t.get("level", 0) for t in topics}):
+        selected = [t for t in topics if t.get("level", 0) <= max_level]
+        if len(selected) >= num_days:
+            return selected
+    return topics
+
+
+def split_into_days(entries: List[dict], num_days: int) -> List[List[dict]]:
+    """Contiguous, near-equal groups of entries, one per day (empty when entries run out)"""
+    groups = []
+    base, extra = divmod(len(entries), num_days)
+    start = 0
+    for day in range(num_days):
+        size = base + (1 if day < extra else 0)
+        groups.append(entries[start:start + size])
+        start += size
+    return groups
@@ -0,0 +1,63 @@
+"""
+Upload Size Limit - Rejects oversized request bodies before they are spooled.
+FastAPI parses a multipart upload completely before the endpoint runs, so
+save_stream()'s cap alone would still let a huge body reach the temp
+directory. This ASGI middleware answers 413 straight from Content-Length,
+or, for bodies without one, as soon as the received bytes pass the limit.
+"""
+import json
+from typing import Callable, Iterable
+
+# Multipart boundaries, part headers and small form fields on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadSizeLimit:
+    """Caps request bodies on the given paths; get_max_bytes is read per request so config reloads apply"""
+
+    def __init__(self, app, paths: Iterable[str], get_max_bytes: Callable[[], int]):
+        self.app = app
+        self.paths = set(paths)
+        self.get_max_bytes = get_max_bytes
+
+    async def _reject(self, send, max_bytes: int):
+        body = json.dumps({"detail": f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit"}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.get_max_bytes()
+        limit = max_bytes + MULTIPART_OVERHEAD_BYTES
+        content_length = dict(scope.get("headers") or []).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > limit:
+            # Declared too large: answer without reading the body
+            await self._reject(send, max_bytes)
+            return
+
+        state = {"received": 0, "rejected": False}
+
+        async def limited_receive():
+            message = await receive()
+            if message["type"] == "http.request" and not state["rejected"]:
+                state["received"] += len(message.get("body", b""))
+                if state["received"] > limit:
+                    state["rejected"] = True
+                    await self._reject(send, max_bytes)
+            if state["rejected"]:
+                # Stops body parsing; the app's own error response is dropped below
+                return {"type": "http.disconnect"}
+            return message
+
+        async def guarded_send(message):
+            if not state["rejected"]:
+                await send(message)
+
+        await self.app(scope, limited_receive, guarded_send)
@@ -0,0 +1,137 @@
+"""
+Vector Benchmark - Compare the Chroma and NumPy vector backends.
+Both stores are loaded with the same synthetic corpus (precomputed vectors,
+so embedding cost is excluded) and queried with the same perturbed vectors.
+Reports load time, query latency percentiles, recall@k against exact
+search and disk usage.
+
+Usage:
+    python -m backend.vector_benchmark --chunks 5000 --queries 200 --k 5
+"""
+import argparse
+import json
+import shutil
+import tempfile
+import time
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+
+from backend.vector_store import ChromaVectorStore, NumpyVectorStore
+
+
+class _PrecomputedEmbeddings(Embeddings):
+    """Maps query keys ("q0", "q1", ...) to fixed vectors"""
+
+    def __init__(self, vectors: dict):
+        self.vectors = vectors
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.vectors[text]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self.vectors[t] for t in texts]
+
+
+def _percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index], 3)
+
+
+def _make_corpus(num_chunks: int, num_queries: int, dim: int, num_sources: int, seed: int):
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((num_chunks, dim)).astype(np.float32)
+    # Queries sit near existing chunks, like a question about a passage
+    picks = rng.integers(0, num_chunks, num_queries)
+    queries = vectors[picks] + 0.3 * rng.standard_normal((num_queries, dim)).astype(np.float32)
+    ids = [f"chunk-{i}" for i in range(num_chunks)]
+    documents = [f"synthetic chunk {i}" for i in range(num_chunks)]
+    metadatas = [{"source": f"source-{i % num_sources}", "source_id": i % num_sources} for i in range(num_chunks)]
+    return ids, vectors, documents, metadatas, queries
+
+
+def _bench_store(name: str, store, corpus, k: int, batch_size: int, scoped_sources: list) -> dict:
+    ids, vectors, documents, metadatas, queries = corpus
+    t0 = time.perf_counter()
+    for i in range(0, len(ids), batch_size):
+        store.upsert(
+            ids[i:i + batch_size],
+            vectors[i:i + batch_size].tolist(),
+            documents[i:i + batch_size],
+            metadatas[i:i + batch_size]
+        )
+    load_ms = (time.perf_counter() - t0) * 1000
+
+    results, latencies, scoped_latencies = [], [], []
+    for q in range(len(queries)):
+        t0 = time.perf_counter()
+        docs = store.similarity_search(f"q{q}", k=k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        results.append([d.page_content for d in docs])
+
+        t0 = time.perf_counter()
+        store.similarity_search(f"q{q}", k=k, sources=scoped_sources)
+        scoped_latencies.append((time.perf_counter() - t0) * 1000)
+
+    return {
+        "backend": name,
+        "load_ms": round(load_ms, 2),
+        "query_p50_ms": _percentile(latencies, 50),
+        "query_p95_ms": _percentile(latencies, 95),
+        "scoped_query_p50_ms": _percentile(scoped_latencies, 50),
+        "disk_bytes": store.get_stats().get("disk_bytes"),
+        "_results": results
+    }
+
+
+def run_benchmark(num_chunks: int = 5000, num_queries: int = 200, k: int = 5, dim: int = 768,
+                  num_sources: int = 10, batch_size: int = 1000, seed: int = 0) -> list:
+    import numpy as np
+    corpus = _make_corpus(num_chunks, num_queries, dim, num_sources, seed)
+    queries = corpus[4]
+    embeddings = _PrecomputedEmbeddings({f"q{i}": queries[i].tolist() for i in range(len(queries))})
+    scoped_sources = [f"source-{i}" for i in range(max(1, num_sources // 5))]
+
+    # Ground truth: exact cosine top-k
+    vectors = corpus[1] / np.linalg.norm(corpus[1], axis=1, keepdims=True)
+    query_norm = queries / np.linalg.norm(queries, axis=1, keepdims=True)
+    exact = [set(corpus[2][j] for j in np.argsort(-(vectors @ q))[:k]) for q in query_norm]
+
+    reports = []
+    workdir = tempfile.mkdtemp(prefix="vector_bench_")
+    try:
+        stores = [
+            # Cosine space so Chroma ranks by the same measure as the exact baseline
+            ("chroma", ChromaVectorStore(f"{workdir}/chroma", embeddings, {
+                "collection_name": "benchmark",
+                "hnsw": {"space": "cosine", "M": 16, "construction_ef": 100, "search_ef": 50}
+            })),
+            ("numpy", NumpyVectorStore(f"{workdir}/numpy", embeddings))
+        ]
+        for name, store in stores:
+            report = _bench_store(name, store, corpus, k, batch_size, scoped_sources)
+            hits = sum(len(set(found) & truth) for found, truth in zip(report.pop("_results"), exact))
+            report[f"recall_at_{k}"] = round(hits / (k * len(exact)), 4)
+            reports.append(report)
+            store.close()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return reports
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Chroma vs NumPy vector backends")
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--sources", type=int, default=10)
+    args = parser.parse_args()
+    reports = run_benchmark(args.chunks, args.queries, args.k, args.dim, args.sources)
+    print(json.dumps(reports, indent=2))
+
+
+if __name__ == "__main__":
+    main()
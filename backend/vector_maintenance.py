@@ -0,0 +1,95 @@
+"""
+Vector Maintenance - Index stats and rebuild/compaction for the vector store.
+A rebuild drops chunks of deleted sources, then compacts the backend: Chroma
+copies every live chunk (with its stored embedding, so nothing is
+re-embedded) into a fresh collection built with the configured HNSW params;
+the NumPy store rewrites its matrix without dead rows.
+
+Usage:
+    python -m backend.vector_maintenance stats
+    python -m backend.vector_maintenance rebuild [--keep-inactive]
+"""
+import argparse
+import json
+import time
+
+
+def _inactive_sources():
+    """IDs and paths of soft-deleted sources"""
+    from backend.database import SessionLocal, Source
+    db = SessionLocal()
+    try:
+        rows = db.query(Source.id, Source.file_path).filter(Source.is_active == False).all()
+    finally:
+        db.close()
+    return {r[0] for r in rows}, {r[1] for r in rows}
+
+
+def get_index_stats() -> dict:
+    """Backend stats (chunk counts, index settings, on-disk size)"""
+    from backend.rag_engine import vector_registry, keyword_index
+
+    stats = vector_registry.get_store().get_stats()
+    stats["keyword_index_chunks"] = keyword_index.count()
+    return stats
+
+
+def rebuild_collection(purge_inactive: bool = True, batch_size: int = 1000) -> dict:
+    """
+    Drop chunks of deleted sources and compact the store with the
+    configured settings. Ingestion must not run while this is in progress.
+    """
+    from backend.config import get_vector_store_config
+    from backend.rag_engine import vector_registry, keyword_index, response_cache
+
+    started = time.perf_counter()
+    store = vector_registry.get_store()
+    # Pick up HNSW changes made since the store was opened
+    if hasattr(store, "vector_config"):
+        store.vector_config = get_vector_store_config()
+    disk_before = store.get_stats().get("disk_bytes")
+    chunks_before = store.count()
+
+    dropped_ids = []
+    if purge_inactive:
+        inactive_ids, inactive_paths = _inactive_sources()
+        for ids, _, metadatas in store.iter_chunks(batch_size):
+            dropped_ids.extend(
+                chunk_id for chunk_id, meta in zip(ids, metadatas)
+                if meta.get("source_id") in inactive_ids or meta.get("source") in inactive_paths
+            )
+        if dropped_ids:
+            store.delete(ids=dropped_ids)
+            keyword_index.remove_ids(dropped_ids)
+            response_cache.clear()
+
+    details = store.compact()
+    return {
+        "chunks_before": chunks_before,
+        "chunks_after": store.count(),
+        "chunks_purged": len(dropped_ids),
+        "compaction": details,
+        "disk_bytes_before": disk_before,
+        "disk_bytes_after": store.get_stats().get("disk_bytes"),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 2)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FocusFlow vector index maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Show index stats and HNSW settings")
+    rebuild = sub.add_parser("rebuild", help="Rebuild/compact the collection with the configured HNSW params")
+    rebuild.add_argument("--keep-inactive", action="store_true", help="Keep chunks of deleted sources")
+    rebuild.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        result = get_index_stats()
+    else:
+        result = rebuild_collection(purge_inactive=not args.keep_inactive, batch_size=args.batch_size)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
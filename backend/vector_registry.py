@@ -0,0 +1,113 @@
+"""
+Vector Store Registry - Process-wide, long-lived vector store and embedder.
+Avoids reopening the persisted store on every RAG request.
+"""
+import threading
+import time
+from typing import Optional
+
+from langchain_community.embeddings import OllamaEmbeddings
+from backend.embedding_cache import EmbeddingCache, CachedEmbeddings
+from backend.vector_store import VectorStore, create_vector_store
+
+
+class VectorStoreRegistry:
+    """Lazily builds the embedder and vector store once and hands out the shared instances"""
+
+    def __init__(self, persist_directory: str, embedding_config: dict, vector_config: Optional[dict] = None):
+        self.persist_directory = persist_directory
+        self.embedding_config = embedding_config
+        self.vector_config = vector_config or {}
+        self.lock = threading.Lock()
+        self._embeddings: Optional[CachedEmbeddings] = None
+        self._cache: Optional[EmbeddingCache] = None
+        self._store: Optional[VectorStore] = None
+        self._stats = {
+            "builds": 0,
+            "reuses": 0,
+            "cold_setup_ms": 0.0
+        }
+
+    def _build(self):
+        """Construct embedder and store (caller holds the lock)"""
+        started = time.perf_counter()
+        model = self.embedding_config["model"]
+        if self._cache is None:
+            self._cache = EmbeddingCache(
+                self.embedding_config.get("cache_path", "./embedding_cache/cache.sqlite3"),
+                self.embedding_config.get("cache_max_entries", 10000)
+            )
+        self._embeddings = CachedEmbeddings(
+            OllamaEmbeddings(
+                model=model,
+                base_url=self.embedding_config.get("base_url", "http://localhost:11434")
+            ),
+            self._cache,
+            model
+        )
+        self._store = create_vector_store(self.vector_config, self.persist_directory, self._embeddings)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._stats["builds"] += 1
+        self._stats["cold_setup_ms"] = elapsed_ms
+
+    def _ensure_built(self):
+        """Build on first use, otherwise count the lookup as a reuse"""
+        if self._store is not None:
+            with self.lock:
+                self._stats["reuses"] += 1
+            return
+
+        with self.lock:
+            if self._store is None:
+                self._build()
+            else:
+                self._stats["reuses"] += 1
+
+    def get_store(self) -> VectorStore:
+        """Get the shared vector store"""
+        self._ensure_built()
+        return self._store
+
+    def get_embeddings(self) -> CachedEmbeddings:
+        """Get the shared embedding function"""
+        self._ensure_built()
+        return self._embeddings
+
+    def startup(self):
+        """Warm the registry so the first request does not pay the setup cost"""
+        with self.lock:
+            if self._store is None:
+                self._build()
+
+    def reload(self, embedding_config: Optional[dict] = None, vector_config: Optional[dict] = None):
+        """Reopen the store, picking up new embedding/vector settings if given"""
+        with self.lock:
+            if embedding_config is not None:
+                self.embedding_config = embedding_config
+            if vector_config is not None:
+                self.vector_config = vector_config
+            if self._store is not None:
+                self._store.close()
+            self._store = None
+            self._build()
+
+    def shutdown(self):
+        """Release the store and embedder"""
+        with self.lock:
+            if self._store is not None:
+                self._store.close()
+            self._store = None
+            self._embeddings = None
+            if self._cache is not None:
+                self._cache.close()
+                self._cache = None
+
+    def get_stats(self) -> dict:
+        """Get build/reuse counters and the cost of the last cold setup"""
+        with self.lock:
+            stats = dict(self._stats)
+        stats["cold_setup_ms"] = round(stats["cold_setup_ms"], 2)
+        stats["active"] = self._store is not None
+        if self._cache is not None:
+            stats["embedding_cache"] = self._cache.get_stats()
+        return stats
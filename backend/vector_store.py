@@ -0,0 +1,531 @@
+"""
+Vector Store - Backend-neutral chunk storage and similarity search.
+The RAG engine, ingest pipeline and maintenance tools only talk to the
+VectorStore interface; CONFIG["vector_store"]["backend"] picks Chroma
+(persistent HNSW index) or an in-process, memory-mapped NumPy matrix with
+exact cosine top-k, which has far less overhead for small corpora.
+"""
+import json
+import os
+import sqlite3
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+
+class VectorStore:
+    """Interface for chunk storage keyed by chunk ID"""
+
+    def similarity_search(self, query: str, k: int = 4, source_ids: Optional[List[int]] = None,
+                          sources: Optional[List[str]] = None) -> List[Document]:
+        """
+        Top-k chunks for a query. When source_ids and/or sources are given,
+        only chunks matching either are considered.
+        """
+        raise NotImplementedError
+
+    def upsert(self, ids: List[str], embeddings: List[List[float]], documents: List[str], metadatas: List[dict]):
+        raise NotImplementedError
+
+    def update_metadata(self, ids: List[str], metadatas: List[dict]):
+        """Replace metadata of stored chunks, keeping their vectors"""
+        raise NotImplementedError
+
+    def delete(self, ids: Optional[List[str]] = None, source: Optional[str] = None):
+        """Delete chunks by ID or by source path"""
+        raise NotImplementedError
+
+    def ids_for_source(self, source: str) -> set:
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def iter_chunks(self, batch_size: int = 1000) -> Iterator[Tuple[List[str], List[str], List[dict]]]:
+        """Yield (ids, documents, metadatas) batches over every stored chunk"""
+        raise NotImplementedError
+
+    def export_chunks(self, batch_size: int = 1000) -> Iterator[Tuple[List[str], list, List[str], List[dict]]]:
+        """Yield (ids, embeddings, documents, metadatas) batches over every stored chunk"""
+        raise NotImplementedError
+
+    def import_chunks(self, other: "VectorStore", batch_size: int = 1000) -> int:
+        """Copy every chunk of another store, reusing its embeddings; returns chunks copied"""
+        copied = 0
+        for ids, embeddings, documents, metadatas in other.export_chunks(batch_size):
+            if ids:
+                self.upsert(ids, embeddings, documents, metadatas)
+                copied += len(ids)
+        return copied
+
+    def compact(self) -> dict:
+        """Rebuild the index without deleted entries; returns backend details"""
+        raise NotImplementedError
+
+    def get_stats(self) -> dict:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def hnsw_metadata(vector_config: dict) -> dict:
+    """Chroma collection metadata carrying the HNSW parameters"""
+    hnsw = vector_config.get("hnsw", {})
+    return {f"hnsw:{key}": value for key, value in hnsw.items()}
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ChromaVectorStore(VectorStore):
+    """Chroma collection with a persistent HNSW index"""
+
+    def __init__(self, persist_directory: str, embeddings, vector_config: dict):
+        import chromadb
+        self.persist_directory = persist_directory
+        self.embeddings = embeddings
+        self.vector_config = vector_config
+        self.client = chromadb.PersistentClient(path=persist_directory)
+        self._recover_rebuild(self.vector_config.get("collection_name", "langchain"))
+        self._open()
+
+    def _open(self):
+        from langchain_chroma import Chroma
+        # HNSW settings only apply when the collection is created
+        self.store = Chroma(
+            collection_name=self.vector_config.get("collection_name", "langchain"),
+            client=self.client,
+            embedding_function=self.embeddings,
+            collection_metadata=hnsw_metadata(self.vector_config) or None
+        )
+
+    def _collection_names(self) -> set:
+        # Older Chroma clients list Collection objects, newer ones plain names
+        return {getattr(c, "name", c) for c in self.client.list_collections()}
+
+    def _recover_rebuild(self, name: str):
+        """
+        Finish or roll back a compact() interrupted by a crash. The copy is
+        complete before the live collection is retired, so when the live name
+        is missing the rebuilt copy (or else the retired original) takes it
+        back. Leftovers are only dropped once the live name exists again.
+        """
+        names = self._collection_names()
+        if name not in names:
+            for fallback in (f"{name}_rebuild", f"{name}_old"):
+                if fallback in names:
+                    print(f"Vector store: restoring collection {name} from {fallback}")
+                    self.client.get_collection(fallback).modify(name=name)
+                    names = self._collection_names()
+                    break
+        if name in names:
+            for leftover in (f"{name}_rebuild", f"{name}_old"):
+                if leftover in names:
+                    self.client.delete_collection(leftover)
+
+    @property
+    def collection(self):
+        return self.store._collection
+
+    @staticmethod
+    def _where(source_ids: Optional[List[int]], sources: Optional[List[str]]) -> Optional[dict]:
+        clauses = []
+        if source_ids is not None:
+            clauses.append({"source_id": {"$in": list(source_ids)}})
+        if sources is not None:
+            clauses.append({"source": {"$in": list(sources)}})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+    def similarity_search(self, query, k=4, source_ids=None, sources=None):
+        return self.store.similarity_search(query, k=k, filter=self._where(source_ids, sources))
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.collection.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def update_metadata(self, ids, metadatas):
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, ids=None, source=None):
+        if ids:
+            self.collection.delete(ids=ids)
+        if source is not None:
+            self.collection.delete(where={"source": source})
+
+    def ids_for_source(self, source):
+        existing = self.collection.get(where={"source": source}, include=[])
+        return set(existing.get("ids", []))
+
+    def count(self):
+        return self.collection.count()
+
+    def iter_chunks(self, batch_size=1000):
+        total = self.collection.count()
+        for offset in range(0, total, batch_size):
+            batch = self.collection.get(limit=batch_size, offset=offset, include=["documents", "metadatas"])
+            yield batch["ids"], [d or "" for d in batch["documents"]], [m or {} for m in batch["metadatas"]]
+
+    def export_chunks(self, batch_size=1000):
+        collection = self.collection
+        total = collection.count()
+        for offset in range(0, total, batch_size):
+            batch = collection.get(limit=batch_size, offset=offset, include=["embeddings", "documents", "metadatas"])
+            yield batch["ids"], batch["embeddings"], batch["documents"], batch["metadatas"]
+
+    def compact(self, batch_size: int = 1000):
+        """
+        Copy every chunk (with its stored embedding) into a new collection
+        built with the configured HNSW params and swap it in under the same name.
+        The original is only renamed aside (then dropped) once the copy is
+        complete; _recover_rebuild() finishes a swap cut short by a crash.
+        """
+        client = self.client
+        old = self.collection
+        name = old.name
+        temp_name, retired_name = f"{name}_rebuild", f"{name}_old"
+        # Left over from an interrupted copy; safe to drop while the live collection exists
+        self._recover_rebuild(name)
+        target = client.create_collection(temp_name, metadata=hnsw_metadata(self.vector_config) or None)
+
+        total = old.count()
+        for ids, embeddings, documents, metadatas in self.export_chunks(batch_size):
+            if ids:
+                target.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+        old.modify(name=retired_name)
+        target.modify(name=name)
+        client.delete_collection(retired_name)
+        self._open()
+        return {"chunks": total, "hnsw": hnsw_metadata(self.vector_config)}
+
+    def get_stats(self):
+        current = {k: v for k, v in (self.collection.metadata or {}).items() if k.startswith("hnsw:")}
+        configured = hnsw_metadata(self.vector_config)
+        return {
+            "backend": "chroma",
+            "collection": self.collection.name,
+            "chunks": self.collection.count(),
+            "hnsw": current,
+            "configured_hnsw": configured,
+            # Unset params fall back to Chroma defaults, so only explicit mismatches count
+            "rebuild_recommended": not current or any(current.get(k, v) != v for k, v in configured.items()),
+            "disk_bytes": _dir_size(self.persist_directory)
+        }
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    Exact cosine search over a memory-mapped float32 matrix.
+    Vectors are L2-normalised and appended to vectors.f32; chunk text and
+    metadata live in a SQLite side table. Deletes and re-upserts leave dead
+    rows that compact() squeezes out.
+    """
+
+    def __init__(self, directory: str, embeddings):
+        import numpy as np
+        self.np = np
+        self.directory = directory
+        self.embeddings = embeddings
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.vectors_path = os.path.join(directory, "vectors.f32")
+        self.conn = sqlite3.connect(os.path.join(directory, "chunks.sqlite3"), check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "row INTEGER PRIMARY KEY, id TEXT, source TEXT, source_id INTEGER, "
+            "document TEXT, metadata TEXT, live INTEGER DEFAULT 1)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_id ON chunks(id)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks(source)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.commit()
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+        self.dim = int(row[0]) if row else None
+        self._load()
+
+    def _load(self):
+        """Map the vector file and rebuild the per-row filter arrays (caller holds the lock or is __init__)"""
+        np = self.np
+        rows = self.conn.execute("SELECT row, id, source, source_id, live FROM chunks ORDER BY row").fetchall()
+        # Replaced rather than mutated, so searches holding the old list stay consistent
+        self._row_ids = [r[1] for r in rows]
+        self._live = np.array([bool(r[4]) for r in rows], dtype=bool)
+        self._source_ids = np.array([r[3] if r[3] is not None else -1 for r in rows], dtype=np.int64)
+        self._source_codes = {}
+        self._row_sources = np.array([self._code(r[2]) for r in rows], dtype=np.int64)
+        self._row_of = {r[1]: r[0] for r in rows if r[4]}
+        self._map()
+
+    def _map(self):
+        """(Re)map the vector file for the current row count"""
+        np = self.np
+        n = len(self._row_ids)
+        if n and self.dim:
+            self._matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        else:
+            self._matrix = np.zeros((0, self.dim or 0), dtype=np.float32)
+
+    def _code(self, source: Optional[str]) -> int:
+        return self._source_codes.setdefault(source or "", len(self._source_codes))
+
+    def _normalize(self, vectors):
+        np = self.np
+        matrix = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def _mask(self, source_ids, sources):
+        np = self.np
+        mask = self._live.copy()
+        if source_ids is None and sources is None:
+            return mask
+        scope = np.zeros(len(mask), dtype=bool)
+        if source_ids is not None:
+            scope |= np.isin(self._source_ids, np.array(list(source_ids), dtype=np.int64))
+        if sources is not None:
+            codes = [self._source_codes[s] for s in sources if s in self._source_codes]
+            scope |= np.isin(self._row_sources, np.array(codes, dtype=np.int64))
+        return mask & scope
+
+    def similarity_search(self, query, k=4, source_ids=None, sources=None):
+        np = self.np
+        query_vector = self._normalize(self.embeddings.embed_query(query))
+        with self.lock:
+            # Snapshot: rows are only appended to these, and compact() swaps in new ones
+            matrix = self._matrix
+            row_ids = self._row_ids
+            candidates = np.flatnonzero(self._mask(source_ids, sources))
+        if len(candidates) == 0:
+            return []
+
+        # Vectorised cosine similarity, then partial sort for the top k
+        scores = matrix[candidates] @ query_vector
+        k = min(k, len(candidates))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        ids = [row_ids[int(candidates[i])] for i in top]
+
+        # Looked up by chunk ID, since rows may have been renumbered since the snapshot
+        placeholders = ",".join("?" * len(ids))
+        with self.lock:
+            found = {
+                r[0]: Document(page_content=r[1], metadata=json.loads(r[2]))
+                for r in self.conn.execute(
+                    f"SELECT id, document, metadata FROM chunks WHERE live = 1 AND id IN ({placeholders})", ids
+                )
+            }
+        return [found[i] for i in ids if i in found]
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        if not ids:
+            return
+        vectors = self._normalize(embeddings)
+        with self.lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?)", (str(self.dim),))
+            start = len(self._row_ids)
+            # A chunk repeated within the batch keeps only its last copy live
+            last = {chunk_id: start + i for i, chunk_id in enumerate(ids)}
+            live = [last[chunk_id] == start + i for i, chunk_id in enumerate(ids)]
+            try:
+                # Replaced chunks become dead rows; the new version is appended
+                self._kill(ids)
+                with open(self.vectors_path, "ab") as f:
+                    # Drop bytes from an append whose rows never got committed
+                    f.truncate(start * self.dim * 4)
+                    f.write(vectors.tobytes())
+                self.conn.executemany(
+                    "INSERT INTO chunks (row, id, source, source_id, document, metadata, live) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (start + i, chunk_id, meta.get("source"), meta.get("source_id"), doc, json.dumps(meta), int(live[i]))
+                        for i, (chunk_id, doc, meta) in enumerate(zip(ids, documents, metadatas))
+                    ]
+                )
+                self.conn.commit()
+            except Exception:
+                # _kill() already updated the in-memory state; resync it with what was committed
+                self.conn.rollback()
+                self._load()
+                raise
+
+            # Extend the in-memory arrays with the new rows instead of reloading them all
+            np = self.np
+            self._row_ids.extend(ids)
+            self._live = np.concatenate([self._live, np.array(live, dtype=bool)])
+            self._source_ids = np.concatenate([self._source_ids, np.array(
+                [meta.get("source_id") if meta.get("source_id") is not None else -1 for meta in metadatas], dtype=np.int64
+            )])
+            self._row_sources = np.concatenate([self._row_sources, np.array(
+                [self._code(meta.get("source")) for meta in metadatas], dtype=np.int64
+            )])
+            self._row_of.update(last)
+            self._map()
+
+    def _kill(self, ids):
+        """Mark rows for these IDs dead (caller holds the lock and commits)"""
+        for i in range(0, len(ids), 500):
+            batch = list(ids[i:i + 500])
+            placeholders = ",".join("?" * len(batch))
+            self.conn.execute(f"UPDATE chunks SET live = 0 WHERE live = 1 AND id IN ({placeholders})", batch)
+        for chunk_id in ids:
+            row = self._row_of.pop(chunk_id, None)
+            if row is not None:
+                self._live[row] = False
+
+    def update_metadata(self, ids, metadatas):
+        with self.lock:
+            self.conn.executemany(
+                "UPDATE chunks SET metadata = ?, source = ?, source_id = ? WHERE live = 1 AND id = ?",
+                [(json.dumps(meta), meta.get("source"), meta.get("source_id"), chunk_id) for chunk_id, meta in zip(ids, metadatas)]
+            )
+            self.conn.commit()
+            for chunk_id, meta in zip(ids, metadatas):
+                row = self._row_of.get(chunk_id)
+                if row is None:
+                    continue
+                self._source_ids[row] = meta.get("source_id") if meta.get("source_id") is not None else -1
+                self._row_sources[row] = self._code(meta.get("source"))
+
+    def delete(self, ids=None, source=None):
+        with self.lock:
+            if ids:
+                self._kill(ids)
+            if source is not None:
+                self.conn.execute("UPDATE chunks SET live = 0 WHERE source = ?", (source,))
+                code = self._source_codes.get(source)
+                if code is not None:
+                    for row in self.np.flatnonzero(self._live & (self._row_sources == code)):
+                        self._row_of.pop(self._row_ids[row], None)
+                        self._live[row] = False
+            self.conn.commit()
+
+    def ids_for_source(self, source):
+        with self.lock:
+            return {r[0] for r in self.conn.execute("SELECT id FROM chunks WHERE live = 1 AND source = ?", (source,))}
+
+    def count(self):
+        with self.lock:
+            return len(self._row_of)
+
+    def iter_chunks(self, batch_size=1000):
+        last_row = -1
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT row, id, document, metadata FROM chunks WHERE live = 1 AND row > ? ORDER BY row LIMIT ?",
+                    (last_row, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_row = rows[-1][0]
+            yield [r[1] for r in rows], [r[2] for r in rows], [json.loads(r[3]) for r in rows]
+
+    def export_chunks(self, batch_size=1000):
+        last_row = -1
+        while True:
+            with self.lock:
+                rows = self.conn.execute(
+                    "SELECT row, id, document, metadata FROM chunks WHERE live = 1 AND row > ? ORDER BY row LIMIT ?",
+                    (last_row, batch_size)
+                ).fetchall()
+                vectors = self.np.array(self._matrix[[r[0] for r in rows]]) if rows else None
+            if not rows:
+                return
+            last_row = rows[-1][0]
+            yield [r[1] for r in rows], vectors.tolist(), [r[2] for r in rows], [json.loads(r[3]) for r in rows]
+
+    def get_meta(self, key: str) -> Optional[str]:
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+            self.conn.commit()
+
+    def compact(self):
+        """Rewrite the matrix with live rows only and renumber them"""
+        np = self.np
+        with self.lock:
+            live_rows = [int(r) for r in np.flatnonzero(self._live)]
+            before = len(self._row_ids)
+            temp_path = self.vectors_path + ".tmp"
+            with open(temp_path, "wb") as f:
+                for i in range(0, len(live_rows), 4096):
+                    f.write(np.ascontiguousarray(self._matrix[live_rows[i:i + 4096]]).tobytes())
+            self.conn.execute("DELETE FROM chunks WHERE live = 0")
+            self.conn.executemany(
+                "UPDATE chunks SET row = ? WHERE row = ?",
+                [(-(new + 1), old) for new, old in enumerate(live_rows)]
+            )
+            self.conn.execute("UPDATE chunks SET row = -row - 1")
+            self._matrix = None
+            os.replace(temp_path, self.vectors_path)
+            self.conn.commit()
+            self._load()
+        return {"rows_before": before, "rows_after": len(live_rows)}
+
+    def get_stats(self):
+        with self.lock:
+            total_rows = len(self._row_ids)
+            live = len(self._row_of)
+        return {
+            "backend": "numpy",
+            "chunks": live,
+            "dead_rows": total_rows - live,
+            "dim": self.dim,
+            "rebuild_recommended": total_rows > 0 and (total_rows - live) / total_rows > 0.2,
+            "disk_bytes": _dir_size(self.directory)
+        }
+
+    def close(self):
+        with self.lock:
+            self._matrix = None
+            self.conn.close()
+
+
+def create_vector_store(vector_config: dict, persist_directory: str, embeddings) -> VectorStore:
+    """Build the configured backend"""
+    backend = vector_config.get("backend", "chroma")
+    if backend == "numpy":
+        store = NumpyVectorStore(vector_config.get("numpy_path", "./numpy_store"), embeddings)
+        if store.get_meta("seeded") != "1":
+            _seed_from_chroma(store, vector_config, persist_directory, embeddings)
+        return store
+    return ChromaVectorStore(persist_directory, embeddings, vector_config)
+
+
+def _seed_from_chroma(store: NumpyVectorStore, vector_config: dict, persist_directory: str, embeddings):
+    """
+    On the first open of a NumPy store, copy the chunks of an existing Chroma
+    index so switching backends keeps every ingested source searchable.
+    """
+    # "0" marks a copy that was interrupted; upserts by chunk ID make resuming it safe
+    if (store.count() == 0 or store.get_meta("seeded") == "0") and os.path.isdir(persist_directory):
+        store.set_meta("seeded", "0")
+        try:
+            chroma = ChromaVectorStore(persist_directory, embeddings, vector_config)
+            copied = store.import_chunks(chroma)
+            chroma.close()
+        except Exception as e:
+            # Retried on the next open
+            print(f"Vector store: could not copy chunks from Chroma: {e}")
+            return
+        if copied:
+            print(f"Vector store: copied {copied} chunks from Chroma into the NumPy store")
+    store.set_meta("seeded", "1")
@@ -0,0 +1,23 @@
+import os
+import shutil
+import sys
+import tempfile
+
+# Tests import the backend package and api_client from the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def pytest_configure(config):
+    """
+    Run from a scratch directory. Backend modules keep their SQLite files and
+    indexes relative to the working directory, and SQLAlchemy resolves the
+    database path when backend.database is first imported.
+    """
+    config.previous_cwd = os.getcwd()
+    config.scratch_dir = tempfile.mkdtemp(prefix="focusflow-tests-")
+    os.chdir(config.scratch_dir)
+
+
+def pytest_unconfigure(config):
+    os.chdir(config.previous_cwd)
+    shutil.rmtree(config.scratch_dir, ignore_errors=True)
@@ -0,0 +1,90 @@
+import pytest
+
+pytest.importorskip("pandas")
+
+from backend.analytics import AnalyticsCache, compute_analytics
+
+
+def _topic(topic_id, status="locked", score=None, total=10):
+    topic = {"id": topic_id, "title": f"Topic {topic_id}", "status": status}
+    if score is not None:
+        topic["score_data"] = {"score": score, "total": total, "percentage": score / total * 100}
+    return topic
+
+
+SUBJECT_INDEX = {
+    "Physics": [_topic(1, "completed", 9), _topic(2, "completed", 6), _topic(3, "unlocked", 3), _topic(4)],
+    "Chemistry": [_topic(5), _topic(6)]
+}
+
+
+def test_subject_summaries_and_buckets():
+    analytics = compute_analytics(SUBJECT_INDEX, [], {})
+    physics = analytics["subjects"]["Physics"]
+    assert physics["total_topics"] == 4
+    assert physics["completed"] == 2
+    assert physics["completion_pct"] == 50.0
+    assert physics["quizzes_taken"] == 3
+    assert physics["avg_score"] == 60.0
+    assert [t["id"] for t in physics["strong"]] == [1]
+    assert [t["id"] for t in physics["moderate"]] == [2]
+    assert [t["id"] for t in physics["needs_work"]] == [3]
+
+    chemistry = analytics["subjects"]["Chemistry"]
+    assert chemistry["quizzes_taken"] == 0
+    assert chemistry["avg_score"] == 0.0
+    assert chemistry["strong"] == chemistry["moderate"] == chemistry["needs_work"] == []
+
+    assert analytics["overall"]["total_topics"] == 6
+    assert analytics["overall"]["avg_score"] == 60.0
+
+
+def test_quiz_trends_by_day_and_subject():
+    history = [
+        {"subject": "Physics", "timestamp": "2026-01-01T09:00:00", "percentage": 40},
+        {"subject": "Physics", "timestamp": "2026-01-01T18:00:00", "percentage": 60},
+        {"subject": "Physics", "timestamp": "2026-01-02T09:00:00", "percentage": 80},
+        {"subject": "Chemistry", "timestamp": "2026-01-02T10:00:00", "percentage": 70},
+        {"subject": "Chemistry", "timestamp": "not a date", "percentage": 10}
+    ]
+    trends = compute_analytics({}, history, {})["trends"]
+    assert trends["daily"] == [
+        {"date": "2026-01-01", "avg_score": 50.0, "quizzes": 2},
+        {"date": "2026-01-02", "avg_score": 75.0, "quizzes": 2}
+    ]
+    physics = trends["by_subject"]["Physics"]
+    assert physics["attempts"] == 3
+    assert physics["slope_per_attempt"] == 20.0
+    assert physics["trend"] == "improving"
+    assert physics["rolling_mean"] == 60.0
+    assert trends["by_subject"]["Chemistry"]["trend"] == "flat"
+
+
+def test_study_time_grouped_by_subject():
+    tracking = {"total_study_time_minutes": 95, "topics_time": {"1": 30, "5": 45, "99": 20}}
+    study_time = compute_analytics(SUBJECT_INDEX, [], tracking)["study_time"]
+    assert study_time == {
+        "total_minutes": 95,
+        "by_subject": {"Physics": 30, "Chemistry": 45, "Unassigned": 20}
+    }
+
+
+def test_empty_inputs():
+    analytics = compute_analytics({}, [], {})
+    assert analytics["subjects"] == {}
+    assert analytics["overall"] == {"total_topics": 0, "completed": 0, "quizzes_taken": 0, "avg_score": 0.0}
+    assert analytics["trends"] == {"daily": [], "by_subject": {}}
+
+
+def test_cache_skips_results_computed_across_an_invalidation():
+    cache = AnalyticsCache()
+    generation = cache.generation("s1")
+    cache.invalidate("s1")
+    cache.put("s1", {"stale": True}, generation)
+    assert cache.get("s1") is None
+
+    cache.put("s1", {"fresh": True}, cache.generation("s1"))
+    assert cache.get("s1") == {"fresh": True}
+    cache.invalidate("s1")
+    assert cache.get("s1") is None
+    assert cache.get_stats()["invalidations"] == 1
@@ -0,0 +1,80 @@
+import pytest
+
+requests = pytest.importorskip("requests")
+
+from api_client import BackendClient
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    def close(self):
+        pass
+
+
+class ScriptedSession:
+    """Stands in for requests.Session, replaying a list of responses or exceptions"""
+
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls.append((method, url, kwargs.get("params")))
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def _client(outcomes, **kwargs):
+    client = BackendClient("http://backend/", backoff=0, **kwargs)
+    client.session = ScriptedSession(outcomes)
+    return client
+
+
+def test_idempotent_requests_retry_connection_errors_and_5xx():
+    client = _client([requests.ConnectionError(), FakeResponse(503), FakeResponse(200)], retries=2)
+    resp = client.get("/sources")
+    assert resp.status_code == 200
+    assert len(client.session.calls) == 3
+    assert client.get_stats()["retries"] == 2
+
+
+def test_last_retryable_status_is_returned_when_retries_run_out():
+    client = _client([FakeResponse(502), FakeResponse(502)], retries=1)
+    assert client.get("/sources").status_code == 502
+
+
+def test_posts_are_never_replayed():
+    client = _client([requests.ConnectionError()], retries=3)
+    with pytest.raises(requests.ConnectionError):
+        client.post("/student/quiz_complete", json={})
+    assert len(client.session.calls) == 1
+
+
+def test_get_cache_honours_ttl_params_and_invalidation():
+    client = _client([FakeResponse(200), FakeResponse(200), FakeResponse(200), FakeResponse(200)],
+                     cache_ttl={"/sources": 60})
+    first = client.get("/sources")
+    assert client.get("/sources") is first
+    client.get("/sources", params={"student_id": "b"})
+    assert len(client.session.calls) == 2
+
+    client.post("/student/save_plan", json={})
+    client.get("/sources")
+    assert len(client.session.calls) == 4
+    stats = client.get_stats()
+    assert stats["cache_hits"] == 1
+    assert stats["cache_misses"] == 3
+
+
+def test_uncached_paths_and_errors_are_not_cached():
+    client = _client([FakeResponse(500), FakeResponse(200), FakeResponse(200)], retries=0,
+                     cache_ttl={"/sources": 60})
+    assert client.get("/sources").status_code == 500
+    assert client.get("/sources").status_code == 200
+    client.get("/student/profile")
+    assert client.get_stats()["cached_entries"] == 1
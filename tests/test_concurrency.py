@@ -0,0 +1,118 @@
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("fastapi")
+
+from fastapi import HTTPException
+
+from backend.concurrency import RAGExecutor
+
+
+def _executor(**limits):
+    config = {"workers": 4, "queue_timeout": 0.2, "limits": {"query": limits}}
+    return RAGExecutor(config)
+
+
+def test_runs_blocking_work_on_the_pool():
+    executor = _executor(max_concurrent=1, max_queue=1)
+
+    async def main():
+        return await executor.run("query", lambda a, b=0: (threading.current_thread().name, a + b), 1, b=2)
+
+    try:
+        thread_name, result = asyncio.run(main())
+    finally:
+        executor.shutdown()
+    assert result == 3
+    assert thread_name.startswith("rag")
+    assert executor.get_stats()["query"]["completed"] == 1
+
+
+def test_rejects_with_429_when_queue_is_full():
+    executor = _executor(max_concurrent=1, max_queue=1)
+    release = threading.Event()
+
+    async def main():
+        first = asyncio.ensure_future(executor.run("query", release.wait))
+        queued = asyncio.ensure_future(executor.run("query", lambda: "queued"))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as rejected:
+            await executor.run("query", lambda: "rejected")
+        release.set()
+        return rejected.value, await first, await queued
+
+    try:
+        error, first, queued = asyncio.run(main())
+    finally:
+        executor.shutdown()
+    assert error.status_code == 429
+    assert error.headers["Retry-After"]
+    assert (first, queued) == (True, "queued")
+    stats = executor.get_stats()["query"]
+    assert (stats["rejected"], stats["completed"], stats["active"], stats["waiting"]) == (1, 2, 0, 0)
+
+
+def test_rejects_with_429_after_queue_timeout():
+    executor = _executor(max_concurrent=1, max_queue=4)
+    release = threading.Event()
+
+    async def main():
+        first = asyncio.ensure_future(executor.run("query", release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HTTPException) as rejected:
+            await executor.run("query", lambda: "late")
+        release.set()
+        await first
+        # The slot freed by the first call is usable again
+        return rejected.value, await executor.run("query", lambda: "ok")
+
+    try:
+        error, after = asyncio.run(main())
+    finally:
+        executor.shutdown()
+    assert error.status_code == 429
+    assert after == "ok"
+    stats = executor.get_stats()["query"]
+    assert stats["timed_out"] == 1
+    assert stats["active"] == 0
+
+
+def test_stream_releases_slot_when_never_iterated():
+    executor = _executor(max_concurrent=1, max_queue=1)
+
+    async def main():
+        stream = await executor.stream("query", lambda: (item for item in ["a", "b"]))
+        assert executor.get_stats()["query"]["active"] == 1
+        # The response body never started; dropping the stream frees the slot
+        del stream
+        return await executor.run("query", lambda: "ok")
+
+    try:
+        assert asyncio.run(main()) == "ok"
+    finally:
+        executor.shutdown()
+    assert executor.get_stats()["query"]["active"] == 0
+
+
+def test_stream_releases_slot_once_on_close_and_exhaustion():
+    executor = _executor(max_concurrent=1, max_queue=1)
+
+    async def main():
+        stream = await executor.stream("query", lambda: (item for item in ["a", "b"]))
+        items = [item async for item in stream]
+        await stream.aclose()
+
+        closed_early = await executor.stream("query", lambda: (item for item in ["a", "b"]))
+        first = await closed_early.__anext__()
+        await closed_early.aclose()
+        return items, first
+
+    try:
+        items, first = asyncio.run(main())
+    finally:
+        executor.shutdown()
+    assert (items, first) == (["a", "b"], "a")
+    stats = executor.get_stats()["query"]
+    assert (stats["active"], stats["completed"]) == (0, 2)
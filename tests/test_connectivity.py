@@ -0,0 +1,57 @@
+import socket
+
+import pytest
+
+from backend.connectivity import ConnectivityMonitor, parse_target
+
+
+@pytest.mark.parametrize("target, expected", [
+    ("www.google.com:443", ("www.google.com", 443)),
+    ("1.1.1.1:53", ("1.1.1.1", 53)),
+    ("example.org", ("example.org", 443)),
+    ("[::1]:80", ("::1", 80)),
+    ("[2001:db8::1]", ("2001:db8::1", 443)),
+    ("http://example.org/health", ("example.org", 80)),
+    ("https://example.org:8443", ("example.org", 8443)),
+])
+def test_parse_target(target, expected):
+    assert parse_target(target) == expected
+
+
+@pytest.fixture
+def listening_port():
+    server = socket.socket()
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    yield server.getsockname()[1]
+    server.close()
+
+
+def _closed_port():
+    sock = socket.socket()
+    sock.bind(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    return port
+
+
+def test_probe_is_online_when_any_target_answers(listening_port):
+    closed = f"127.0.0.1:{_closed_port()}"
+    monitor = ConnectivityMonitor({"targets": [closed, f"127.0.0.1:{listening_port}"], "timeout_seconds": 1.0})
+    assert monitor.get_status()["online"] is None
+
+    result = monitor.probe()
+    assert result["online"] is True
+    assert result["reachable_target"] == f"127.0.0.1:{listening_port}"
+    assert closed in result["errors"]
+    status = monitor.get_status()
+    assert (status["online"], status["stale"]) == (True, False)
+
+
+def test_probe_offline_and_stale_results():
+    monitor = ConnectivityMonitor({"targets": [f"127.0.0.1:{_closed_port()}"], "timeout_seconds": 1.0,
+                                   "ttl_seconds": 0.0})
+    assert monitor.probe()["online"] is False
+    assert monitor.get_stats() == {"probes": 1, "failures": 1}
+    # Older than the TTL: the UI should not trust it
+    assert monitor.get_status()["online"] is None
@@ -0,0 +1,78 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from backend.embedding_cache import CachedEmbeddings, EmbeddingCache
+
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.query_calls = 0
+        self.document_calls = 0
+
+    def embed_query(self, text):
+        self.query_calls += 1
+        return [float(len(text)), 1.0]
+
+    def embed_documents(self, texts):
+        self.document_calls += 1
+        return [[float(len(t)), 0.0] for t in texts]
+
+
+def test_round_trip_and_persistence(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = EmbeddingCache(path)
+    assert cache.get("m", "hello") is None
+    cache.put("m", "hello", [0.5, 0.25])
+    assert cache.get("m", "hello") == [0.5, 0.25]
+    # Keys include the model, so switching models never serves stale vectors
+    assert cache.get("other", "hello") is None
+    cache.close()
+
+    reopened = EmbeddingCache(path)
+    assert reopened.get("m", "hello") == [0.5, 0.25]
+    assert reopened.get_stats()["entries"] == 1
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=2)
+    cache.put("m", "a", [1.0])
+    cache.put("m", "b", [2.0])
+    assert cache.get("m", "a") == [1.0]
+    cache.put("m", "c", [3.0])
+
+    assert cache.get("m", "b") is None
+    assert cache.get("m", "a") == [1.0]
+    assert cache.get("m", "c") == [3.0]
+    stats = cache.get_stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+
+
+def test_cached_embeddings_serves_repeated_queries(tmp_path):
+    inner = CountingEmbeddings()
+    embeddings = CachedEmbeddings(inner, EmbeddingCache(str(tmp_path / "cache.sqlite3")), "m")
+    first = embeddings.embed_query("what is entropy")
+    assert embeddings.embed_query("what is entropy") == first
+    assert inner.query_calls == 1
+
+    embeddings.embed_documents(["a", "b"])
+    embeddings.embed_documents(["a", "b"])
+    assert inner.document_calls == 2
+    assert embeddings.cache.get_stats()["hits"] == 1
+
+
+def test_hits_update_recency_in_batches(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), touch_batch=3, touch_interval=3600)
+    for text in ("a", "b", "c"):
+        cache.put("m", text, [1.0])
+    changes = cache.conn.total_changes
+
+    cache.get("m", "a")
+    cache.get("m", "b")
+    assert cache.conn.total_changes == changes
+    cache.get("m", "c")
+    # One batched write covering all three hits
+    assert cache.conn.total_changes == changes + 3
+    assert cache.get_stats()["recency_flushes"] == 1
+    cache.close()
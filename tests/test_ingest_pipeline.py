@@ -0,0 +1,233 @@
+import hashlib
+import io
+
+import pytest
+
+pytest.importorskip("langchain_text_splitters")
+
+from langchain_core.documents import Document
+
+from backend.ingest_pipeline import (
+    FileTooLargeError, IngestPipeline, chunk_id, clean_metadata, hash_file, hash_text, page_windows, save_stream
+)
+
+
+class FakeEmbeddings:
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+    @property
+    def embedded(self):
+        return [t for batch in self.batches for t in batch]
+
+
+class FakeStore:
+    def __init__(self):
+        self.rows = {}
+        self.upserts = 0
+
+    def upsert(self, ids, embeddings, documents, metadatas):
+        self.upserts += 1
+        for i, vector, doc, meta in zip(ids, embeddings, documents, metadatas):
+            self.rows[i] = (vector, doc, meta)
+
+    def ids_for_source(self, source):
+        return {i for i, row in self.rows.items() if row[2].get("source") == source}
+
+    def delete(self, ids=None, source=None):
+        for i in ids:
+            self.rows.pop(i, None)
+
+    def update_metadata(self, ids, metadatas):
+        for i, meta in zip(ids, metadatas):
+            vector, doc, _ = self.rows[i]
+            self.rows[i] = (vector, doc, meta)
+
+
+class FakeRegistry:
+    def __init__(self):
+        self.embeddings = FakeEmbeddings()
+        self.store = FakeStore()
+
+    def get_embeddings(self):
+        return self.embeddings
+
+    def get_store(self):
+        return self.store
+
+
+def _pages(texts):
+    return [Document(page_content=text, metadata={"page": i}) for i, text in enumerate(texts)]
+
+
+def _pipeline(registry, **config):
+    settings = {"chunk_size": 200, "chunk_overlap": 0, "embed_batch_size": 3, "embed_workers": 4,
+                "upsert_batch_size": 4}
+    settings.update(config)
+    return IngestPipeline(registry, settings)
+
+
+def test_run_embeds_in_batches_and_keeps_vectors_aligned():
+    registry = FakeRegistry()
+    stats = _pipeline(registry).run(_pages([f"page {i} text" for i in range(10)]), source="book.pdf")
+
+    assert stats["chunks"] == stats["chunks_embedded"] == 10
+    assert stats["batches"] == 4
+    assert [len(b) for b in registry.embeddings.batches] == [3, 3, 3, 1]
+    assert registry.store.upserts == 3
+    for vector, doc, meta in registry.store.rows.values():
+        assert vector[0] == float(len(doc))
+        assert meta["source"] == "book.pdf"
+        assert meta["content_hash"] == hash_text(doc)
+
+
+def test_reingest_embeds_only_changed_chunks_and_drops_stale_ones():
+    registry = FakeRegistry()
+    pipeline = _pipeline(registry)
+    pipeline.run(_pages(["alpha", "beta", "gamma"]), source="notes.pdf")
+    registry.embeddings.batches.clear()
+
+    stats = pipeline.run(_pages(["alpha", "beta v2", "gamma"]), source="notes.pdf")
+    assert registry.embeddings.embedded == ["beta v2"]
+    assert (stats["chunks_embedded"], stats["chunks_skipped"], stats["chunks_removed"]) == (1, 2, 1)
+    assert sorted(doc for _, doc, _ in registry.store.rows.values()) == ["alpha", "beta v2", "gamma"]
+    assert chunk_id("notes.pdf", hash_text("beta")) not in registry.store.rows
+
+
+def test_unchanged_chunks_take_new_source_metadata_without_reembedding():
+    registry = FakeRegistry()
+    pipeline = _pipeline(registry)
+    pipeline.run(_pages(["alpha", "beta"]), source="notes.pdf")
+    registry.embeddings.batches.clear()
+
+    pipeline.run(_pages(["alpha", "beta"]), source="notes.pdf", metadata={"source_id": 4, "subject": "Physics"})
+    assert registry.embeddings.embedded == []
+    assert {(meta["source_id"], meta["subject"]) for _, _, meta in registry.store.rows.values()} == {(4, "Physics")}
+
+
+def test_identical_chunks_are_stored_once_per_source():
+    registry = FakeRegistry()
+    stats = _pipeline(registry).run(_pages(["same text", "same text"]), source="a.pdf")
+    assert stats["chunks"] == 1
+    # Same text in another source is a separate chunk
+    _pipeline(registry).run(_pages(["same text"]), source="b.pdf")
+    assert len(registry.store.rows) == 2
+
+
+def test_run_without_text_stores_nothing():
+    registry = FakeRegistry()
+    stats = IngestPipeline(registry, {}).run([], source="empty.pdf")
+    assert stats["chunks"] == 0
+    assert registry.store.rows == {}
+
+
+def test_hash_file_matches_sha256(tmp_path):
+    path = tmp_path / "doc.pdf"
+    path.write_bytes(b"%PDF" * 1000)
+    assert hash_file(str(path), block_size=7) == hashlib.sha256(b"%PDF" * 1000).hexdigest()
+
+
+def test_save_stream_hashes_while_writing(tmp_path):
+    data = b"0123456789" * 1000
+    dest = tmp_path / "upload.part"
+    digest, size = save_stream(io.BytesIO(data), str(dest), max_bytes=len(data), block_size=333)
+    assert size == len(data)
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert dest.read_bytes() == data
+
+
+def test_save_stream_over_limit_removes_partial_file(tmp_path):
+    dest = tmp_path / "upload.part"
+    with pytest.raises(FileTooLargeError):
+        save_stream(io.BytesIO(b"x" * 5000), str(dest), max_bytes=4096, block_size=1024)
+    assert not dest.exists()
+
+
+def test_clean_metadata_keeps_scalar_values():
+    assert clean_metadata({"page": 1, "source": "a.pdf", "empty": None, "tags": ["x"]}) == {
+        "page": 1, "source": "a.pdf", "tags": "['x']"
+    }
+
+
+def test_progress_reports_stages_and_embedded_chunks():
+    events = []
+    _pipeline(FakeRegistry()).run(
+        _pages([f"page {i}" for i in range(7)]), source="book.pdf",
+        progress=lambda *event: events.append(event)
+    )
+    assert events[0][0] == "splitting"
+    embedding = [(done, total) for stage, done, total, _, _ in events if stage == "embedding"]
+    assert embedding[-1] == (7, 7)
+    assert [done for done, _ in embedding] == sorted(done for done, _ in embedding)
+    assert events[-1] == ("done", 7, 7, 7, 7)
+
+
+def test_windowed_progress_covers_the_whole_document():
+    events = []
+    _pipeline(FakeRegistry()).run_windows(
+        page_windows(iter(_pages([f"page {i}" for i in range(10)])), 4), source="book.pdf",
+        progress=lambda *event: events.append(event), pages_total=10
+    )
+    pages = [pages_done for _, _, _, pages_done, _ in events]
+    assert pages == sorted(pages)
+    assert pages[-1] == 10
+    assert {pages_total for _, _, _, _, pages_total in events} == {10}
+    # Chunk counts accumulate across windows instead of restarting per window
+    embedded = [done for stage, done, _, _, _ in events if stage == "embedding"]
+    assert embedded == sorted(embedded)
+    assert embedded[-1] == 10
+
+
+def test_keyword_index_follows_the_vector_store(tmp_path):
+    from backend.keyword_index import KeywordIndex
+
+    registry = FakeRegistry()
+    index = KeywordIndex(str(tmp_path / "index.sqlite3"))
+    pipeline = IngestPipeline(registry, {"chunk_size": 200, "chunk_overlap": 0}, index)
+    pipeline.run(_pages(["alpha", "beta"]), source="notes.pdf")
+    assert index.count() == 2
+
+    pipeline.run(_pages(["alpha", "gamma"]), source="notes.pdf")
+    assert index.count() == 2
+    assert index.search("beta") == []
+    assert [chunk for chunk, _ in index.search("gamma")] == [chunk_id("notes.pdf", hash_text("gamma"))]
+
+
+def test_keyword_index_takes_new_source_metadata(tmp_path):
+    from backend.keyword_index import KeywordIndex
+
+    registry = FakeRegistry()
+    index = KeywordIndex(str(tmp_path / "index.sqlite3"))
+    pipeline = IngestPipeline(registry, {"chunk_size": 200, "chunk_overlap": 0}, index)
+    pipeline.run(_pages(["alpha", "beta"]), source="notes.pdf", metadata={"source_id": 1, "subject": "Physics"})
+    pipeline.run(_pages(["alpha", "beta"]), source="notes.pdf", metadata={"source_id": 1, "subject": "Chemistry"})
+
+    docs = index.get_documents(list(registry.store.rows))
+    assert {doc.metadata["subject"] for doc in docs.values()} == {"Chemistry"}
+    assert len(index.search("alpha", sources=["notes.pdf"])) == 1
+
+
+def test_page_windows_bounds_pages_in_flight():
+    pages = (Document(page_content=str(i)) for i in range(7))
+    windows = [[p.page_content for p in w] for w in page_windows(pages, 3)]
+    assert windows == [["0", "1", "2"], ["3", "4", "5"], ["6"]]
+
+
+def test_run_windows_matches_a_single_pass():
+    texts = ["alpha", "beta", "gamma", "delta", "alpha"]
+    single, windowed = FakeRegistry(), FakeRegistry()
+    _pipeline(single).run(_pages(texts), source="book.pdf")
+    stats = _pipeline(windowed).run_windows(page_windows(iter(_pages(texts)), 2), source="book.pdf")
+
+    assert stats["windows"] == 3
+    assert stats["pages"] == 5
+    assert windowed.store.rows.keys() == single.store.rows.keys()
+
+    # Chunks seen in any window survive a re-ingest; only ones gone from every window are removed
+    stats = _pipeline(windowed).run_windows(page_windows(iter(_pages(["delta", "alpha", "beta"])), 1), source="book.pdf")
+    assert stats["chunks_removed"] == 1
+    assert sorted(doc for _, doc, _ in windowed.store.rows.values()) == ["alpha", "beta", "delta"]
@@ -0,0 +1,148 @@
+import sys
+import time
+import types
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import backend.jobs as jobs
+from backend.database import Base, IngestJob, Source
+from backend.jobs import IngestJobQueue
+
+
+@pytest.fixture
+def session_factory(monkeypatch, tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    monkeypatch.setattr(jobs, "SessionLocal", factory)
+    return factory
+
+
+@pytest.fixture
+def fake_engine(monkeypatch):
+    """Stand-in for backend.rag_engine so workers run without Ollama or Chroma"""
+    module = types.ModuleType("backend.rag_engine")
+    calls = []
+
+    def ingest_document(path, content_hash=None, progress=None, source_id=None, subject=None):
+        calls.append((path, source_id, subject))
+        if path.endswith("broken.pdf"):
+            raise ValueError("unreadable PDF")
+        progress("embedding", 5, 10, 2, 4)
+        progress("embedding", 10, 10, 4, 4)
+        return {"content_hash": content_hash or "h", "chunks": 10}
+
+    module.ingest_document = ingest_document
+    module.ingest_url = lambda url, progress=None, **kwargs: "Page title"
+    module.calls = calls
+    monkeypatch.setitem(sys.modules, "backend.rag_engine", module)
+    return module
+
+
+def _wait_for(queue, job_id, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = queue.get_status(job_id)
+        if status["status"] in jobs.TERMINAL_STATUSES:
+            return status
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def _job(**fields):
+    job = SimpleNamespace(
+        id=1, kind="file", target="a.pdf", filename="a.pdf", status="running", stage="embedding",
+        chunks_total=0, chunks_done=0, pages_total=0, pages_done=0, started_at=time.time() - 5,
+        source_id=None, error=None
+    )
+    job.__dict__.update(fields)
+    return job
+
+
+def test_eta_extrapolates_from_document_progress():
+    # A quarter of the pages in 5s: about 15s left, whatever the current window's chunk counts
+    status = IngestJobQueue._to_status(_job(pages_total=40, pages_done=10, chunks_total=12, chunks_done=12))
+    assert status["progress"] == 0.25
+    assert status["eta_seconds"] == pytest.approx(15.0, abs=0.5)
+
+    # Sources without a page count fall back to chunks
+    assert IngestJobQueue._to_status(_job(chunks_total=40, chunks_done=30))["progress"] == 0.75
+
+    assert IngestJobQueue._to_status(_job(stage="splitting"))["eta_seconds"] is None
+    done = IngestJobQueue._to_status(_job(status="done", pages_total=40, pages_done=10))
+    assert (done["progress"], done["eta_seconds"]) == (1.0, 0)
+
+
+def test_stage_start_is_not_reset_by_later_windows(session_factory):
+    queue = IngestJobQueue()
+    job_id = queue.enqueue("file", "data/notes.pdf")
+    progress = queue._progress_callback(job_id)
+    progress("embedding", 5, 5, 4, 8)
+    db = session_factory()
+    try:
+        first_start = db.get(IngestJob, job_id).stage_started_at
+    finally:
+        db.close()
+
+    time.sleep(0.01)
+    progress("storing", 5, 5, 4, 8)
+    progress("embedding", 8, 10, 6, 8)
+    db = session_factory()
+    try:
+        job = db.get(IngestJob, job_id)
+        assert job.stage_started_at == first_start
+        assert (job.pages_done, job.pages_total, job.chunks_done, job.chunks_total) == (6, 8, 8, 10)
+    finally:
+        db.close()
+
+
+def test_worker_runs_jobs_and_records_sources(session_factory, fake_engine):
+    queue = IngestJobQueue(num_workers=1, poll_interval=0.05)
+    queue.start()
+    try:
+        ok = queue.enqueue("file", "data/notes.pdf", filename="notes.pdf", content_hash="abc", subject="Physics")
+        broken = queue.enqueue("file", "data/broken.pdf", filename="broken.pdf")
+        done = _wait_for(queue, ok)
+        failed = _wait_for(queue, broken)
+    finally:
+        queue.stop()
+
+    assert done["stage"] == "done"
+    assert (done["chunks_done"], done["chunks_total"]) == (10, 10)
+    assert failed["status"] == "failed"
+    assert "unreadable" in failed["error"]
+
+    db = session_factory()
+    try:
+        source = db.query(Source).filter(Source.id == done["source_id"]).one()
+        assert (source.filename, source.content_hash, source.chunk_count) == ("notes.pdf", "abc", 10)
+        assert (source.subject, source.is_active) == ("Physics", True)
+        # The Source row exists before ingest so chunks can carry its ID
+        assert fake_engine.calls[0] == ("data/notes.pdf", source.id, "Physics")
+    finally:
+        db.close()
+
+
+def test_start_requeues_interrupted_jobs(session_factory, fake_engine):
+    db = session_factory()
+    try:
+        db.add(IngestJob(kind="file", target="data/notes.pdf", status="running", stage="embedding",
+                         chunks_done=7, created_at=time.time()))
+        db.commit()
+    finally:
+        db.close()
+
+    queue = IngestJobQueue(num_workers=1, poll_interval=0.05)
+    queue.start()
+    try:
+        status = _wait_for(queue, 1)
+    finally:
+        queue.stop()
+    assert status["status"] == "done"
+    assert [call[0] for call in fake_engine.calls] == ["data/notes.pdf"]
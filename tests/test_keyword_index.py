@@ -0,0 +1,91 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document
+
+from backend.keyword_index import KeywordIndex, tokenize
+
+
+def _doc(text, source="notes.pdf"):
+    return Document(page_content=text, metadata={"source": source, "page": 1})
+
+
+def test_tokenize_keeps_codes_and_their_parts():
+    assert tokenize("What is CS-101 about?") == ["cs-101", "cs", "101", "about"]
+    assert tokenize("call f.read() twice") == ["call", "f.read", "f", "read", "twice"]
+
+
+def test_search_ranks_exact_terms_first(tmp_path):
+    index = KeywordIndex(str(tmp_path / "index.sqlite3"))
+    index.add(["a", "b", "c"], [
+        _doc("Thermodynamics covers heat, work and entropy."),
+        _doc("Course ME-2201 introduces the Bernoulli equation."),
+        _doc("Entropy entropy entropy: disorder in a closed system."),
+    ])
+    assert [chunk for chunk, _ in index.search("ME-2201 syllabus")] == ["b"]
+    assert [chunk for chunk, _ in index.search("entropy")] == ["c", "a"]
+    assert index.search("the of and") == []
+    assert index.get_documents(["b"])["b"].metadata["source"] == "notes.pdf"
+
+
+def test_search_limited_to_sources(tmp_path):
+    index = KeywordIndex(str(tmp_path / "index.sqlite3"))
+    index.add(["a", "b"], [_doc("entropy basics", "one.pdf"), _doc("entropy advanced", "two.pdf")])
+    assert [chunk for chunk, _ in index.search("entropy", sources=["two.pdf"])] == ["b"]
+    assert index.search("entropy", sources=[]) == []
+
+
+def test_remove_and_reopen(tmp_path):
+    path = str(tmp_path / "index.sqlite3")
+    index = KeywordIndex(path)
+    index.add(["a", "b"], [_doc("alpha beta", "one.pdf"), _doc("alpha gamma", "two.pdf")])
+    assert index.remove_source("one.pdf") == 1
+    assert index.missing(["a", "b"]) == {"a"}
+    index.close()
+
+    reopened = KeywordIndex(path)
+    assert reopened.count() == 1
+    assert [chunk for chunk, _ in reopened.search("alpha")] == ["b"]
+    # Re-adding an ID replaces its postings instead of double counting
+    reopened.add(["b"], [_doc("delta", "two.pdf")])
+    assert reopened.count() == 1
+    assert reopened.search("alpha") == []
+
+
+class FakeStore:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return self.docs[:k]
+
+
+def test_retrieve_fuses_dense_and_keyword_rankings(tmp_path, monkeypatch):
+    pytest.importorskip("langchain_chroma")
+    import backend.rag_engine as rag_engine
+    from backend.ingest_pipeline import chunk_id, hash_text
+
+    texts = {
+        "dense-1": "Fluids flow faster through narrow pipes.",
+        "dense-2": "Pressure drops where velocity rises.",
+        "exact": "ME-2201 lab: verify the Bernoulli equation.",
+    }
+    docs = {name: _doc(text) for name, text in texts.items()}
+    ids = {name: chunk_id("notes.pdf", hash_text(text)) for name, text in texts.items()}
+
+    index = KeywordIndex(str(tmp_path / "index.sqlite3"))
+    index.add([ids["exact"], ids["dense-2"]], [docs["exact"], docs["dense-2"]])
+    config = dict(rag_engine.get_retrieval_config(), hybrid=True, candidate_k=10, k={"query": 3})
+    monkeypatch.setattr(rag_engine, "keyword_index", index)
+    monkeypatch.setattr(rag_engine, "get_retrieval_config", lambda: config)
+    monkeypatch.setattr(rag_engine, "get_vector_store", lambda: FakeStore([docs["dense-1"], docs["dense-2"]]))
+    monkeypatch.setattr(rag_engine, "_active_scope", lambda subject=None: ([1], ["notes.pdf"]))
+
+    # Ranked by both retrievers beats either alone; the keyword-only chunk still surfaces
+    results = rag_engine._retrieve("ME-2201 pressure velocity", "query")
+    assert [d.page_content for d in results][0] == texts["dense-2"]
+    assert {d.page_content for d in results} == set(texts.values())
+
+    config["hybrid"] = False
+    assert [d.page_content for d in rag_engine._retrieve("ME-2201", "query")] == [texts["dense-1"], texts["dense-2"]]
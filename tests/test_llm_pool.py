@@ -0,0 +1,100 @@
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+import backend.llm_pool as llm_pool
+from backend.config import LLMProvider
+from backend.llm_pool import LLMClientPool, OllamaClient
+
+
+class FakeClient:
+    """Records how many generations overlap"""
+
+    def __init__(self, config):
+        self.config = config
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+
+    def invoke(self, prompt):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.02)
+        with self.lock:
+            self.active -= 1
+        return f"answer to {prompt}"
+
+    def stream(self, prompt):
+        yield from ("a", "b")
+
+
+@pytest.fixture
+def config(monkeypatch):
+    settings = {"model": "llama3.2:1b", "max_concurrency": 1}
+    monkeypatch.setattr(llm_pool, "get_llm_provider", lambda: LLMProvider.OLLAMA)
+    monkeypatch.setattr(llm_pool, "get_llm_config", lambda: settings)
+    monkeypatch.setattr(llm_pool, "_build_client", lambda provider, cfg: FakeClient(dict(cfg)))
+    return settings
+
+
+def test_client_is_reused_until_config_changes(config):
+    pool = LLMClientPool()
+    first = pool.get()
+    assert pool.get() is first
+
+    config["model"] = "llama3.2:3b"
+    second = pool.get()
+    assert second is not first
+    assert second.client.config["model"] == "llama3.2:3b"
+    stats = pool.get_stats()["ollama"]
+    assert (stats["builds"], stats["reuses"], stats["reloads"]) == (2, 1, 1)
+
+
+def test_generations_respect_provider_concurrency(config):
+    config["max_concurrency"] = 2
+    pool = LLMClientPool()
+    pooled = pool.get()
+    threads = [threading.Thread(target=pooled.invoke, args=(str(i),)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert pooled.client.peak == 2
+    assert pool.get_stats()["ollama"]["in_flight"] == 0
+
+
+def test_stream_releases_slot_when_finished(config):
+    pool = LLMClientPool()
+    pooled = pool.get()
+    assert "".join(pooled.stream("x")) == "ab"
+    # The single slot is free again
+    assert pooled.invoke("y") == "answer to y"
+
+
+def test_ollama_client_reuses_one_connection_and_sends_keep_alive(monkeypatch):
+    requests = []
+
+    class FakeOllama:
+        instances = 0
+
+        def __init__(self, host):
+            FakeOllama.instances += 1
+            self.host = host
+
+        def generate(self, stream=False, **kwargs):
+            requests.append(kwargs)
+            if stream:
+                return iter([{"response": "Hel"}, {"response": ""}, {"response": "lo"}])
+            return {"response": "Hello"}
+
+    monkeypatch.setitem(sys.modules, "ollama", types.SimpleNamespace(Client=FakeOllama))
+    client = llm_pool._build_client(LLMProvider.OLLAMA, {"model": "llama3.2:1b", "keep_alive": "30m"})
+    assert isinstance(client, OllamaClient)
+    assert client.invoke("hi") == "Hello"
+    assert "".join(client.stream("hi")) == "Hello"
+    assert FakeOllama.instances == 1
+    assert all(r["keep_alive"] == "30m" and r["model"] == "llama3.2:1b" for r in requests)
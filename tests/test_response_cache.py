@@ -0,0 +1,95 @@
+import time
+
+import pytest
+
+from backend.response_cache import ResponseCache
+
+
+def test_hit_miss_and_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.put("a", "lesson a", ["one.pdf"])
+    cache.put("b", "lesson b", ["two.pdf"])
+    assert cache.get("a") == "lesson a"
+    cache.put("c", "lesson c", ["two.pdf"])
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "lesson a"
+    stats = cache.get_stats()
+    assert (stats["entries"], stats["evictions"], stats["hits"], stats["misses"]) == (2, 1, 2, 1)
+
+
+def test_expired_entries_miss():
+    cache = ResponseCache(ttl_seconds=0.01)
+    cache.put("a", "lesson a", ["one.pdf"])
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert cache.get_stats()["entries"] == 0
+
+
+def test_invalidate_source_drops_every_entry_built_from_it():
+    cache = ResponseCache()
+    cache.put("a", "lesson a", ["one.pdf"])
+    cache.put("b", "lesson b", ["one.pdf", "two.pdf"])
+    cache.put("c", "lesson c", ["two.pdf"])
+
+    assert cache.invalidate_source("one.pdf") == 2
+    assert cache.get("a") is None and cache.get("b") is None
+    assert cache.get("c") == "lesson c"
+    assert cache.invalidate_source("one.pdf") == 0
+    # Re-putting a key does not leave stale source links behind
+    cache.put("c", "lesson c v2", ["three.pdf"])
+    assert cache.invalidate_source("two.pdf") == 0
+    assert cache.get("c") == "lesson c v2"
+
+
+def test_key_depends_on_context_and_model():
+    key = ResponseCache.make_key("lesson", " Entropy ", ["c2", "c1"], "llama3")
+    assert key == ResponseCache.make_key("lesson", "entropy", ["c1", "c2"], "llama3")
+    assert key != ResponseCache.make_key("lesson", "entropy", ["c1", "c3"], "llama3")
+    assert key != ResponseCache.make_key("lesson", "entropy", ["c1", "c2"], "mistral")
+    assert key != ResponseCache.make_key("quiz", "entropy", ["c1", "c2"], "llama3")
+
+
+class FakeLLM:
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, prompt):
+        self.calls += 1
+        return f"# Lesson {self.calls}\n\nBody text."
+
+
+class FakeStore:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def similarity_search(self, query, k=4, **kwargs):
+        return self.docs[:k]
+
+    def delete(self, ids=None, source=None):
+        self.docs = [d for d in self.docs if d.metadata["source"] != source]
+
+
+def test_lessons_are_served_from_cache_until_their_source_is_deleted(monkeypatch):
+    pytest.importorskip("langchain_chroma")
+    from langchain_core.documents import Document
+    import backend.rag_engine as rag_engine
+
+    store = FakeStore([
+        Document(page_content="Entropy measures disorder.", metadata={"source": "data/a.pdf", "page": 1}),
+        Document(page_content="Heat flows from hot to cold.", metadata={"source": "data/b.pdf", "page": 2}),
+    ])
+    llm = FakeLLM()
+    monkeypatch.setattr(rag_engine, "response_cache", ResponseCache())
+    monkeypatch.setattr(rag_engine, "get_vector_store", lambda: store)
+    monkeypatch.setattr(rag_engine, "get_llm", lambda: llm)
+    monkeypatch.setattr(rag_engine, "_active_scope", lambda subject=None: ([1, 2], ["data/a.pdf", "data/b.pdf"]))
+
+    first = rag_engine.generate_lesson_content("Entropy")
+    assert rag_engine.generate_lesson_content("entropy") == first
+    assert llm.calls == 1
+
+    rag_engine.delete_document("data/a.pdf")
+    assert rag_engine.response_cache.get_stats()["invalidations"] == 1
+    assert rag_engine.generate_lesson_content("Entropy") != first
+    assert llm.calls == 2
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("langchain_chroma")
+
+
+class FakeLLM:
+    def __init__(self, chunks, fail=False):
+        self.chunks = chunks
+        self.fail = fail
+
+    def stream(self, prompt):
+        yield from self.chunks
+        if self.fail:
+            raise RuntimeError("model went away")
+
+
+@pytest.fixture
+def client(monkeypatch):
+    # Imported lazily so the app's SQLite file lands in the isolated working directory
+    from fastapi.testclient import TestClient
+    import backend.main as main
+    import backend.rag_engine as rag_engine
+
+    sources = [{"source": "notes.pdf", "page": 3}]
+    monkeypatch.setattr(rag_engine, "_prepare_query", lambda question, history, subject=None: (f"Q: {question}", sources))
+    monkeypatch.setattr(rag_engine, "get_llm", lambda: FakeLLM(["Entropy ", "is ", "disorder."]))
+    return TestClient(main.app)
+
+
+def _events(response):
+    events = []
+    for block in response.text.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_query_stream_sends_sources_tokens_then_done(client):
+    response = client.post("/query/stream", json={"question": "What is entropy?", "history": []})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+
+    events = _events(response)
+    assert events[0] == ("sources", [{"source": "notes.pdf", "page": 3}])
+    assert [data for event, data in events if event == "token"] == ["Entropy ", "is ", "disorder."]
+    assert events[-1] == ("done", {"answer": "Entropy is disorder.", "sources": [{"source": "notes.pdf", "page": 3}]})
+
+
+def test_llm_failure_is_reported_in_band(client, monkeypatch):
+    import backend.rag_engine as rag_engine
+    monkeypatch.setattr(rag_engine, "get_llm", lambda: FakeLLM(["partial"], fail=True))
+
+    events = _events(client.post("/query/stream", json={"question": "q", "history": []}))
+    assert events[-1][0] == "error"
+    assert "model went away" in events[-1][1]["answer"]
+
+
+def test_stream_releases_its_slot(client):
+    import backend.main as main
+    for _ in range(3):
+        client.post("/query/stream", json={"question": "q", "history": []})
+    stats = main.rag_executor.get_stats()["query"]
+    assert stats["active"] == 0
+    assert stats["completed"] >= 3
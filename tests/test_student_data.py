@@ -0,0 +1,264 @@
+import json
+import statistics
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from backend.database import Base
+from backend.student_data import StudentProfileManager, advance_study_day, subject_for_topic
+
+
+@pytest.fixture
+def manager(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'profiles.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    manager = StudentProfileManager(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    manager.legacy_profile_file = tmp_path / "student_profile.json"
+    yield manager
+    manager.close()
+
+
+def test_profiles_are_kept_per_student(manager):
+    manager.save_study_plan([{"id": 1, "title": "Kinematics"}], 5, student_id="alice")
+    manager.update_quiz_score(1, "Kinematics", "Physics", 8, 10, student_id="alice")
+    manager.record_study_time(1, 20, student_id="alice")
+
+    alice = manager.load_profile("alice")
+    bob = manager.load_profile("bob")
+    assert alice["study_plan"]["num_days"] == 5
+    assert [q["percentage"] for q in alice["quiz_history"]] == [80.0]
+    assert alice["time_tracking"] == {"total_study_time_minutes": 20, "topics_time": {"1": 20}}
+    assert bob["study_plan"]["topics"] == []
+    assert bob["quiz_history"] == []
+
+
+def test_quiz_scores_update_mastery(manager):
+    manager.update_quiz_score(1, "Kinematics", "Physics", 9, 10)
+    manager.update_quiz_score(2, "Dynamics", "Physics", 5, 10)
+    physics = manager.get_mastery_data()["Physics"]
+    assert physics["avg_score"] == 70.0
+    assert physics["topics_completed"] == 2
+    assert physics["mastery_level"] == "medium"
+
+
+def test_mastery_aggregates_match_full_history(manager):
+    scores = [40, 90, 65, 80, 100, 55, 70]
+    for i, score in enumerate(scores):
+        manager.update_quiz_score(i, f"Topic {i}", "Physics", score, 100)
+
+    physics = manager.get_mastery_data()["Physics"]
+    assert physics["score_count"] == len(scores)
+    assert physics["avg_score"] == pytest.approx(statistics.mean(scores))
+    assert physics["score_variance"] == pytest.approx(statistics.variance(scores))
+    assert physics["score_stddev"] == pytest.approx(statistics.stdev(scores))
+
+    recent = scores[0]
+    for score in scores[1:]:
+        recent = 0.3 * score + 0.7 * recent
+    assert physics["recent_score"] == pytest.approx(recent)
+
+
+def test_reservoir_stays_bounded(manager, monkeypatch):
+    import backend.student_data as student_data
+    monkeypatch.setattr(student_data, "get_mastery_config", lambda: {"ewma_alpha": 0.3, "reservoir_size": 3})
+    for i in range(10):
+        manager.update_quiz_score(i, f"Topic {i}", "Physics", i, 10)
+
+    physics = manager.get_mastery_data()["Physics"]
+    assert physics["score_count"] == 10
+    assert len(physics["score_samples"]) == 3
+    assert set(physics["score_samples"]) <= {float(i * 10) for i in range(10)}
+
+
+def test_incomplete_tasks_cleared_by_completion(manager):
+    manager.save_study_plan([{"id": 1, "status": "unlocked"}, {"id": 2, "status": "locked"}], 2)
+    manager.add_incomplete_task(1, from_day=1)
+    manager.add_incomplete_task(1, from_day=1)
+    assert [t["topic_id"] for t in manager.get_incomplete_tasks(current_day=2)] == [1]
+    assert manager.get_incomplete_tasks(current_day=1) == []
+
+    manager.mark_topic_complete(1)
+    profile = manager.load_profile()
+    assert profile["incomplete_tasks"] == []
+    assert profile["study_plan"]["topics"][0]["status"] == "completed"
+
+
+def test_concurrent_writes_for_different_students(manager):
+    def work(student_id):
+        for _ in range(5):
+            manager.record_study_time(7, 1, student_id=student_id)
+
+    threads = [threading.Thread(target=work, args=(f"s{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for i in range(4):
+        assert manager.load_profile(f"s{i}")["time_tracking"]["total_study_time_minutes"] == 5
+
+
+def test_default_student_imports_legacy_json_profile(manager):
+    manager.legacy_profile_file.write_text(json.dumps({
+        "current_study_day": 3,
+        "study_plan": {"plan_id": "plan_1", "num_days": 4, "topics": [{"id": 1}]},
+        "quiz_history": [{"topic_id": 1, "score": 3, "total": 4, "percentage": 75.0}],
+        "time_tracking": {"total_study_time_minutes": 42, "topics_time": {"1": 42}},
+        "incomplete_tasks": [{"topic_id": 1, "from_day": 1}]
+    }))
+    assert manager.load_profile()["study_plan"]["plan_id"] is None
+    assert manager.import_legacy_profile() is True
+    # Only imported once
+    assert manager.import_legacy_profile() is False
+
+    profile = manager.load_profile()
+    assert profile["current_study_day"] == 3
+    assert profile["study_plan"]["plan_id"] == "plan_1"
+    assert len(profile["quiz_history"]) == 1
+    assert profile["time_tracking"]["total_study_time_minutes"] == 42
+    # Other students start empty
+    assert manager.load_profile("alice")["quiz_history"] == []
+
+
+def test_loading_unknown_student_writes_nothing(manager):
+    from backend.database import StudentProfile
+
+    profile = manager.load_profile("nobody")
+    assert profile["current_study_day"] == 1
+    assert profile["quiz_history"] == [] and profile["quiz_count"] == 0
+    with manager.session_factory() as db:
+        assert db.get(StudentProfile, "nobody") is None
+
+
+def test_quiz_limit_and_latest_scores(manager):
+    for topic_id, score in [(1, 4), (2, 5), (1, 9), (3, 7)]:
+        manager.update_quiz_score(topic_id, f"Topic {topic_id}", "Physics", score, 10)
+
+    profile = manager.load_profile(quiz_limit=2)
+    assert profile["quiz_count"] == 4
+    assert [(q["topic_id"], q["score"]) for q in profile["quiz_history"]] == [(1, 9), (3, 7)]
+
+    latest = manager.get_latest_quiz_scores()
+    assert {topic_id: q["score"] for topic_id, q in latest.items()} == {1: 9, 2: 5, 3: 7}
+
+
+def test_subject_index_tracks_plan_scores_and_completion(manager):
+    manager.save_study_plan([
+        {"id": 1, "title": "Kinematics", "subject": "Physics", "day": 1, "status": "unlocked"},
+        {"id": 2, "title": "Day 2: Chemistry: Bonds", "day": 2},
+        {"id": 3, "title": "Dynamics", "subject": "Physics", "day": 3},
+    ], 3)
+    manager.update_quiz_score(1, "Kinematics", "Physics", 7, 10)
+    manager.mark_topic_complete(1)
+
+    index = manager.get_subject_index()
+    assert list(index) == ["Physics", "Chemistry"]
+    kinematics = index["Physics"][0]
+    assert kinematics["status"] == "completed"
+    assert kinematics["score_data"]["percentage"] == 70.0
+    assert "score_data" not in index["Physics"][1]
+    assert [t["id"] for t in index["Chemistry"]] == [2]
+
+
+def test_subject_for_topic_prefers_tagged_subject():
+    assert subject_for_topic({"subject": "Physics", "title": "Day 1: Chemistry: Bonds"}) == "Physics"
+    assert subject_for_topic({"title": "Day 2: Thermodynamics: Laws"}) == "Thermodynamics"
+    assert subject_for_topic({"title": "Day 3"}) == "General"
+
+
+PLAN = [{"id": 1, "day": 1}, {"id": 2, "day": 2}, {"id": 3, "day": 3}]
+
+
+def test_advance_study_day_moves_one_day_per_calendar_day():
+    assert advance_study_day(PLAN, 1, "2026-03-01", "2026-03-02") == 2
+    assert advance_study_day(PLAN, 1, "2026-03-01", "2026-03-03") == 3
+
+
+def test_advance_study_day_is_capped_at_plan_length():
+    assert advance_study_day(PLAN, 2, "2026-03-01", "2026-03-20") == 3
+
+
+@pytest.mark.parametrize("plan, last, today", [
+    (PLAN, "2026-03-02", "2026-03-02"),  # same day
+    (PLAN, "2026-03-05", "2026-03-02"),  # clock went backwards
+    (PLAN, None, "2026-03-02"),          # never visited
+    (PLAN, "garbage", "2026-03-02"),     # unparseable stored date
+    ([], "2026-03-01", "2026-03-09"),    # no plan
+])
+def test_advance_study_day_keeps_day(plan, last, today):
+    assert advance_study_day(plan, 2, last, today) == 2
+
+
+def _stored_minutes(manager, student_id):
+    from backend.database import StudentProfile
+
+    with manager.session_factory() as db:
+        row = db.get(StudentProfile, student_id)
+        return None if row is None else row.total_study_time_minutes
+
+
+def test_study_time_is_written_behind_in_one_flush(manager):
+    manager.flush_delay = manager.max_flush_delay = 60
+    for _ in range(5):
+        manager.record_study_time(1, 3, student_id="alice")
+    manager.update_progress("alice", current_study_day=2)
+
+    # Reads see the updates before they reach the database
+    profile = manager.load_profile("alice")
+    assert profile["time_tracking"] == {"total_study_time_minutes": 15, "topics_time": {"1": 15}}
+    assert profile["current_study_day"] == 2
+    assert manager.is_dirty
+    assert _stored_minutes(manager, "alice") is None
+
+    manager.flush()
+    assert not manager.is_dirty
+    assert _stored_minutes(manager, "alice") == 15
+    assert manager.get_stats()["flushes"] == 1
+    assert manager.load_profile("alice")["time_tracking"]["total_study_time_minutes"] == 15
+
+
+def test_flusher_writes_after_quiet_period(manager):
+    manager.flush_delay = 0.05
+    manager.record_study_time(1, 4, student_id="alice")
+    deadline = time.monotonic() + 5
+    while manager.is_dirty and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert _stored_minutes(manager, "alice") == 4
+
+
+def test_reads_are_served_from_memory(manager):
+    manager.update_quiz_score(1, "Kinematics", "Physics", 8, 10, student_id="alice")
+    manager.load_profile("alice")
+
+    calls = []
+    factory = manager.session_factory
+    manager.session_factory = lambda: calls.append(1) or factory()
+    manager.load_profile("alice")
+    manager.get_mastery_data("alice")
+    manager.get_incomplete_tasks(5, student_id="alice")
+    assert calls == []
+
+    # Synchronous writes drop the cached copy
+    manager.update_quiz_score(1, "Kinematics", "Physics", 10, 10, student_id="alice")
+    assert [q["score"] for q in manager.load_profile("alice")["quiz_history"]] == [8, 10]
+
+
+def test_synchronous_write_lands_after_pending_updates(manager):
+    manager.flush_delay = manager.max_flush_delay = 60
+    manager.update_progress("alice", plan_id="plan_old")
+    plan_id = manager.save_study_plan([{"id": 1, "title": "Kinematics"}], 3, student_id="alice")
+
+    assert not manager.is_dirty
+    assert manager.load_profile("alice")["study_plan"]["plan_id"] == plan_id
+
+
+def test_close_flushes_pending_updates(manager):
+    manager.flush_delay = manager.max_flush_delay = 60
+    manager.record_study_time(2, 7, student_id="bob")
+    manager.close()
+    assert _stored_minutes(manager, "bob") == 7
@@ -0,0 +1,96 @@
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("sqlalchemy")
+
+from backend.topic_index import detect_subject, parse_heading, select_granularity, split_into_days
+
+
+@pytest.mark.parametrize("line, expected", [
+    ("Chapter 3: Kinematics", (0, "Chapter 3: Kinematics")),
+    ("UNIT II - Casting", (0, "UNIT II - Casting")),
+    ("2 Casting Processes", (0, "2 Casting Processes")),
+    ("3.1 Sand Moulding", (1, "3.1 Sand Moulding")),
+    ("4.2.1. Gating Systems", (2, "4.2.1. Gating Systems")),
+    ("CASTING PROCESSES", (0, "Casting Processes")),
+])
+def test_parse_heading_recognises_headings(line, expected):
+    assert parse_heading(line) == expected
+
+
+@pytest.mark.parametrize("line", [
+    "",
+    "ab",
+    "The mould is filled with molten metal and left to cool.",
+    "2 cups of sand",
+    "NOTE.",
+    "x" * 150,
+])
+def test_parse_heading_ignores_body_text(line):
+    assert parse_heading(line) is None
+
+
+def test_detect_subject_from_keywords_or_filename():
+    assert detect_subject("MANUFACTURING TECHNOLOGY - I", "notes.pdf") == "Manufacturing Technology"
+    assert detect_subject("", "data/organic_chemistry-notes.pdf") == "Organic Chemistry Notes"
+
+
+def _outline():
+    return [
+        {"title": "Chapter 1", "level": 0},
+        {"title": "1.1", "level": 1},
+        {"title": "1.2", "level": 1},
+        {"title": "Chapter 2", "level": 0},
+        {"title": "2.1", "level": 1},
+    ]
+
+
+def test_select_granularity_uses_shallowest_level_that_fills_the_days():
+    assert [t["title"] for t in select_granularity(_outline(), 2)] == ["Chapter 1", "Chapter 2"]
+    assert len(select_granularity(_outline(), 4)) == 5
+    # Fewer entries than days: everything is used
+    assert len(select_granularity(_outline(), 10)) == 5
+    assert select_granularity([], 3) == []
+
+
+def test_split_into_days_keeps_order_and_balances_groups():
+    entries = list(range(7))
+    assert split_into_days(entries, 3) == [[0, 1, 2], [3, 4], [5, 6]]
+    assert split_into_days(entries[:2], 4) == [[0], [1], [], []]
+    assert split_into_days([], 2) == [[], []]
+
+
+@pytest.fixture
+def rag_engine(monkeypatch):
+    pytest.importorskip("langchain_community")
+    import backend.rag_engine as rag_engine
+
+    def no_llm():
+        raise AssertionError("plan generation must not call the LLM")
+
+    monkeypatch.setattr(rag_engine, "get_llm", no_llm)
+    return rag_engine
+
+
+def test_study_plan_covers_each_source_without_the_llm(rag_engine, monkeypatch):
+    physics = [{"title": f"Chapter {i}", "level": 0, "page": i * 10} for i in range(1, 5)]
+    chemistry = [{"title": "Bonds", "level": 0, "page": 0}]
+    monkeypatch.setattr(rag_engine, "_plan_sources", lambda: [
+        {"id": 1, "subject": "Physics", "topics": physics},
+        {"id": 2, "subject": "Chemistry", "topics": chemistry},
+    ])
+
+    days = rag_engine.generate_study_plan("Make me a 2 day plan")["days"]
+    assert [(d["day"], d["subject"]) for d in days] == [(1, "Physics"), (1, "Chemistry"), (2, "Physics"), (2, "Chemistry")]
+    assert [d["id"] for d in days] == [1, 2, 3, 4]
+    assert days[0]["topic"] == "Physics: Chapter 1"
+    assert days[0]["details"] == "Covers: Chapter 1; Chapter 2 (pp. 11-21)"
+    assert days[3]["topic"] == "Chemistry: Review: Bonds"
+    assert [d["status"] for d in days] == ["unlocked", "unlocked", "locked", "locked"]
+
+
+def test_study_plan_without_sources_uses_placeholder_days(rag_engine, monkeypatch):
+    monkeypatch.setattr(rag_engine, "_plan_sources", lambda: [])
+    days = rag_engine.generate_study_plan("plan please")["days"]
+    assert len(days) == 5
+    assert days[0]["status"] == "unlocked"
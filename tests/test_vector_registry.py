@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+pytest.importorskip("langchain_community")
+
+import backend.vector_registry as vector_registry
+from backend.vector_registry import VectorStoreRegistry
+
+
+class FakeEmbeddings:
+    def __init__(self, model, base_url):
+        self.model = model
+
+
+class FakeStore:
+    instances = 0
+
+    def __init__(self, vector_config, persist_directory, embedding_function):
+        FakeStore.instances += 1
+        self.vector_config = vector_config
+        self.embedding_function = embedding_function
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    FakeStore.instances = 0
+    monkeypatch.setattr(vector_registry, "OllamaEmbeddings", FakeEmbeddings)
+    monkeypatch.setattr(vector_registry, "create_vector_store", FakeStore)
+    return VectorStoreRegistry("./chroma_test", {"model": "nomic-embed-text"})
+
+
+def test_store_and_embedder_are_built_once(registry):
+    store = registry.get_store()
+    assert registry.get_store() is store
+    assert registry.get_embeddings() is store.embedding_function
+    stats = registry.get_stats()
+    assert stats["builds"] == 1
+    assert stats["active"] is True
+    assert stats["embedding_cache"]["entries"] == 0
+    assert FakeStore.instances == 1
+
+
+def test_concurrent_first_use_builds_once(registry):
+    stores = []
+    threads = [threading.Thread(target=lambda: stores.append(registry.get_store())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert FakeStore.instances == 1
+    assert len({id(s) for s in stores}) == 1
+
+
+def test_shutdown_releases_and_next_use_rebuilds(registry):
+    registry.startup()
+    first = registry.get_store()
+    registry.shutdown()
+    assert registry.get_stats()["active"] is False
+    assert registry.get_store() is not first
+    assert registry.get_stats()["builds"] == 2
+
+
+def test_store_built_from_vector_config(registry):
+    registry.vector_config = {"backend": "numpy", "hnsw": {"space": "cosine"}}
+    store = registry.get_store()
+    assert store.vector_config["backend"] == "numpy"
+
+    registry.reload()
+    assert registry.get_store() is not store
+
+
+def test_reload_applies_new_settings(registry):
+    store = registry.get_store()
+    registry.reload(vector_config={"backend": "numpy"})
+    reopened = registry.get_store()
+    assert reopened is not store
+    assert reopened.vector_config == {"backend": "numpy"}
+
+
+def test_reload_config_endpoint_reopens_the_store(monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi.testclient import TestClient
+    import backend.main as main
+
+    calls = []
+    monkeypatch.setattr(main.vector_registry, "reload", lambda *configs: calls.append(configs))
+    response = TestClient(main.app).post("/admin/reload_config")
+    assert response.status_code == 200
+    assert len(calls) == 1
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from backend.vector_store import NumpyVectorStore
+
+
+class FixedEmbeddings:
+    """Embeds every query as the same vector, so ranking depends only on stored vectors"""
+
+    def __init__(self, vector):
+        self.vector = vector
+
+    def embed_query(self, text):
+        return self.vector
+
+
+def _store(tmp_path, name="store"):
+    return NumpyVectorStore(str(tmp_path / name), FixedEmbeddings([1.0, 0.0, 0.0]))
+
+
+def _seed(store):
+    store.upsert(
+        ["a", "b", "c"],
+        [[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [1.0, 0.2, 0.0]],
+        ["alpha", "beta", "gamma"],
+        [{"source": "one.pdf", "source_id": 1}, {"source": "two.pdf", "source_id": 2},
+         {"source": "one.pdf", "source_id": 1}]
+    )
+
+
+def test_search_ranks_by_cosine(tmp_path):
+    store = _store(tmp_path)
+    _seed(store)
+    assert [d.page_content for d in store.similarity_search("q", k=3)] == ["alpha", "gamma", "beta"]
+    assert store.count() == 3
+
+
+def test_search_scoped_by_source_id_or_path(tmp_path):
+    store = _store(tmp_path)
+    _seed(store)
+    assert [d.page_content for d in store.similarity_search("q", k=3, source_ids=[2])] == ["beta"]
+    assert [d.page_content for d in store.similarity_search("q", k=3, sources=["one.pdf"])] == ["alpha", "gamma"]
+    assert store.similarity_search("q", k=3, sources=["missing.pdf"]) == []
+
+
+def test_reupsert_replaces_chunk(tmp_path):
+    store = _store(tmp_path)
+    _seed(store)
+    store.upsert(["a"], [[0.0, 0.0, 1.0]], ["alpha v2"], [{"source": "one.pdf", "source_id": 1}])
+    results = [d.page_content for d in store.similarity_search("q", k=5)]
+    assert results == ["gamma", "beta", "alpha v2"]
+    assert store.count() == 3
+    assert store.get_stats()["dead_rows"] == 1
+
+
+def test_delete_and_update_metadata(tmp_path):
+    store = _store(tmp_path)
+    _seed(store)
+    store.delete(source="one.pdf")
+    assert store.ids_for_source("one.pdf") == set()
+    assert [d.page_content for d in store.similarity_search("q", k=5)] == ["beta"]
+
+    store.update_metadata(["b"], [{"source": "renamed.pdf", "source_id": 7}])
+    found = store.similarity_search("q", k=5, source_ids=[7])
+    assert [d.metadata["source"] for d in found] == ["renamed.pdf"]
+
+
+def test_compact_drops_dead_rows_and_keeps_results(tmp_path):
+    store = _store(tmp_path)
+    _seed(store)
+    store.delete(ids=["b"])
+    store.upsert(["c"], [[1.0, 0.5, 0.0]], ["gamma v2"], [{"source": "one.pdf", "source_id": 1}])
+    before = [d.page_content for d in store.similarity_search("q", k=5)]
+
+    details = store.compact()
+    assert details == {"rows_before": 4, "rows_after": 2}
+    assert [d.page_content for d in store.similarity_search("q", k=5)] == before
+    assert store.get_stats()["dead_rows"] == 0
+
+    # Writes after a compaction append to the renumbered matrix
+    store.upsert(["d"], [[0.0, 1.0, 0.0]], ["delta"], [{"source": "two.pdf", "source_id": 2}])
+    assert [d.page_content for d in store.similarity_search("q", k=5)] == before + ["delta"]
+
+
+def test_reopen_reads_persisted_rows(tmp_path):
+    store = _store(tmp_path)
+    _seed(store)
+    store.delete(ids=["a"])
+    store.close()
+
+    reopened = _store(tmp_path)
+    assert reopened.count() == 2
+    assert [d.page_content for d in reopened.similarity_search("q", k=5)] == ["gamma", "beta"]
+
+
+def test_import_chunks_reuses_embeddings(tmp_path):
+    source = _store(tmp_path, "source")
+    _seed(source)
+    target = _store(tmp_path, "target")
+
+    assert target.import_chunks(source) == 3
+    assert {i for ids, _, _ in target.iter_chunks() for i in ids} == {"a", "b", "c"}
+    exported = {i: v for ids, vectors, _, _ in target.export_chunks() for i, v in zip(ids, vectors)}
+    assert np.allclose(exported["b"], [0.0, 1.0, 0.0])